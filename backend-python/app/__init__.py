@@ -1,14 +1,24 @@
 # This file makes the 'app' directory a Python package
 
 # Facade Export
-from .models import EmbedRequest, EmbedResponse, IngestRequest, IngestResponse, RAGRequest, RAGResponse, ChunkData, RerankRequest, RerankResponse, PlanRequest, PlanResponse
+from .models import EmbedRequest, EmbedResponse, EmbedBatchRequest, EmbedBatchResponse, IngestRequest, IngestResponse, IngestStoredResponse, IngestDeltaRequest, IngestDeltaResponse, DeltaChunk, FileIngestRequest, IngestJobRequest, IngestJobResponse, IngestJobStatus, RAGRequest, RAGResponse, ChunkData, RerankRequest, RerankResponse, PlanRequest, PlanResponse, ModelSwapRequest, SearchRequest, SearchHit, SearchResponse, AnswerRequest, AnswerChunk, AnswerResponse, AnswerCacheInvalidateRequest
 from .services import AIService
 
 __all__ = [
     "EmbedRequest", 
     "EmbedResponse", 
+    "EmbedBatchRequest",
+    "EmbedBatchResponse",
     "IngestRequest", 
     "IngestResponse", 
+    "IngestStoredResponse",
+    "IngestDeltaRequest",
+    "IngestDeltaResponse",
+    "DeltaChunk",
+    "FileIngestRequest",
+    "IngestJobRequest",
+    "IngestJobResponse",
+    "IngestJobStatus",
     "RAGRequest", 
     "RAGResponse",
     "ChunkData",
@@ -16,5 +26,13 @@ __all__ = [
     "RerankResponse",
     "PlanRequest",
     "PlanResponse",
+    "ModelSwapRequest",
+    "SearchRequest",
+    "SearchHit",
+    "SearchResponse",
+    "AnswerRequest",
+    "AnswerChunk",
+    "AnswerResponse",
+    "AnswerCacheInvalidateRequest",
     "AIService"
 ]
@@ -0,0 +1,111 @@
+# Compact wire formats for embedding vectors, chosen via the Accept header:
+# - application/json (default): float lists
+# - application/vnd.securedoc.embedding+json: each vector as base64 little-endian bytes
+# - application/octet-stream: raw row-major matrix, shape/dtype in X-Embedding-* headers
+# Compact formats take a `dtype=float16|float32` media-type parameter.
+import base64
+from dataclasses import dataclass
+from typing import List, Sequence, Union
+
+import numpy as np
+from fastapi.responses import JSONResponse, Response
+
+BASE64_MEDIA_TYPE = "application/vnd.securedoc.embedding+json"
+BINARY_MEDIA_TYPE = "application/octet-stream"
+
+DTYPES = {"float32": "<f4", "float16": "<f2"}
+
+
+@dataclass(frozen=True)
+class EmbeddingFormat:
+    kind: str = "json"  # json | base64 | binary
+    dtype: str = "float32"
+
+
+def negotiate(accept: str, allow_binary: bool = True) -> EmbeddingFormat:
+    """
+    Picks the first compact format listed in the Accept header, else JSON.
+    """
+    for media_range in (accept or "").split(","):
+        parts = [p.strip() for p in media_range.split(";")]
+        media_type = parts[0].lower()
+        params = dict(p.split("=", 1) for p in parts[1:] if "=" in p)
+        dtype = params.get("dtype", "float32").strip().lower()
+        if dtype not in DTYPES:
+            dtype = "float32"
+
+        if media_type == BASE64_MEDIA_TYPE:
+            return EmbeddingFormat("base64", dtype)
+        if media_type == BINARY_MEDIA_TYPE and allow_binary:
+            return EmbeddingFormat("binary", dtype)
+    return EmbeddingFormat()
+
+
+def to_matrix(vectors: Union[np.ndarray, Sequence[Sequence[float]]], dtype: str = "float32") -> np.ndarray:
+    """
+    Returns a C-contiguous little-endian (n, dim) matrix in the wire dtype.
+    """
+    matrix = np.asarray(vectors, dtype=DTYPES[dtype])
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    return np.ascontiguousarray(matrix)
+
+
+def b64_rows(matrix: np.ndarray) -> List[str]:
+    return [base64.b64encode(row.tobytes()).decode("ascii") for row in matrix]
+
+
+def decode_b64(data: str, dtype: str = "float32") -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=DTYPES[dtype])
+
+
+def _encoding_header(fmt: EmbeddingFormat, matrix: np.ndarray) -> dict:
+    return {"dtype": fmt.dtype, "byteorder": "little", "dim": int(matrix.shape[1]) if matrix.size else 0}
+
+
+def binary_response(matrix: np.ndarray, fmt: EmbeddingFormat) -> Response:
+    return Response(
+        content=matrix.tobytes(),
+        media_type=BINARY_MEDIA_TYPE,
+        headers={
+            "X-Embedding-Count": str(matrix.shape[0]),
+            "X-Embedding-Dim": str(matrix.shape[1] if matrix.size else 0),
+            "X-Embedding-Dtype": fmt.dtype,
+        },
+    )
+
+
+def embeddings_response(vectors, fmt: EmbeddingFormat, key: str = "embeddings", single: bool = False) -> Response:
+    """
+    Encodes one vector (single=True) or a list of vectors for /embed and /embed/batch.
+    """
+    matrix = to_matrix(vectors, fmt.dtype)
+    if fmt.kind == "binary":
+        return binary_response(matrix, fmt)
+
+    rows = b64_rows(matrix)
+    return JSONResponse(
+        media_type=BASE64_MEDIA_TYPE,
+        content={key: rows[0] if single else rows, "encoding": _encoding_header(fmt, matrix)},
+    )
+
+
+def ingest_response(document_metadata: dict, chunks: List[dict], timings: dict, fmt: EmbeddingFormat) -> Response:
+    """
+    /ingest envelope with each chunk's embedding as a base64 string.
+    """
+    matrix = to_matrix([c["embedding"] for c in chunks], fmt.dtype) if chunks else np.zeros((0, 0), dtype=DTYPES[fmt.dtype])
+    rows = b64_rows(matrix)
+    encoded_chunks = [
+        {"content": c["content"], "embedding": row, "metadata": c.get("metadata", {})}
+        for c, row in zip(chunks, rows)
+    ]
+    return JSONResponse(
+        media_type=BASE64_MEDIA_TYPE,
+        content={
+            "document_metadata": document_metadata,
+            "chunks": encoded_chunks,
+            "timings": timings,
+            "encoding": _encoding_header(fmt, matrix),
+        },
+    )
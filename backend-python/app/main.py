@@ -1,12 +1,27 @@
 import logging
 import asyncio
+import codecs
+import json
+import os
+import uuid
 
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, HTTPException, Request, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from .config import settings
+from .rag.concurrency import QueueFullError
+from .rag.gateway import LLMGateway
+from .rag.bucketing import LengthBucketer
+from .rag.cache import AnswerCache, EmbeddingCache, ScoreCache
+from .rag.chunking import check_strategy
+from .rag.compression import check_method
+from .rag.factory import RAGFactory
+from .rag.retrieval import RetrievalService
+from . import encoding
+from .services import FILE_INGEST_TARGETS
 # Facade Import (Simpler)
-from . import EmbedRequest, EmbedResponse, RAGRequest, RAGResponse, IngestRequest, IngestResponse, RerankRequest, RerankResponse, PlanRequest, PlanResponse, AIService
+from . import EmbedRequest, EmbedResponse, EmbedBatchRequest, EmbedBatchResponse, RAGRequest, RAGResponse, IngestRequest, IngestResponse, IngestStoredResponse, IngestDeltaRequest, IngestDeltaResponse, FileIngestRequest, IngestJobRequest, IngestJobResponse, IngestJobStatus, RerankRequest, RerankResponse, PlanRequest, PlanResponse, ModelSwapRequest, SearchRequest, SearchResponse, AnswerRequest, AnswerResponse, AnswerCacheInvalidateRequest, AIService
 
 logging.basicConfig(
     level=settings.log_level,
@@ -19,12 +34,20 @@ logger = logging.getLogger("ai_service")
 async def lifespan(app: FastAPI):
     # Load models when app starts
     logger.info("Starting AI Service...")
-    AIService.initialize()
+    warmup_task = None
+    if settings.warmup_enabled:
+        # Load models in the background so /health and /ready answer during warm-up
+        warmup_task = asyncio.create_task(AIService.warm_up())
+    else:
+        AIService.initialize()
     
     yield
     
     # Cleanup on exit
     logger.info("Shutting down AI Service...")
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    await AIService.shutdown()
 
 app = FastAPI(
     title=settings.app_name,
@@ -37,6 +60,36 @@ def health_check():
 
 
 
+@app.get("/ready", tags=["System"])
+def readiness_check():
+    report = AIService.readiness()
+    if not settings.warmup_enabled:
+        report["ready"] = True
+    status_code = status.HTTP_200_OK if report["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(status_code=status_code, content=report)
+
+@app.get("/models", tags=["System"])
+def list_models():
+    return RAGFactory.stats()
+
+@app.post("/models/{name}/unload", tags=["System"])
+def unload_model(name: str):
+    if name not in RAGFactory.stats():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown model: {name}")
+    RAGFactory.unload(name)
+    return RAGFactory.stats()[name]
+
+@app.post("/models/{name}/swap", tags=["System"])
+def swap_model(name: str, request: ModelSwapRequest):
+    if name not in RAGFactory.stats():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown model: {name}")
+    try:
+        RAGFactory.swap(name, request.model_name)
+        return RAGFactory.stats()[name]
+    except Exception as e:
+        logger.error(f"Model swap failed for {name}: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     import traceback
@@ -46,16 +99,19 @@ async def global_exception_handler(request, exc):
         content={"message": "Internal Server Error from Global Handler"},
     )
 
-from fastapi.responses import JSONResponse
 
 @app.post("/embed", response_model=EmbedResponse, tags=["AI Capabilities"])
-async def create_embedding(request: EmbedRequest):
+async def create_embedding(request: EmbedRequest, raw_request: Request):
     # CPU-bound operation: 
     # explicit async + to_thread is cleaner then using FastAPI's default threadpool.
+    # Concurrent requests are coalesced into micro-batches (see EmbeddingBatcher).
     try:
         logger.info(f"Embed request for text: {request.text[:50]}...")
-        vector = await asyncio.to_thread(AIService.get_embedding, request.text)
+        vector = await AIService.embed_query(request.text)
         logger.info(f"Vector generated: {type(vector)}, Len: {len(vector) if vector else 'None'}")
+        fmt = encoding.negotiate(raw_request.headers.get("accept", ""))
+        if fmt.kind != "json":
+            return encoding.embeddings_response([vector], fmt, key="embedding", single=True)
         return EmbedResponse(embedding=vector)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -64,38 +120,361 @@ async def create_embedding(request: EmbedRequest):
         logger.error(f"Stack trace: {traceback.format_exc()}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal processing error")
 
+@app.post("/embed/batch", response_model=EmbedBatchResponse, tags=["AI Capabilities"])
+async def create_embeddings_batch(request: EmbedBatchRequest, raw_request: Request):
+    try:
+        logger.info(f"Batch embed request for {len(request.texts)} texts")
+        fmt = encoding.negotiate(raw_request.headers.get("accept", ""))
+        if fmt.kind != "json":
+            # Encoded straight from the float32 matrix, no per-float JSON
+            matrix = await asyncio.to_thread(AIService.get_embeddings_array, request.texts)
+            return encoding.embeddings_response(matrix, fmt)
+        vectors = await asyncio.to_thread(AIService.get_embeddings, request.texts)
+        return EmbedBatchResponse(embeddings=vectors)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Batch embed failed: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal processing error")
+
+@app.get("/embed/stats", tags=["System"])
+def embedding_stats():
+    return AIService.get_embed_batcher().stats()
+
+@app.get("/cache/stats", tags=["System"])
+def cache_stats():
+    return {"embedding": EmbeddingCache.instance().stats(), "rerank": ScoreCache.instance().stats()}
+
+@app.get("/batching/stats", tags=["System"])
+def batching_stats():
+    return {name: LengthBucketer.instance(name).stats() for name in ("rerank", "embed")}
+
+@app.get("/ask/stats", tags=["System"])
+def generation_stats():
+    return AIService.get_generation_limiter().stats()
+
+@app.get("/llm/stats", tags=["System"])
+def llm_stats():
+    return LLMGateway.instance().stats()
+
+@app.get("/ask/cache/stats", tags=["System"])
+def answer_cache_stats():
+    return AnswerCache.instance().stats()
+
+@app.post("/ask/cache/invalidate", tags=["System"])
+def invalidate_answer_cache(request: AnswerCacheInvalidateRequest):
+    """
+    Drops cached answers built on the given chunks (e.g. after the documents
+    were changed in Postgres), or every cached answer when no chunks are given.
+    """
+    cache = AnswerCache.instance()
+    if request.chunks is None:
+        entries = cache.stats()["entries"]
+        cache.clear()
+        return {"invalidated": entries}
+    return {"invalidated": cache.invalidate_texts(request.chunks)}
+
+def _check_document_uuid(document_id, required: bool = False):
+    """
+    document_chunks.document_id references documents(id), a UUID.
+    """
+    if not document_id:
+        if required:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="metadata.document_id (UUID) is required")
+        return
+    try:
+        uuid.UUID(str(document_id))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"document_id must be a UUID, got {document_id!r}")
+
+def _ingest_metadata(request: IngestRequest) -> dict:
+    """
+    Request metadata with the per-request chunking strategy folded in.
+    """
+    strategy = request.chunking or request.metadata.get("chunking_strategy")
+    if not strategy:
+        return request.metadata
+    try:
+        return {**request.metadata, "chunking_strategy": check_strategy(strategy)}
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
 @app.post("/ingest", response_model=IngestResponse, tags=["AI Capabilities"])
-async def ingest_document(request: IngestRequest):
+async def ingest_document(request: IngestRequest, raw_request: Request):
+    metadata = _ingest_metadata(request)
     try:
-        # Metadata extraction
-        extracted_meta = await AIService.extract_metadata(request.text)
-        
-        # Merge with request metadata, prioritizing request-provided values
-        final_doc_metadata = {**extracted_meta, **request.metadata}
-        
-        # Embed and store chunks
-        chunks = await asyncio.to_thread(AIService.process_document, request.text, final_doc_metadata)
+        timings = {}
+
+        # Metadata extraction (LLM) and chunk+embed (CPU) run concurrently
+        final_doc_metadata, chunks = await AIService.ingest_document(request.text, metadata, timings)
+        logger.info(f"Ingest timings: {timings}")
         
-        return IngestResponse(document_metadata=final_doc_metadata, chunks=chunks)
+        fmt = encoding.negotiate(raw_request.headers.get("accept", ""), allow_binary=False)
+        if fmt.kind == "base64":
+            return encoding.ingest_response(final_doc_metadata, chunks, timings, fmt)
+        return IngestResponse(document_metadata=final_doc_metadata, chunks=chunks, timings=timings)
     except Exception as e:
         logger.error(f"Ingest failed: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
+async def _text_parts(raw_request: Request):
+    """
+    Text pieces of a streamed request body: either NDJSON lines of
+    {"text": "..."} (application/x-ndjson) or raw UTF-8 text.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    if raw_request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        pending = ""
+        async for data in raw_request.stream():
+            pending += decoder.decode(data)
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line).get("text", "")
+        pending += decoder.decode(b"", final=True)
+        if pending.strip():
+            yield json.loads(pending).get("text", "")
+        return
+
+    async for data in raw_request.stream():
+        text = decoder.decode(data)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+class _BodyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse for generators that are still reading the request body.
+    The default one listens for disconnects on `receive` concurrently, which
+    would swallow body messages; here a disconnect surfaces as ClientDisconnect
+    from request.stream() instead.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+@app.post("/ingest/stream", tags=["AI Capabilities"])
+async def ingest_stream(raw_request: Request):
+    """
+    Streaming ingest for very large documents. The body is the document as
+    raw text or as NDJSON {"text": ...} parts, sent in any number of pieces
+    (e.g. chunked transfer encoding); metadata goes in the X-Document-Metadata
+    header as JSON. The response is NDJSON: "chunk" events as chunks are
+    embedded, one "metadata" event, then "done" (or "error").
+    """
+    try:
+        metadata = json.loads(raw_request.headers.get("x-document-metadata") or "{}")
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="X-Document-Metadata must be a JSON object")
+    if not isinstance(metadata, dict):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="X-Document-Metadata must be a JSON object")
+
+    async def event_stream():
+        events = AIService.ingest_stream(_text_parts(raw_request), metadata)
+        try:
+            async for event in events:
+                yield json.dumps(event) + "\n"
+        finally:
+            await events.aclose()
+
+    return _BodyStreamingResponse(event_stream(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+@app.post("/ingest/files", tags=["AI Capabilities"])
+async def ingest_files(request: FileIngestRequest):
+    """
+    Batch ingestion of server-side files or directories (below
+    file_ingest_root), parsed by Docling worker processes. The response is
+    NDJSON: "start", one "file" event per file, then "done" with files/min.
+    Parsing shares one Docling pool, so at most file_ingest_max_concurrent
+    requests run at once and further ones get a 429.
+    """
+    root = os.path.realpath(settings.file_ingest_root)
+    paths = [os.path.realpath(os.path.join(root, path)) for path in request.paths]
+    outside = [p for p, real in zip(request.paths, paths) if os.path.commonpath([root, real]) != root]
+    if outside:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"Paths outside file_ingest_root: {outside}")
+    missing = [p for p, real in zip(request.paths, paths) if not os.path.exists(real)]
+    if missing:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Paths not found: {missing}")
+    if request.target not in FILE_INGEST_TARGETS:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Unknown target '{request.target}'")
+
+    events = AIService.ingest_files(paths, request.metadata, request.target, request.recursive, request.extract_metadata)
+    try:
+        # The first event only comes once a file ingest slot is free
+        first = await events.__anext__()
+    except QueueFullError as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
+
+    async def event_stream():
+        try:
+            yield json.dumps(first) + "\n"
+            async for event in events:
+                yield json.dumps(event) + "\n"
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+@app.post("/ingest/incremental", response_model=IngestDeltaResponse, tags=["AI Capabilities"])
+async def ingest_incremental(request: IngestDeltaRequest):
+    """
+    Re-ingests a new version of a document and returns the chunk delta:
+    only added chunks are embedded and returned, removed/kept are chunk ids.
+    With store=true the delta is applied to document_chunks, where each chunk
+    carries its chunk_id and chunk_hash in metadata.
+    """
+    if not (request.metadata.get("document_id") or request.metadata.get("filename")):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="metadata.document_id or metadata.filename is required")
+    if request.store:
+        _check_document_uuid(request.metadata.get("document_id"), required=True)
+    metadata = _ingest_metadata(request)
+    try:
+        timings = {}
+        result = await AIService.ingest_incremental(request.text, metadata, timings, request.store)
+        return IngestDeltaResponse(**result, timings=timings)
+    except Exception as e:
+        logger.error(f"Incremental ingest failed: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+@app.post("/ingest/store", response_model=IngestStoredResponse, tags=["AI Capabilities"])
+async def ingest_and_store(request: IngestRequest):
+    """
+    Chunks and embeds like /ingest, but writes the chunks to document_chunks
+    (binary COPY) and returns only their ids. metadata.document_id (UUID)
+    links them to their document and replaces any earlier chunks of it.
+    """
+    _check_document_uuid(request.metadata.get("document_id"))
+    metadata = _ingest_metadata(request)
+    try:
+        timings = {}
+        result = await AIService.ingest_and_store(request.text, metadata, timings)
+        logger.info(f"Ingest+store timings: {timings}")
+        return IngestStoredResponse(**result, timings=timings)
+    except Exception as e:
+        logger.error(f"Ingest+store failed: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+@app.post("/ingest/jobs", response_model=IngestJobResponse, status_code=status.HTTP_202_ACCEPTED, tags=["AI Capabilities"])
+async def submit_ingest_job(request: IngestJobRequest):
+    metadata = _ingest_metadata(request)
+    try:
+        job_id = await AIService.get_ingest_jobs().submit(request.text, metadata, request.priority)
+        return IngestJobResponse(job_id=job_id, status="queued")
+    except QueueFullError as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
+    except Exception as e:
+        logger.error(f"Submitting ingest job failed: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+@app.get("/ingest/jobs/{job_id}", response_model=IngestJobStatus, tags=["AI Capabilities"])
+async def get_ingest_job(job_id: str):
+    job = await AIService.get_ingest_jobs().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown ingest job: {job_id}")
+    return IngestJobStatus(job_id=job.pop("id"), **job)
+
+def _check_compression(request: RAGRequest):
+    if request.compression:
+        try:
+            check_method(request.compression)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
 
 @app.post("/ask", response_model=RAGResponse, tags=["AI Capabilities"])
 async def ask_llm(request: RAGRequest):
+    _check_compression(request)
     try:
-        response_data = await AIService.ask_llm(request.question, request.context)
+        response_data = await AIService.ask_llm(request.question, request.context, request.compression)
         
         # Handle both dict (new) and string (legacy/fallback) returns
         if isinstance(response_data, dict):
-            return RAGResponse(answer=response_data["answer"], sources=response_data.get("sources", []))
+            return RAGResponse(
+                answer=response_data["answer"],
+                sources=response_data.get("sources", []),
+                cached=response_data.get("cached", False),
+                compression=response_data.get("compression")
+            )
         else:
             return RAGResponse(answer=str(response_data), sources=[])
+    except QueueFullError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     except Exception as e:
         logger.error(f"Ask LLM failed: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
+@app.post("/answer", response_model=AnswerResponse, tags=["AI Capabilities"])
+async def answer(request: AnswerRequest):
+    """
+    Retrieval, rerank and generation in one call (replaces plan/embed/search/rerank/ask round trips).
+    """
+    try:
+        timings = {}
+        result = await AIService.answer(request.question, request.top_k, request.filters, timings)
+        return AnswerResponse(**result, timings=timings)
+    except QueueFullError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    except Exception as e:
+        logger.error(f"Answer failed: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+async def _until_disconnected(raw_request: Request, events, poll_interval: float = 0.1):
+    """
+    Yields from `events` while the client is connected. Every next event is
+    raced against a disconnect watcher, so a client that leaves while its
+    request waits for a generation slot or for the first token cancels it
+    right away instead of only at the next event.
+    """
+    async def disconnected():
+        while not await raw_request.is_disconnected():
+            await asyncio.sleep(poll_interval)
+
+    watcher = asyncio.ensure_future(disconnected())
+    try:
+        while True:
+            step = asyncio.ensure_future(events.__anext__())
+            await asyncio.wait({step, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if not step.done():
+                logger.info("Client disconnected, cancelling generation.")
+                # Cancels the generator where it waits, which releases its slot
+                step.cancel()
+                await asyncio.gather(step, return_exceptions=True)
+                return
+            try:
+                event = step.result()
+            except StopAsyncIteration:
+                return
+            yield event
+    finally:
+        watcher.cancel()
+
+@app.post("/ask/stream", tags=["AI Capabilities"])
+async def ask_llm_stream(request: RAGRequest, raw_request: Request):
+    """
+    Server-sent events: "token" events with a text delta, then one "done"
+    event with sources and timing (or an "error" event).
+    """
+    _check_compression(request)
+
+    async def event_stream():
+        events = AIService.stream_llm(request.question, request.context, request.compression)
+        try:
+            async for event in _until_disconnected(raw_request, events):
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            # Closes the Ollama stream as well
+            await events.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/rerank", response_model=RerankResponse, tags=["AI Capabilities"])
 async def rerank_documents(request: RerankRequest):
     try:
@@ -105,6 +484,37 @@ async def rerank_documents(request: RerankRequest):
         logger.error(f"Rerank failed: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
+def _require_vector_index():
+    if not settings.vector_index_enabled:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Vector index is disabled (vector_index_enabled)")
+
+@app.post("/search", response_model=SearchResponse, tags=["AI Capabilities"])
+async def search(request: SearchRequest):
+    _require_vector_index()
+    try:
+        timings = {}
+        hits = await AIService.search(request.query, request.top_k, request.document_ids, timings)
+        return SearchResponse(results=hits, timings=timings)
+    except Exception as e:
+        logger.error(f"Search failed: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+@app.get("/search/stats", tags=["System"])
+def search_stats():
+    _require_vector_index()
+    return RetrievalService.stats()
+
+@app.post("/index/snapshot", tags=["System"])
+async def snapshot_index():
+    _require_vector_index()
+    await asyncio.to_thread(RetrievalService.snapshot)
+    return RetrievalService.stats()
+
+@app.delete("/index/documents/{document_id}", tags=["System"])
+def delete_indexed_document(document_id: str):
+    _require_vector_index()
+    return {"document_id": document_id, "removed": RetrievalService.remove_document(document_id)}
+
 @app.post("/plan", response_model=PlanResponse, tags=["AI Capabilities"])
 def plan_query_endpoint(request: PlanRequest):
     try:
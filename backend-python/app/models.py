@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel, Field
 
 class EmbedRequest(BaseModel):
@@ -7,17 +7,27 @@ class EmbedRequest(BaseModel):
 class EmbedResponse(BaseModel):
     embedding: List[float]
 
+class EmbedBatchRequest(BaseModel):
+    texts: List[str] = Field(..., min_length=1, description="Texts to embed in one forward pass")
+
+class EmbedBatchResponse(BaseModel):
+    embeddings: List[List[float]]
+
 class RAGRequest(BaseModel):
     question: str = Field(..., min_length=1)
     context: str = Field(default="", description="Retrieved context or empty string")
+    compression: Optional[str] = Field(default=None, description="Context compression: none, budget, extractive or llmlingua (default context_compression)")
 
 class RAGResponse(BaseModel):
     answer: str
     sources: List[str] = []
+    cached: bool = Field(default=False, description="Served from the answer cache instead of a new generation")
+    compression: Optional[dict] = Field(default=None, description="Context compression method and prompt tokens before/after")
 
 class IngestRequest(BaseModel):
     text: str
     metadata: dict = {}
+    chunking: Optional[str] = Field(default=None, description="semantic | sentence_similarity | token | recursive (default: by document type, then settings)")
 
 class ChunkData(BaseModel):
     content: str
@@ -27,6 +37,57 @@ class ChunkData(BaseModel):
 class IngestResponse(BaseModel):
     document_metadata: dict = {}
     chunks: List[ChunkData]
+    timings: dict = Field(default={}, description="Per-stage durations in ms (metadata, split, embed, total)")
+
+class IngestStoredResponse(BaseModel):
+    document_id: Optional[str] = None
+    chunk_ids: List[int] = []
+    chunk_count: int = 0
+    document_metadata: dict = {}
+    timings: dict = Field(default={}, description="Per-stage durations in ms (metadata, split, embed, store, total)")
+
+class IngestDeltaRequest(IngestRequest):
+    store: bool = Field(default=False, description="Diff against and apply the delta to document_chunks (metadata.document_id must be a UUID)")
+
+class DeltaChunk(ChunkData):
+    id: str
+
+class IngestDeltaResponse(BaseModel):
+    document_id: str
+    document_metadata: dict = {}
+    added: List[DeltaChunk] = []
+    removed: List[str] = Field(default=[], description="Chunk ids of the previous version to delete (document_chunks metadata.chunk_id)")
+    kept: List[str] = Field(default=[], description="Chunk ids that are unchanged")
+    stored_ids: List[int] = Field(default=[], description="document_chunks ids of the added chunks (store=true)")
+    deleted_rows: int = Field(default=0, description="document_chunks rows deleted (store=true)")
+    timings: dict = {}
+
+class FileIngestRequest(BaseModel):
+    paths: List[str] = Field(..., description="Files or directories under file_ingest_root")
+    recursive: bool = True
+    metadata: dict = {}
+    target: str = Field(default="index", description="index | postgres (NULL document_id, keyed by metadata file_path) | none")
+    extract_metadata: bool = False
+
+class IngestJobRequest(IngestRequest):
+    priority: int = Field(default=0, description="Higher values are processed first")
+
+class IngestJobResponse(BaseModel):
+    job_id: str
+    status: str
+
+class IngestJobStatus(BaseModel):
+    job_id: str
+    status: str
+    stage: str
+    priority: int = 0
+    chunks_done: int = 0
+    chunks_total: int = 0
+    queue_depth: Optional[int] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+    result: Optional[IngestResponse] = None
 
 class RerankRequest(BaseModel):
     query: str = Field(..., min_length=1)
@@ -48,3 +109,46 @@ class PlanResponse(BaseModel):
     rewritten_question: str
     intent: str
     filters: dict = {}
+
+class ModelSwapRequest(BaseModel):
+    model_name: str = Field(..., min_length=1)
+
+class SearchRequest(BaseModel):
+    query: str = Field(..., min_length=1)
+    top_k: int = Field(default=5, ge=1, le=1000)
+    document_ids: Optional[List[str]] = Field(default=None, description="Restrict the search to these documents")
+
+class SearchHit(BaseModel):
+    id: str
+    score: float
+    document_id: str
+    content: str = ""
+    metadata: dict = {}
+
+class SearchResponse(BaseModel):
+    results: List[SearchHit]
+    timings: dict = Field(default={}, description="embed_ms, search_ms")
+
+class AnswerRequest(BaseModel):
+    question: str = Field(..., min_length=1)
+    top_k: Optional[int] = Field(default=None, ge=1, le=50, description="Chunks passed to the LLM (default answer_context_chunks)")
+    filters: dict = Field(default={}, description="JSONB containment filter on chunk metadata")
+
+class AnswerChunk(BaseModel):
+    id: str
+    source_file: Optional[str] = None
+    page_label: Optional[str] = None
+    score: float
+    rrf_score: float
+    ranks: dict = {}
+
+class AnswerResponse(BaseModel):
+    answer: str
+    sources: List[str] = []
+    chunks: List[AnswerChunk] = []
+    cached: bool = Field(default=False, description="Served from the answer cache instead of a new generation")
+    compression: Optional[dict] = Field(default=None, description="Context compression method and prompt tokens before/after")
+    timings: dict = Field(default={}, description="Per-stage durations in ms (embed, search, fuse, rerank, generate, total)")
+
+class AnswerCacheInvalidateRequest(BaseModel):
+    chunks: Optional[List[str]] = Field(default=None, description="Chunk texts whose cached answers are dropped; omit to clear the cache")
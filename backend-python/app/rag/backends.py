@@ -0,0 +1,169 @@
+import logging
+import os
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from sentence_transformers import CrossEncoder, SentenceTransformer
+
+import torch
+
+from ..config import settings
+
+logger = logging.getLogger("rag_backends")
+
+# torch: sentence-transformers on PyTorch (mps/cpu)
+# onnx: sentence-transformers on ONNX Runtime, optionally int8 dynamic quantized
+# fastembed: fastembed's ONNX Runtime models (no torch at inference time)
+BACKENDS = ("torch", "onnx", "fastembed")
+
+
+def _check_backend(backend: str) -> str:
+    backend = (backend or "torch").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKENDS}")
+    return backend
+
+
+def backend_tag(backend: str = None) -> str:
+    """
+    Names the configured runtime and precision, e.g. "torch" or
+    "onnx-qint8_avx512_vnni"; the same model produces slightly different
+    vectors under each.
+    """
+    backend = _check_backend(backend or settings.inference_backend)
+    if backend == "onnx":
+        return f"onnx-qint8_{settings.onnx_quantization_config}" if settings.onnx_quantize else "onnx-fp32"
+    return backend
+
+
+def quantized_file_name(config: str = None) -> str:
+    """
+    File name sentence-transformers uses for an int8 dynamic quantized export.
+    """
+    return f"onnx/model_qint8_{config or settings.onnx_quantization_config}.onnx"
+
+
+def _hub_has_file(model_name: str, file_name: str) -> bool:
+    if os.path.isdir(model_name):
+        return os.path.exists(os.path.join(model_name, file_name))
+    try:
+        from huggingface_hub import file_exists
+        return file_exists(model_name, file_name)
+    except Exception as e:
+        logger.warning(f"Could not check {model_name} for {file_name}: {e}")
+        return False
+
+
+def _quantized_model(model_cls, model_name: str) -> Tuple[str, str]:
+    """
+    Returns (path, file_name) of an int8 ONNX export of `model_name`.
+    Uses the hub file when the repo ships one, otherwise quantizes the fp32
+    ONNX export once into `onnx_export_dir` and reuses it on later starts.
+    """
+    file_name = quantized_file_name()
+    local_dir = os.path.join(settings.onnx_export_dir, model_name.replace("/", "__"))
+    if os.path.exists(os.path.join(local_dir, file_name)):
+        return local_dir, file_name
+
+    if _hub_has_file(model_name, file_name):
+        return model_name, file_name
+
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    logger.info(f"No published {file_name} for {model_name}, quantizing into {local_dir}")
+
+    model = model_cls(model_name, backend="onnx", device="cpu")
+    model.save_pretrained(local_dir)
+    export_dynamic_quantized_onnx_model(model, settings.onnx_quantization_config, local_dir)
+    return local_dir, file_name
+
+
+def _onnx_kwargs(model_cls, model_name: str) -> Tuple[str, dict]:
+    if not settings.onnx_quantize:
+        return model_name, {"backend": "onnx"}
+    path, file_name = _quantized_model(model_cls, model_name)
+    return path, {"backend": "onnx", "model_kwargs": {"file_name": file_name}}
+
+
+class FastEmbedEmbedding(BaseEmbedding):
+    """
+    llama-index embedding model backed by fastembed's ONNX Runtime models.
+    """
+    _model: Any = PrivateAttr()
+
+    def __init__(self, model_name: str, threads: Optional[int] = None, embed_batch_size: int = 32, **kwargs):
+        from fastembed import TextEmbedding
+
+        super().__init__(model_name=model_name, embed_batch_size=embed_batch_size, **kwargs)
+        self._model = TextEmbedding(model_name=model_name, threads=threads)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FastEmbedEmbedding"
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._get_text_embeddings([query])[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return [vector.tolist() for vector in self._model.embed(texts, batch_size=self.embed_batch_size)]
+
+
+class FastEmbedReranker:
+    """
+    Cross-encoder on fastembed exposing CrossEncoder.predict(pairs).
+    Logits go through a sigmoid so scores match the torch CrossEncoder.
+    """
+
+    def __init__(self, model_name: str, threads: Optional[int] = None, batch_size: int = 32):
+        from fastembed.rerank.cross_encoder import TextCrossEncoder
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._model = TextCrossEncoder(model_name=model_name, threads=threads)
+
+    def predict(self, pairs: Sequence[Sequence[str]], **kwargs) -> np.ndarray:
+        pairs = [(query, passage) for query, passage in pairs]
+        if not pairs:
+            return np.zeros(0, dtype=np.float32)
+        logits = np.fromiter(self._model.rerank_pairs(pairs, batch_size=self.batch_size), dtype=np.float32)
+        return 1.0 / (1.0 + np.exp(-logits))
+
+
+def build_embedding_model(model_name: str, backend: str = None):
+    backend = _check_backend(backend or settings.inference_backend)
+    logger.info(f"Embedding backend: {backend}")
+
+    if backend == "fastembed":
+        return FastEmbedEmbedding(model_name=model_name, threads=settings.inference_threads)
+
+    if backend == "onnx":
+        path, kwargs = _onnx_kwargs(SentenceTransformer, model_name)
+        return HuggingFaceEmbedding(model_name=path, device="cpu", **kwargs)
+
+    # Check device availability (MPS for Mac M-series, but Docker Linux uses CPU)
+    device = "mps" if torch.backends.mps.is_available() else "cpu"
+    logger.info(f"Using device: {device}")
+    return HuggingFaceEmbedding(model_name=model_name, device=device)
+
+
+def build_reranker(model_name: str, backend: str = None):
+    backend = _check_backend(backend or settings.inference_backend)
+    logger.info(f"Reranker backend: {backend}")
+
+    if backend == "fastembed":
+        return FastEmbedReranker(model_name=model_name, threads=settings.inference_threads)
+
+    if backend == "onnx":
+        path, kwargs = _onnx_kwargs(CrossEncoder, model_name)
+        return CrossEncoder(path, device="cpu", **kwargs)
+
+    return CrossEncoder(model_name)
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("rag_batching")
+
+# Upper bounds of the batch-size histogram buckets (last bucket is open-ended)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+class EmbeddingBatcher:
+    """
+    Dynamic micro-batcher for single-text embedding requests.
+
+    Concurrent callers of `embed()` are queued and a single worker task
+    collects them for up to `window_ms` (or until `max_batch_size` items
+    are waiting) before sending them through one batched forward pass.
+    While a batch is running, new requests keep queueing, so batches grow
+    naturally with load.
+    """
+
+    def __init__(
+        self,
+        embed_batch_fn: Callable[[List[str]], List[List[float]]],
+        window_ms: float = 5.0,
+        max_batch_size: int = 32,
+    ):
+        self._embed_batch_fn = embed_batch_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # Stats
+        self._histogram: Dict[str, int] = {self._bucket_label(b): 0 for b in BATCH_SIZE_BUCKETS}
+        self._histogram[f">{BATCH_SIZE_BUCKETS[-1]}"] = 0
+        self._batches = 0
+        self._items = 0
+        self._max_queue_depth = 0
+        self._total_batch_seconds = 0.0
+
+    @staticmethod
+    def _bucket_label(bound: int) -> str:
+        return f"<={bound}"
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def embed(self, text: str) -> List[float]:
+        """
+        Queues a single text and waits for its embedding.
+        """
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+        return await future
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.window
+
+        while len(batch) < self.max_batch_size:
+            # Drain whatever is already waiting before sleeping on the window
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Callers that went away (e.g. client disconnect) don't need a vector
+            batch = [(text, fut) for text, fut in batch if not fut.done()]
+            if not batch:
+                continue
+
+            texts = [text for text, _ in batch]
+            start = time.perf_counter()
+            try:
+                vectors = await asyncio.to_thread(self._embed_batch_fn, texts)
+            except Exception as e:
+                logger.error(f"Batched embedding failed for {len(texts)} texts: {e}")
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            finally:
+                self._record(len(texts), time.perf_counter() - start)
+
+            for (_, fut), vector in zip(batch, vectors):
+                if not fut.done():
+                    fut.set_result(vector)
+
+    def _record(self, size: int, seconds: float):
+        self._batches += 1
+        self._items += size
+        self._total_batch_seconds += seconds
+        for bound in BATCH_SIZE_BUCKETS:
+            if size <= bound:
+                self._histogram[self._bucket_label(bound)] += 1
+                return
+        self._histogram[f">{BATCH_SIZE_BUCKETS[-1]}"] += 1
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue_depth": self._max_queue_depth,
+            "batches": self._batches,
+            "items": self._items,
+            "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+            "avg_batch_ms": round(self._total_batch_seconds * 1000 / self._batches, 2) if self._batches else 0.0,
+            "batch_size_histogram": dict(self._histogram),
+            "window_ms": self.window * 1000.0,
+            "max_batch_size": self.max_batch_size,
+        }
+
+    async def stop(self):
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
@@ -0,0 +1,178 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from ..config import settings
+
+logger = logging.getLogger("rag_bucketing")
+
+
+def tokenizer_of(model: Any):
+    """
+    Hugging Face tokenizer behind a CrossEncoder, SentenceTransformer or
+    llama-index HuggingFaceEmbedding; None for backends that hide theirs.
+    """
+    from transformers import PreTrainedTokenizerBase
+
+    for candidate in (model, getattr(model, "_model", None)):
+        tokenizer = getattr(candidate, "tokenizer", None)
+        if isinstance(tokenizer, PreTrainedTokenizerBase):
+            return tokenizer
+    return None
+
+
+def _approx_tokens(text: str) -> int:
+    # ~4 characters per token for English WordPiece/BPE vocabularies
+    return len(text) // 4 + 2
+
+
+def text_lengths(model: Any, max_length: int = 512) -> Callable[[List[str]], List[int]]:
+    """
+    Returns a function mapping texts to their token counts under `model`'s tokenizer.
+    """
+    tokenizer = tokenizer_of(model)
+    if tokenizer is None:
+        return lambda texts: [min(max_length, _approx_tokens(t)) for t in texts]
+
+    def lengths(texts: List[str]) -> List[int]:
+        encoded = tokenizer(list(texts), truncation=True, max_length=max_length)
+        return [len(ids) for ids in encoded["input_ids"]]
+    return lengths
+
+
+def pair_lengths(model: Any, max_length: int = 512) -> Callable[[List[Sequence[str]]], List[int]]:
+    """
+    Like text_lengths, for (query, passage) pairs as a cross-encoder sees them.
+    """
+    tokenizer = tokenizer_of(model)
+    if tokenizer is None:
+        return lambda pairs: [min(max_length, _approx_tokens(q) + _approx_tokens(p)) for q, p in pairs]
+
+    def lengths(pairs: List[Sequence[str]]) -> List[int]:
+        encoded = tokenizer([q for q, _ in pairs], [p for _, p in pairs], truncation=True, max_length=max_length)
+        return [len(ids) for ids in encoded["input_ids"]]
+    return lengths
+
+
+class LengthBucketer:
+    """
+    Groups inputs of similar token length so batches carry little padding.
+
+    Inputs are sorted by length and assigned to buckets by `bounds`; each
+    bucket runs with its own batch size (about `max_batch_tokens` tokens per
+    batch, capped at `max_batch_size`), and results are put back in input order.
+    Real vs padded token counts are accumulated for stats().
+    """
+    _instances: Dict[str, "LengthBucketer"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, bounds: Sequence[int] = (32, 64, 128, 256, 512), max_batch_tokens: int = 8192, max_batch_size: int = 64):
+        self.bounds = sorted(bounds)
+        self.max_batch_tokens = max(1, max_batch_tokens)
+        self.max_batch_size = max(1, max_batch_size)
+        self._lock = threading.Lock()
+
+        # Stats
+        self._calls = 0
+        self._batches = 0
+        self._items = 0
+        self._tokens = 0
+        self._padded_tokens = 0
+        self._unbucketed_padded_tokens = 0
+
+    @classmethod
+    def instance(cls, name: str) -> "LengthBucketer":
+        """
+        Shared bucketer per workload ("rerank", "embed"), built from settings.
+        """
+        with cls._instances_lock:
+            if name not in cls._instances:
+                max_batch_size = settings.rerank_batch_size if name == "rerank" else settings.ingest_embed_batch_size
+                cls._instances[name] = cls(
+                    bounds=settings.length_bucket_bounds,
+                    max_batch_tokens=settings.length_bucket_max_tokens,
+                    max_batch_size=max_batch_size,
+                )
+            return cls._instances[name]
+
+    def _bucket(self, length: int) -> int:
+        for i, bound in enumerate(self.bounds):
+            if length <= bound:
+                return i
+        return len(self.bounds)
+
+    def plan(self, lengths: Sequence[int]) -> List[List[int]]:
+        """
+        Splits input positions into batches, shortest inputs first.
+        """
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+        buckets: Dict[int, List[int]] = {}
+        for i in order:
+            buckets.setdefault(self._bucket(lengths[i]), []).append(i)
+
+        batches = []
+        for bucket, positions in sorted(buckets.items()):
+            longest = lengths[positions[-1]]
+            size = max(1, min(self.max_batch_size, self.max_batch_tokens // max(1, longest)))
+            batches.extend(positions[j:j + size] for j in range(0, len(positions), size))
+        return batches
+
+    def run(
+        self,
+        items: Sequence[Any],
+        fn: Callable[[List[Any]], Sequence[Any]],
+        lengths: Sequence[int],
+        on_batch: Optional[Callable[[int], None]] = None,
+        report: Optional[dict] = None,
+    ) -> List[Any]:
+        """
+        Calls fn once per planned batch and returns its outputs in input order.
+        `on_batch(n)` is called after each batch of n items; token counts for
+        this call are written into `report` if given.
+        """
+        results: List[Any] = [None] * len(items)
+        tokens = padded = 0
+        batches = self.plan(lengths)
+        for batch in batches:
+            outputs = fn([items[i] for i in batch])
+            for i, output in zip(batch, outputs):
+                results[i] = output
+            batch_lengths = [lengths[i] for i in batch]
+            tokens += sum(batch_lengths)
+            padded += max(batch_lengths) * len(batch)
+            if on_batch:
+                on_batch(len(batch))
+
+        # What fixed-size batches in input order would have padded to
+        unbucketed = sum(
+            max(lengths[j:j + self.max_batch_size]) * len(lengths[j:j + self.max_batch_size])
+            for j in range(0, len(lengths), self.max_batch_size)
+        )
+        with self._lock:
+            self._calls += 1
+            self._batches += len(batches)
+            self._items += len(items)
+            self._tokens += tokens
+            self._padded_tokens += padded
+            self._unbucketed_padded_tokens += unbucketed
+        if report is not None:
+            report["tokens"] = report.get("tokens", 0) + tokens
+            report["padded_tokens"] = report.get("padded_tokens", 0) + padded
+            report["batches"] = report.get("batches", 0) + len(batches)
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self._calls,
+                "batches": self._batches,
+                "items": self._items,
+                "tokens": self._tokens,
+                "padded_tokens": self._padded_tokens,
+                "padding_tokens": self._padded_tokens - self._tokens,
+                "unbucketed_padded_tokens": self._unbucketed_padded_tokens,
+                "efficiency": round(self._tokens / self._padded_tokens, 4) if self._padded_tokens else None,
+                "bounds": list(self.bounds),
+                "max_batch_tokens": self.max_batch_tokens,
+                "max_batch_size": self.max_batch_size,
+            }
@@ -0,0 +1,515 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+from ..config import settings
+from .backends import backend_tag
+
+logger = logging.getLogger("rag_cache")
+
+# Rough per-entry bookkeeping cost (key string, OrderedDict slot, ndarray header)
+_ENTRY_OVERHEAD_BYTES = 200
+
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form used for cache keys: NFC, collapsed whitespace, trimmed.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache keyed by (model name, inference backend,
+    normalized text hash), so a backend or quantization change never serves
+    vectors from the previous runtime.
+
+    Tier 1 is an in-memory LRU bounded by a byte budget; tier 2 is an optional
+    SQLite file that survives restarts. Vectors are stored as float32.
+    """
+    _instance = None
+
+    def __init__(self, model_name: str, memory_budget_bytes: int, path: Optional[str] = None, backend: str = ""):
+        self.model_name = model_name
+        self.backend = backend
+        self.memory_budget_bytes = memory_budget_bytes
+        self.path = path
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits_memory = 0
+        self._hits_disk = 0
+        self._misses = 0
+        self._evictions = 0
+
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL)"
+                )
+
+    @classmethod
+    def instance(cls) -> "EmbeddingCache":
+        if cls._instance is None:
+            cls._instance = cls(
+                settings.embedding_model_name,
+                int(settings.embedding_cache_memory_mb * 1024 * 1024),
+                settings.embedding_cache_path,
+                backend_tag()
+            )
+        return cls._instance
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30.0)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def key(self, text: str) -> str:
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{self.model_name}:{self.backend}:{digest}"
+
+    def _remember(self, key: str, vector: np.ndarray):
+        # Caller holds the lock
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        self._entries[key] = vector
+        self._bytes += vector.nbytes + _ENTRY_OVERHEAD_BYTES
+        while self._bytes > self.memory_budget_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes + _ENTRY_OVERHEAD_BYTES
+            self._evictions += 1
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        keys = [self.key(t) for t in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+        missing = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    results[i] = vector
+                    self._hits_memory += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+
+        if missing and self.path:
+            found = self._load(list(missing))
+            with self._lock:
+                for key, vector in found.items():
+                    self._remember(key, vector)
+                    for i in missing.pop(key):
+                        results[i] = vector
+                        self._hits_disk += 1
+
+        with self._lock:
+            self._misses += sum(len(idx) for idx in missing.values())
+        return results
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]):
+        arrays = [np.asarray(v, dtype=np.float32) for v in vectors]
+        keys = [self.key(t) for t in texts]
+        with self._lock:
+            for key, array in zip(keys, arrays):
+                self._remember(key, array)
+        if self.path:
+            self._store(keys, arrays)
+
+    def _load(self, keys: List[str]) -> dict:
+        found = {}
+        try:
+            with self._connect() as conn:
+                # Stay well below SQLite's bound-parameter limit
+                for i in range(0, len(keys), 500):
+                    part = keys[i:i + 500]
+                    placeholders = ",".join("?" * len(part))
+                    rows = conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part)
+                    for key, blob in rows:
+                        found[key] = np.frombuffer(blob, dtype=np.float32)
+        except sqlite3.Error as e:
+            logger.error(f"Embedding cache read failed: {e}")
+        return found
+
+    def _store(self, keys: List[str], arrays: List[np.ndarray]):
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)",
+                    [(key, self.model_name, array.tobytes()) for key, array in zip(keys, arrays)]
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Embedding cache write failed: {e}")
+
+    def embed(self, texts: List[str], embed_batch_fn: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """
+        Returns embeddings for `texts`, calling `embed_batch_fn` once for the
+        distinct texts that are not cached yet.
+        """
+        cached = self.get_many(texts)
+        missing_texts = []
+        positions = {}
+        for i, (text, vector) in enumerate(zip(texts, cached)):
+            if vector is None:
+                key = self.key(text)
+                if key not in positions:
+                    positions[key] = []
+                    missing_texts.append(text)
+                positions[key].append(i)
+
+        results = [vector.tolist() if vector is not None else None for vector in cached]
+        if missing_texts:
+            fresh = embed_batch_fn(missing_texts)
+            self.put_many(missing_texts, fresh)
+            for text, vector in zip(missing_texts, fresh):
+                for i in positions[self.key(text)]:
+                    results[i] = list(vector)
+
+        return results
+
+    def embed_array(self, texts: List[str], embed_batch_fn: Callable[[List[str]], List[List[float]]]) -> np.ndarray:
+        """
+        Like embed(), but returns a float32 (n, dim) matrix built from the cached arrays.
+        """
+        cached = self.get_many(texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, cached) if v is None))
+        if missing:
+            vectors = np.asarray(embed_batch_fn(missing), dtype=np.float32)
+            self.put_many(missing, vectors)
+            fresh = dict(zip(missing, vectors))
+            cached = [v if v is not None else fresh[t] for t, v in zip(texts, cached)]
+        return np.vstack(cached) if cached else np.zeros((0, 0), dtype=np.float32)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits_memory + self._hits_disk + self._misses
+            return {
+                "model": self.model_name,
+                "backend": self.backend,
+                "entries": len(self._entries),
+                "memory_bytes": self._bytes,
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "hits_memory": self._hits_memory,
+                "hits_disk": self._hits_disk,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": round((self._hits_memory + self._hits_disk) / lookups, 4) if lookups else 0.0,
+                "persistent": bool(self.path),
+            }
+
+
+class ScoreCache:
+    """
+    Bounded LRU cache of cross-encoder scores keyed by (model, query, passage).
+    Entries expire `ttl_seconds` after they were written.
+    """
+    _instance = None
+
+    def __init__(self, model_name: str, max_entries: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions = 0
+
+    @classmethod
+    def instance(cls) -> "ScoreCache":
+        if cls._instance is None:
+            cls._instance = cls(
+                settings.reranker_model_name,
+                settings.rerank_cache_max_entries,
+                settings.rerank_cache_ttl_seconds
+            )
+        return cls._instance
+
+    def key(self, query: str, passage: str) -> str:
+        payload = f"{normalize_text(query)}\x00{normalize_text(passage)}".encode("utf-8")
+        return f"{self.model_name}:{hashlib.sha256(payload).hexdigest()}"
+
+    def get_many(self, query: str, passages: List[str]) -> List[Optional[float]]:
+        now = self._clock()
+        results: List[Optional[float]] = []
+        with self._lock:
+            for passage in passages:
+                key = self.key(query, passage)
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] < now:
+                    del self._entries[key]
+                    self._expired += 1
+                    entry = None
+                if entry is None:
+                    self._misses += 1
+                    results.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    results.append(entry[0])
+        return results
+
+    def put_many(self, query: str, passages: List[str], scores: List[float]):
+        expires_at = self._clock() + self.ttl_seconds
+        with self._lock:
+            for passage, score in zip(passages, scores):
+                key = self.key(query, passage)
+                self._entries[key] = (float(score), expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "model": self.model_name,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "expired": self._expired,
+                "evictions": self._evictions,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class AnswerCache:
+    """
+    LRU cache of generated answers with a TTL.
+
+    Answers are keyed by (scope, context fingerprint, normalized question).
+    The fingerprint hashes the set of chunk content hashes in the context
+    (the same hash as manifest.chunk_hash), so the same chunks hit in any
+    order, and a changed chunk changes the key. Each entry is also indexed
+    by its chunk hashes: invalidate_chunks() drops every answer built on a
+    chunk that changed or was removed.
+
+    With a `semantic_threshold`, a question that misses may reuse the answer
+    to a cached question about the same chunks whose embedding has at least
+    that cosine similarity.
+    """
+    _instance = None
+
+    def __init__(self, max_entries: int, ttl_seconds: float, semantic_threshold: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic_threshold = semantic_threshold
+        self._clock = clock
+        # key -> {"answer", "expires_at", "context", "chunks", "embedding"}
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._by_context: Dict[str, set] = {}
+        self._by_chunk: Dict[str, set] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._semantic_hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions = 0
+        self._invalidated = 0
+
+    @classmethod
+    def instance(cls) -> "AnswerCache":
+        if cls._instance is None:
+            cls._instance = cls(
+                settings.answer_cache_max_entries,
+                settings.answer_cache_ttl_seconds,
+                settings.answer_cache_semantic_threshold if settings.answer_cache_semantic_enabled else None
+            )
+        return cls._instance
+
+    @staticmethod
+    def chunk_hashes(chunks: Iterable[str]) -> List[str]:
+        return sorted({hashlib.sha256(normalize_text(c).encode("utf-8")).hexdigest() for c in chunks if c.strip()})
+
+    @staticmethod
+    def fingerprint(scope: str, hashes: List[str]) -> str:
+        return hashlib.sha256(f"{scope}\x00{','.join(hashes)}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _key(context: str, question: str) -> str:
+        return f"{context}:{hashlib.sha256(normalize_text(question).lower().encode('utf-8')).hexdigest()}"
+
+    def _drop(self, key: str):
+        # Caller holds the lock
+        entry = self._entries.pop(key)
+        self._by_context.get(entry["context"], set()).discard(key)
+        if not self._by_context.get(entry["context"]):
+            self._by_context.pop(entry["context"], None)
+        for h in entry["chunks"]:
+            keys = self._by_chunk.get(h)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_chunk[h]
+
+    def _live(self, key: str, now: float) -> Optional[dict]:
+        # Caller holds the lock
+        entry = self._entries.get(key)
+        if entry is not None and entry["expires_at"] < now:
+            self._drop(key)
+            self._expired += 1
+            return None
+        return entry
+
+    def get(self, scope: str, chunks: List[str], question: str, question_embedding: Optional[List[float]] = None) -> Optional[dict]:
+        """
+        Cached {"answer", "match"} for the question over these chunks, where
+        match is "exact" or "semantic"; None on a miss.
+        """
+        context = self.fingerprint(scope, self.chunk_hashes(chunks))
+        key = self._key(context, question)
+        now = self._clock()
+        with self._lock:
+            entry = self._live(key, now)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return {"answer": entry["answer"], "match": "exact"}
+
+            if self.semantic_threshold is not None and question_embedding is not None:
+                best_key, best_score = None, self.semantic_threshold
+                query = np.asarray(question_embedding, dtype=np.float32)
+                query = query / (np.linalg.norm(query) or 1.0)
+                for other in list(self._by_context.get(context, ())):
+                    candidate = self._live(other, now)
+                    if candidate is None or candidate["embedding"] is None:
+                        continue
+                    score = float(candidate["embedding"] @ query)
+                    if score >= best_score:
+                        best_key, best_score = other, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self._semantic_hits += 1
+                    return {"answer": self._entries[best_key]["answer"], "match": "semantic", "similarity": round(best_score, 4)}
+
+            self._misses += 1
+            return None
+
+    def put(self, scope: str, chunks: List[str], question: str, answer: str, question_embedding: Optional[List[float]] = None):
+        hashes = self.chunk_hashes(chunks)
+        context = self.fingerprint(scope, hashes)
+        key = self._key(context, question)
+        embedding = None
+        if question_embedding is not None:
+            embedding = np.asarray(question_embedding, dtype=np.float32)
+            embedding = embedding / (np.linalg.norm(embedding) or 1.0)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = {
+                "answer": answer,
+                "expires_at": self._clock() + self.ttl_seconds,
+                "context": context,
+                "chunks": hashes,
+                "embedding": embedding,
+            }
+            self._by_context.setdefault(context, set()).add(key)
+            for h in hashes:
+                self._by_chunk.setdefault(h, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self._evictions += 1
+
+    def invalidate_chunks(self, hashes: Iterable[str]) -> int:
+        """
+        Drops every answer whose context contained one of these chunk hashes.
+        """
+        with self._lock:
+            keys = set()
+            for h in hashes:
+                keys |= self._by_chunk.get(h, set())
+            for key in keys:
+                self._drop(key)
+            self._invalidated += len(keys)
+        if keys:
+            logger.info(f"Invalidated {len(keys)} cached answers")
+        return len(keys)
+
+    def invalidate_texts(self, chunks: Iterable[str]) -> int:
+        return self.invalidate_chunks(self.chunk_hashes(chunks))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_context.clear()
+            self._by_chunk.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._semantic_hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "semantic_threshold": self.semantic_threshold,
+                "hits": self._hits,
+                "semantic_hits": self._semantic_hits,
+                "misses": self._misses,
+                "expired": self._expired,
+                "evictions": self._evictions,
+                "invalidated": self._invalidated,
+                "hit_rate": round((self._hits + self._semantic_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    llama-index embedding model that serves text embeddings through an
+    EmbeddingCache, e.g. so the semantic splitter re-embeds only the
+    sentence groups of a document that changed since the last ingest.
+    """
+    _inner: Any = PrivateAttr()
+    _cache: Any = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding, cache: "EmbeddingCache", **kwargs):
+        super().__init__(model_name=inner.model_name, embed_batch_size=inner.embed_batch_size, **kwargs)
+        self._inner = inner
+        self._cache = cache
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._inner.get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._cache.embed(texts, self._inner.get_text_embedding_batch)
@@ -0,0 +1,231 @@
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from llama_index.core.node_parser import NodeParser, SemanticSplitterNodeParser, SentenceSplitter, TokenTextSplitter
+from llama_index.core.node_parser.node_utils import build_nodes_from_splits
+from llama_index.core.schema import BaseNode, Document
+
+from ..config import settings
+from .bucketing import tokenizer_of
+from .cache import CachedEmbedding, EmbeddingCache
+
+logger = logging.getLogger("rag_chunking")
+
+# semantic: embedding-based breakpoints over sentence groups (most expensive)
+# sentence_similarity: breakpoints from per-sentence embeddings, which the embedding cache can reuse
+# token: fixed token windows with overlap, no embeddings
+# recursive: paragraphs, then sentences, then words up to a token budget, no embeddings
+CHUNKING_STRATEGIES = ("semantic", "sentence_similarity", "token", "recursive")
+
+
+class PooledSemanticSplitter(SemanticSplitterNodeParser):
+    """
+    Semantic splitter that keeps the sentence-group embeddings it computes
+    for breakpoint detection and pools them into one vector per chunk.
+
+    Chunks come out already embedded, so the ingestion embed step can be
+    skipped. The pooled vector is the re-normalized mean of the chunk's
+    sentence-group embeddings, an approximation of embedding the chunk text.
+    """
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "PooledSemanticSplitter"
+
+    def _group_ranges(self, sentence_count: int, distances: List[float]) -> List[Tuple[int, int]]:
+        # Mirrors SemanticSplitterNodeParser._build_node_chunks, but yields index ranges
+        if not distances:
+            return [(0, sentence_count)]
+
+        threshold = np.percentile(distances, self.breakpoint_percentile_threshold)
+        ranges = []
+        start_index = 0
+        for index, distance in enumerate(distances):
+            if distance > threshold:
+                ranges.append((start_index, index + 1))
+                start_index = index + 1
+        if start_index < sentence_count:
+            ranges.append((start_index, sentence_count))
+        return ranges
+
+    @staticmethod
+    def _pool(embeddings: List[List[float]]) -> Optional[List[float]]:
+        if not embeddings:
+            return None
+        pooled = np.mean(np.asarray(embeddings, dtype=np.float32), axis=0)
+        norm = np.linalg.norm(pooled)
+        if norm > 0:
+            pooled = pooled / norm
+        return pooled.tolist()
+
+    def build_semantic_nodes_from_documents(
+        self,
+        documents: Sequence[Document],
+        show_progress: bool = False,
+    ) -> List[BaseNode]:
+        all_nodes: List[BaseNode] = []
+        for doc in documents:
+            text_splits = self.sentence_splitter(doc.text)
+            sentences = self._build_sentence_groups(text_splits)
+
+            embeddings = self.embed_model.get_text_embedding_batch(
+                [s["combined_sentence"] for s in sentences],
+                show_progress=show_progress,
+            )
+            for i, embedding in enumerate(embeddings):
+                sentences[i]["combined_sentence_embedding"] = embedding
+
+            distances = self._calculate_distances_between_sentence_groups(sentences)
+            ranges = self._group_ranges(len(sentences), distances)
+
+            if distances:
+                chunks = ["".join(s["sentence"] for s in sentences[start:end]) for start, end in ranges]
+            else:
+                chunks = [" ".join(s["sentence"] for s in sentences)]
+
+            nodes = build_nodes_from_splits(chunks, doc, id_func=self.id_func)
+            for node, (start, end) in zip(nodes, ranges):
+                node.embedding = self._pool(embeddings[start:end])
+            all_nodes.extend(nodes)
+        return all_nodes
+
+
+class SentenceSimilaritySplitter(SemanticSplitterNodeParser):
+    """
+    Cheaper semantic splitter: embeds each sentence on its own (no buffer
+    groups, so repeated sentences hit the embedding cache across documents)
+    and breaks where adjacent sentences are least similar. Chunks are also
+    closed once they reach `max_chunk_chars`.
+    """
+    max_chunk_chars: int = 2000
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "SentenceSimilaritySplitter"
+
+    def build_semantic_nodes_from_documents(
+        self,
+        documents: Sequence[Document],
+        show_progress: bool = False,
+    ) -> List[BaseNode]:
+        all_nodes: List[BaseNode] = []
+        for doc in documents:
+            sentences = self.sentence_splitter(doc.text)
+            if len(sentences) <= 1:
+                all_nodes.extend(build_nodes_from_splits(sentences or [doc.text], doc, id_func=self.id_func))
+                continue
+
+            unique = list(dict.fromkeys(sentences))
+            vectors = np.asarray(self.embed_model.get_text_embedding_batch(unique, show_progress=show_progress), dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms == 0, 1.0, norms)
+            positions = {sentence: i for i, sentence in enumerate(unique)}
+            matrix = vectors[[positions[sentence] for sentence in sentences]]
+            distances = 1.0 - np.einsum("ij,ij->i", matrix[:-1], matrix[1:])
+            threshold = np.percentile(distances, self.breakpoint_percentile_threshold)
+
+            chunks, current, length = [], [], 0
+            for i, sentence in enumerate(sentences):
+                current.append(sentence)
+                length += len(sentence)
+                if i < len(distances) and (distances[i] > threshold or length >= self.max_chunk_chars):
+                    chunks.append("".join(current))
+                    current, length = [], 0
+            if current:
+                chunks.append("".join(current))
+            all_nodes.extend(build_nodes_from_splits(chunks, doc, id_func=self.id_func))
+        return all_nodes
+
+
+def check_strategy(name: str) -> str:
+    name = (name or "").lower()
+    if name not in CHUNKING_STRATEGIES:
+        raise ValueError(f"Unknown chunking strategy '{name}', expected one of {CHUNKING_STRATEGIES}")
+    return name
+
+
+def resolve_strategy(metadata: dict = None, requested: str = None) -> str:
+    """
+    Strategy for one document: the requested one, else metadata["chunking_strategy"],
+    else `chunking_strategy_by_type` for its document_type, content_type or
+    file extension, else `chunking_strategy`.
+    """
+    metadata = metadata or {}
+    name = requested or metadata.get("chunking_strategy")
+    if not name:
+        by_type = settings.chunking_strategy_by_type
+        extension = os.path.splitext(str(metadata.get("filename", "")))[1].lower()
+        for key in (metadata.get("document_type"), metadata.get("content_type"), extension):
+            if key and key in by_type:
+                name = by_type[key]
+                break
+    return check_strategy(name or settings.chunking_strategy)
+
+
+def _token_counter(embed_model):
+    # Count in the embedder's own tokens so chunks fit its max sequence length
+    tokenizer = tokenizer_of(embed_model) if embed_model is not None else None
+    if tokenizer is None:
+        return None
+    return lambda text: tokenizer.encode(text, add_special_tokens=False)
+
+
+def build_splitter(strategy: str, embed_model=None, embed_mode: str = "batch") -> NodeParser:
+    strategy = check_strategy(strategy)
+    if strategy == "token":
+        return TokenTextSplitter(
+            chunk_size=settings.chunk_size_tokens,
+            chunk_overlap=settings.chunk_overlap_tokens,
+            tokenizer=_token_counter(embed_model),
+        )
+    if strategy == "recursive":
+        return SentenceSplitter(
+            chunk_size=settings.chunk_size_tokens,
+            chunk_overlap=settings.chunk_overlap_tokens,
+            paragraph_separator="\n\n",
+            tokenizer=_token_counter(embed_model),
+        )
+    if strategy == "sentence_similarity":
+        return SentenceSimilaritySplitter(
+            breakpoint_percentile_threshold=settings.semantic_breakpoint_percentile,
+            embed_model=embed_model,
+        )
+    splitter_cls = PooledSemanticSplitter if embed_mode == "reuse" else SemanticSplitterNodeParser
+    return splitter_cls(
+        buffer_size=settings.semantic_buffer_size,
+        breakpoint_percentile_threshold=settings.semantic_breakpoint_percentile,
+        embed_model=embed_model,
+    )
+
+
+class ChunkerRegistry:
+    """
+    Splitters are built once per (strategy, embed mode) and reused across
+    requests; they are rebuilt when the embedding model they hold is swapped.
+    The sentence_similarity splitter embeds its sentences through the
+    EmbeddingCache when embedding_cache_enabled is set.
+    """
+    _splitters: Dict[Tuple[str, str], Tuple[object, bool, NodeParser]] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, strategy: str, embed_model, embed_mode: str = "batch") -> NodeParser:
+        key = (check_strategy(strategy), embed_mode)
+        cached_sentences = key[0] == "sentence_similarity" and settings.embedding_cache_enabled
+        with cls._lock:
+            cached = cls._splitters.get(key)
+            if cached is None or cached[0] is not embed_model or cached[1] != cached_sentences:
+                splitter_model = embed_model
+                if cached_sentences:
+                    splitter_model = CachedEmbedding(embed_model, EmbeddingCache.instance())
+                cached = (embed_model, cached_sentences, build_splitter(strategy, splitter_model, embed_mode))
+                cls._splitters[key] = cached
+            return cached[2]
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._splitters.clear()
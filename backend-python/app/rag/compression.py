@@ -0,0 +1,169 @@
+import logging
+import re
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import settings
+
+logger = logging.getLogger("rag_compression")
+
+# none: chunks go into the prompt verbatim
+# budget: chunks in rerank order until the token budget, the last one cut at a sentence boundary
+# extractive: the sentences most similar to the question (embedder cosine) until the budget, kept in reading order
+# llmlingua: LLMLingua-2 token-level compression down to the budget (needs the llmlingua package and its model)
+COMPRESSION_METHODS = ("none", "budget", "extractive", "llmlingua")
+
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n+")
+
+_tokenizer = None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Approximate LLM prompt tokens (llama-index's default tiktoken tokenizer;
+    Llama 3's tokenizer is of the same family).
+    """
+    global _tokenizer
+    if _tokenizer is None:
+        from llama_index.core.utils import get_tokenizer
+        _tokenizer = get_tokenizer()
+    return len(_tokenizer(text))
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_BREAK.split(text) if s and s.strip()]
+
+
+def check_method(method: str) -> str:
+    if method not in COMPRESSION_METHODS:
+        raise ValueError(f"Unknown compression method '{method}', expected one of {', '.join(COMPRESSION_METHODS)}")
+    return method
+
+
+def compress_budget(chunks: List[str], budget: int) -> List[str]:
+    kept, used = [], 0
+    for chunk in chunks:
+        tokens = count_tokens(chunk)
+        if used + tokens <= budget:
+            kept.append(chunk)
+            used += tokens
+            continue
+        # Fill what's left of the budget with the chunk's leading sentences
+        head = []
+        for sentence in split_sentences(chunk):
+            tokens = count_tokens(sentence)
+            if used + tokens > budget:
+                break
+            head.append(sentence)
+            used += tokens
+        if head:
+            kept.append(" ".join(head))
+        break
+    return kept
+
+
+def compress_extractive(question: str, chunks: List[str], budget: int, embed_fn: Callable[[List[str]], np.ndarray]) -> List[str]:
+    """
+    Keeps the sentences closest to the question until the budget is spent.
+    Selected sentences keep their chunk and reading order; chunks left
+    without a sentence are dropped.
+    """
+    sentences = [(c, s) for c, chunk in enumerate(chunks) for s in split_sentences(chunk)]
+    if not sentences:
+        return []
+    vectors = np.asarray(embed_fn([question] + [s for _, s in sentences]), dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    scores = vectors[1:] @ vectors[0]
+
+    selected, used = set(), 0
+    # Stable sort: equally similar sentences are taken in rerank order
+    for i in np.argsort(-scores, kind="stable"):
+        tokens = count_tokens(sentences[i][1])
+        if used + tokens > budget:
+            continue
+        selected.add(int(i))
+        used += tokens
+
+    grouped = {}
+    for i in sorted(selected):
+        chunk_index, sentence = sentences[i]
+        grouped.setdefault(chunk_index, []).append(sentence)
+    return [" ".join(grouped[c]) for c in sorted(grouped)]
+
+
+class LLMLinguaCompressor:
+    """
+    Process-wide LLMLingua-2 PromptCompressor, loaded on first use.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, model_name: str, device: str):
+        from llmlingua import PromptCompressor
+
+        logger.info(f"Loading LLMLingua model {model_name} on {device}")
+        self._compressor = PromptCompressor(model_name=model_name, use_llmlingua2=True, device_map=device)
+
+    @classmethod
+    def instance(cls) -> "LLMLinguaCompressor":
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls(settings.llmlingua_model, settings.llmlingua_device)
+        return cls._instance
+
+    def compress(self, chunks: List[str], budget: int) -> List[str]:
+        result = self._compressor.compress_prompt(
+            chunks,
+            target_token=budget,
+            force_tokens=["\n", "?", ".", "!", ":"],
+            drop_consecutive=True,
+        )
+        compressed = result.get("compressed_prompt_list") or result["compressed_prompt"].split("\n\n")
+        return [chunk for chunk in compressed if chunk.strip()]
+
+
+def compress_context(question: str, chunks: List[str], method: str = None, budget: int = None,
+                     embed_fn: Optional[Callable[[List[str]], np.ndarray]] = None) -> Tuple[List[str], dict]:
+    """
+    Compresses reranked context chunks for the prompt. Returns the chunks
+    to render and a report with tokens before/after. Contexts already within
+    the budget are left as they are; a failing method falls back to budget.
+    """
+    method = check_method(method or settings.context_compression)
+    budget = budget or settings.context_token_budget
+    start = time.perf_counter()
+    tokens_before = sum(count_tokens(chunk) for chunk in chunks)
+
+    applied = method
+    compressed = chunks
+    if method != "none" and tokens_before > budget:
+        try:
+            if method == "budget":
+                compressed = compress_budget(chunks, budget)
+            elif method == "extractive":
+                if embed_fn is None:
+                    raise ValueError("extractive compression needs an embedding function")
+                compressed = compress_extractive(question, chunks, budget, embed_fn)
+            else:
+                compressed = LLMLinguaCompressor.instance().compress(chunks, budget)
+        except Exception as e:
+            logger.error(f"{method} context compression failed, falling back to budget: {e}")
+            applied = "budget"
+            compressed = compress_budget(chunks, budget)
+    elif method != "none":
+        applied = "none"
+
+    tokens_after = sum(count_tokens(chunk) for chunk in compressed) if compressed is not chunks else tokens_before
+    return compressed, {
+        "method": applied,
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "ratio": round(tokens_after / tokens_before, 4) if tokens_before else 1.0,
+        "chunks_before": len(chunks),
+        "chunks_after": len(compressed),
+        "compress_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
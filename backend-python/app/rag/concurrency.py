@@ -0,0 +1,69 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional
+
+logger = logging.getLogger("rag_concurrency")
+
+
+class QueueFullError(RuntimeError):
+    """
+    Raised when a ConcurrencyLimiter cannot accept another waiting caller.
+    """
+
+
+class ConcurrencyLimiter:
+    """
+    Async limiter with a fixed number of slots and a bounded wait queue.
+
+    Callers beyond `max_concurrent` wait in FIFO order; once `max_queued`
+    callers are already waiting (or a caller waits longer than
+    `queue_timeout` seconds), QueueFullError is raised instead.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queued: int = 0, queue_timeout: Optional[float] = None):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._active = 0
+        self._waiting = 0
+        self._completed = 0
+        self._rejected = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore.locked() and self._waiting >= self.max_queued:
+            self._rejected += 1
+            raise QueueFullError(f"{self.name}: {self._waiting} requests already queued")
+
+        self._waiting += 1
+        try:
+            if self.queue_timeout is not None:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            else:
+                await self._semaphore.acquire()
+        except asyncio.TimeoutError:
+            self._rejected += 1
+            raise QueueFullError(f"{self.name}: no free slot after {self.queue_timeout}s")
+        finally:
+            self._waiting -= 1
+
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._completed += 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "queued": self._waiting,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+        }
@@ -2,47 +2,127 @@ import logging
 from llama_index.core import VectorStoreIndex, Settings
 from llama_index.core.storage.storage_context import StorageContext
 from llama_index.llms.ollama import Ollama
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-
-import torch
 
 from ..config import settings
+from .backends import build_embedding_model, build_reranker
+from .cache import EmbeddingCache, ScoreCache
+from .gateway import build_ollama_clients
+from .registry import ModelRegistry
+from .workers import build_pooled_embedding
 
 logger = logging.getLogger("rag_factory")
 
+# Registry name -> Settings attribute holding the configured model name
+MODEL_SETTINGS = {
+    "llm": "ollama_model",
+    "embedding": "embedding_model_name",
+    "reranker": "reranker_model_name",
+}
+
 class RAGFactory:
-    _llm = None
-    _embed_model = None
-    _llm = None
-    _embed_model = None
+    """
+    Builds the heavyweight models. Instances live in a ModelRegistry, which
+    guarantees one load per model even under concurrent cold requests.
+    """
+    _registry = ModelRegistry()
+
+    @staticmethod
+    def _build_llm(model_name: str = None):
+        model_name = model_name or settings.ollama_model
+        logger.info(f"Initializing Ollama LLM: {model_name} at {settings.ollama_base_url}")
+        client, async_client = build_ollama_clients()
+        llm = Ollama(
+            model=model_name,
+            base_url=settings.ollama_base_url,
+            request_timeout=settings.llm_request_timeout,
+            temperature=0.1,
+            context_window=8192,
+            keep_alive=settings.ollama_keep_alive,
+            additional_kwargs={"num_ctx": 8192},
+            client=client,
+            async_client=async_client
+        )
+        Settings.llm = llm
+        return llm
+
+    @staticmethod
+    def _build_embedding_model(model_name: str = None):
+        model_name = model_name or settings.embedding_model_name
+        logger.info(f"Initializing Embedding Model: {model_name}")
+        if settings.embed_workers > 0:
+            embed_model = build_pooled_embedding(model_name)
+        else:
+            embed_model = build_embedding_model(model_name)
+        Settings.embed_model = embed_model
+        return embed_model
+
+    @staticmethod
+    def _build_reranker(model_name: str = None):
+        model_name = model_name or settings.reranker_model_name
+        logger.info(f"Initializing Reranker: {model_name}")
+        return build_reranker(model_name)
 
     @classmethod
     def get_llm(cls):
-        if not cls._llm:
-            logger.info(f"Initializing Ollama LLM: {settings.ollama_model} at {settings.ollama_base_url}")
-            cls._llm = Ollama(
-                model=settings.ollama_model,
-                base_url=settings.ollama_base_url,
-                request_timeout=600.0,
-                temperature=0.1,
-                context_window=8192,
-                additional_kwargs={"num_ctx": 8192}
-            )
-            Settings.llm = cls._llm
-        return cls._llm
+        return cls._registry.get("llm")
 
     @classmethod
     def get_embedding_model(cls):
-        if not cls._embed_model:
-            logger.info(f"Initializing Embedding Model: {settings.embedding_model_name}")
-            # Check device availability (MPS for Mac M-series, but Docker Linux uses CPU)
-            device = "mps" if torch.backends.mps.is_available() else "cpu"
-            logger.info(f"Using device: {device}")
-            
-            cls._embed_model = HuggingFaceEmbedding(
-                model_name=settings.embedding_model_name,
-                device=device
-            )
-            Settings.embed_model = cls._embed_model
-        return cls._embed_model
+        return cls._registry.get("embedding")
+
+    @classmethod
+    def get_reranker(cls):
+        return cls._registry.get("reranker")
+
+    @classmethod
+    def acquire(cls, name: str):
+        """
+        Reference-counted handle for long-running work, e.g.
+        `with RAGFactory.acquire("embedding") as embed_model: ...`
+        """
+        return cls._registry.acquire(name)
+
+    @classmethod
+    def unload(cls, name: str, wait: bool = False, timeout: float = None) -> bool:
+        return cls._registry.unload(name, wait=wait, timeout=timeout)
+
+    @classmethod
+    def swap(cls, name: str, model_name: str):
+        """
+        Replaces a model at runtime. The new model is loaded before the switch,
+        and requests holding a handle finish on the old one.
+        Note: swapping the embedder to a model with a different dimension
+        requires re-ingesting documents.
+        """
+        builders = {
+            "llm": cls._build_llm,
+            "embedding": cls._build_embedding_model,
+            "reranker": cls._build_reranker,
+        }
+        if name not in builders:
+            raise KeyError(f"Unknown model '{name}'")
+
+        model = cls._registry.swap(name, lambda: builders[name](model_name))
+        setattr(settings, MODEL_SETTINGS[name], model_name)
+
+        # Cached vectors/scores belong to the previous model
+        if name == "embedding":
+            EmbeddingCache._instance = None
+        elif name == "reranker":
+            ScoreCache._instance = None
+        return model
+
+    @classmethod
+    def stats(cls) -> dict:
+        report = cls._registry.stats()
+        for name, attr in MODEL_SETTINGS.items():
+            if name in report:
+                report[name]["model_name"] = getattr(settings, attr)
+                if name != "llm":
+                    report[name]["backend"] = settings.inference_backend
+        return report
+
 
+RAGFactory._registry.register("llm", RAGFactory._build_llm)
+RAGFactory._registry.register("embedding", RAGFactory._build_embedding_model)
+RAGFactory._registry.register("reranker", RAGFactory._build_reranker)
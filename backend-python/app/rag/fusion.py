@@ -0,0 +1,18 @@
+from typing import Dict, List
+
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[dict]], k: int = 60, key: str = "id") -> List[dict]:
+    """
+    Merges ranked result lists with RRF: score = sum over lists of 1 / (k + rank).
+    Each fused hit keeps the fields of its first occurrence plus
+    "rrf_score" and "ranks" ({list name: 1-based rank}).
+    """
+    fused: Dict[object, dict] = {}
+    for name, hits in rankings.items():
+        for rank, hit in enumerate(hits, start=1):
+            entry = fused.get(hit[key])
+            if entry is None:
+                entry = fused[hit[key]] = {**hit, "rrf_score": 0.0, "ranks": {}}
+            entry["rrf_score"] += 1.0 / (k + rank)
+            entry["ranks"][name] = rank
+    return sorted(fused.values(), key=lambda hit: hit["rrf_score"], reverse=True)
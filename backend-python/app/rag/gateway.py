@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from ..config import settings
+from .concurrency import ConcurrencyLimiter
+
+logger = logging.getLogger("rag_gateway")
+
+
+def build_ollama_clients():
+    """
+    Sync and async Ollama clients sharing the gateway's HTTP settings: one
+    connection pool per client whose idle keep-alive connections are reused
+    across requests instead of reconnecting per generation.
+    """
+    import httpx
+    from ollama import AsyncClient, Client
+
+    def limits():
+        return httpx.Limits(
+            max_connections=settings.llm_max_connections,
+            max_keepalive_connections=settings.llm_max_connections,
+            keepalive_expiry=settings.llm_keepalive_expiry,
+        )
+
+    kwargs = {"host": settings.ollama_base_url, "timeout": settings.llm_request_timeout}
+    return Client(limits=limits(), **kwargs), AsyncClient(limits=limits(), **kwargs)
+
+
+class _Call:
+    """
+    One in-flight completion and the number of callers waiting for it.
+    """
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class LLMGateway:
+    """
+    Single entry point for LLM generations.
+
+    - Per-endpoint limits: each endpoint ("chat", "metadata", ...) gets its
+      own ConcurrencyLimiter, so a metadata-extraction burst during bulk
+      ingest can't take every Ollama slot from interactive questions.
+    - Single-flight: a completion whose model and prompt are byte-identical
+      to one already in flight waits for that result instead of generating
+      again. The generation is cancelled once no caller is waiting for it.
+
+    The Ollama clients themselves (connection pool, keep_alive) are set up
+    by RAGFactory; the gateway resolves the LLM on every call so swaps apply.
+    """
+    _instance: Optional["LLMGateway"] = None
+
+    def __init__(self):
+        self._limiters: Dict[str, ConcurrencyLimiter] = {}
+        self._in_flight: Dict[str, _Call] = {}
+        self._requests = 0
+        self._coalesced = 0
+
+    @classmethod
+    def instance(cls) -> "LLMGateway":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def limiter(self, endpoint: str) -> ConcurrencyLimiter:
+        if endpoint not in self._limiters:
+            self._limiters[endpoint] = ConcurrencyLimiter(
+                f"llm:{endpoint}",
+                max_concurrent=settings.llm_endpoint_concurrency.get(endpoint, settings.llm_max_concurrent_generations),
+                max_queued=settings.llm_max_queued_generations,
+                queue_timeout=settings.llm_queue_timeout
+            )
+        return self._limiters[endpoint]
+
+    @staticmethod
+    def _llm():
+        # Imported here: the factory imports this module for the client builder
+        from .factory import RAGFactory
+        return RAGFactory.get_llm()
+
+    async def _generate(self, prompt: str, endpoint: str, timeout: Optional[float] = None) -> str:
+        async with self.limiter(endpoint).slot():
+            response = await asyncio.wait_for(self._llm().acomplete(prompt), timeout=timeout)
+        return response.text
+
+    async def complete(self, prompt: str, endpoint: str = "chat", timeout: Optional[float] = None) -> str:
+        """
+        Completion text for `prompt`, shared with identical in-flight calls.
+        `timeout` bounds the generation itself, not the wait for a slot
+        (that is llm_queue_timeout); it raises asyncio.TimeoutError.
+        """
+        self._requests += 1
+        key = hashlib.sha256(f"{settings.ollama_model}\x00{prompt}".encode("utf-8")).hexdigest()
+        call = self._in_flight.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(self._generate(prompt, endpoint, timeout)))
+            self._in_flight[key] = call
+            call.task.add_done_callback(lambda _: self._in_flight.pop(key, None) if self._in_flight.get(key) is call else None)
+        else:
+            self._coalesced += 1
+            logger.debug(f"Coalesced {endpoint} prompt with an in-flight generation")
+
+        call.waiters += 1
+        try:
+            # Shielded so one caller giving up (timeout, disconnect) doesn't cancel the others
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Dropped before cancelling, so a new identical prompt starts
+                # its own generation instead of joining the cancelled one
+                if self._in_flight.get(key) is call:
+                    del self._in_flight[key]
+                call.task.cancel()
+
+    @asynccontextmanager
+    async def stream(self, prompt: str, endpoint: str = "chat"):
+        """
+        Token stream for `prompt` under the endpoint's limit. Streams aren't
+        coalesced; leaving the block closes the Ollama stream.
+        """
+        self._requests += 1
+        async with self.limiter(endpoint).slot():
+            stream = await self._llm().astream_complete(prompt)
+            try:
+                yield stream
+            finally:
+                await stream.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "requests": self._requests,
+            "coalesced": self._coalesced,
+            "in_flight": len(self._in_flight),
+            "keep_alive": settings.ollama_keep_alive,
+            "endpoints": {name: limiter.stats() for name, limiter in self._limiters.items()},
+        }
@@ -0,0 +1,308 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("rag_index")
+
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+CHUNKS_FILE = "chunks.jsonl"
+IVF_FILE = "ivf.npz"
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class VectorIndex:
+    """
+    In-process cosine-similarity index over a float32 (n, dim) matrix.
+
+    - Small indexes are searched exactly with one matrix-vector product.
+    - Past `exact_threshold` live vectors, an IVF layer (spherical k-means,
+      ~sqrt(n) lists) restricts each query to the `nprobe` closest lists.
+      Lists are retrained once the index has doubled since the last training.
+    - Deletes only clear an alive-bit; save() compacts.
+    - save()/load() snapshot to a directory. Vectors are loaded memory-mapped,
+      so a restart doesn't read the whole matrix up front.
+    """
+
+    def __init__(self, dim: Optional[int] = None, model_name: str = None, nprobe: int = 16, exact_threshold: int = 20000):
+        self.dim = dim
+        self.model_name = model_name
+        self.nprobe = max(1, nprobe)
+        self.exact_threshold = exact_threshold
+        self._lock = threading.RLock()
+
+        self._matrix = np.zeros((0, dim or 0), dtype=np.float32)
+        self._size = 0
+        self._alive = np.zeros(0, dtype=bool)
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+        self._payloads: List[dict] = []
+        self._positions: Dict[str, int] = {}
+        self._by_document: Dict[str, set] = {}
+
+        # IVF state
+        self._centroids: Optional[np.ndarray] = None
+        self._assign = np.zeros(0, dtype=np.int32)
+        self._trained_size = 0
+        self._list_order: Optional[np.ndarray] = None
+        self._list_offsets: Optional[np.ndarray] = None
+
+        # Stats
+        self._searches = 0
+        self._total_search_ms = 0.0
+
+    def __len__(self) -> int:
+        return int(self._alive[:self._size].sum())
+
+    def _reserve(self, extra: int):
+        needed = self._size + extra
+        if needed <= self._matrix.shape[0] and isinstance(self._matrix, np.ndarray) and self._matrix.flags.writeable:
+            return
+        capacity = max(needed, 2 * self._matrix.shape[0], 1024)
+        grown = np.zeros((capacity, self.dim), dtype=np.float32)
+        grown[:self._size] = self._matrix[:self._size]
+        self._matrix = grown
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        self._alive = alive
+        assign = np.zeros(capacity, dtype=np.int32)
+        assign[:self._size] = self._assign[:self._size]
+        self._assign = assign
+
+    def add(self, ids: Sequence[str], vectors, document_id: str, payloads: Optional[Sequence[dict]] = None):
+        """
+        Adds (or replaces) vectors under `ids`. Payloads are returned by search().
+        """
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(1, -1)
+        if len(ids) != matrix.shape[0]:
+            raise ValueError(f"Got {len(ids)} ids for {matrix.shape[0]} vectors")
+        payloads = list(payloads) if payloads is not None else [{} for _ in ids]
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = matrix.shape[1]
+                self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+            if matrix.shape[1] != self.dim:
+                raise ValueError(f"Vector dimension {matrix.shape[1]} does not match index dimension {self.dim}")
+
+            self.remove_ids(ids)
+            self._reserve(len(ids))
+            start, end = self._size, self._size + len(ids)
+            self._matrix[start:end] = _normalize(matrix)
+            self._alive[start:end] = True
+            for offset, (chunk_id, payload) in enumerate(zip(ids, payloads)):
+                self._positions[chunk_id] = start + offset
+                self._ids.append(chunk_id)
+                self._documents.append(document_id)
+                self._payloads.append(payload)
+                self._by_document.setdefault(document_id, set()).add(chunk_id)
+            self._size = end
+
+            if self._centroids is not None:
+                self._assign[start:end] = np.argmax(self._matrix[start:end] @ self._centroids.T, axis=1)
+                self._list_order = None
+            self._maybe_train()
+
+    def remove_ids(self, ids: Iterable[str]) -> int:
+        removed = 0
+        with self._lock:
+            for chunk_id in ids:
+                position = self._positions.pop(chunk_id, None)
+                if position is not None:
+                    self._alive[position] = False
+                    self._by_document.get(self._documents[position], set()).discard(chunk_id)
+                    removed += 1
+        return removed
+
+    def remove_document(self, document_id: str) -> int:
+        with self._lock:
+            removed = self.remove_ids(list(self._by_document.get(document_id, ())))
+            self._by_document.pop(document_id, None)
+            return removed
+
+    def chunk_ids(self, document_id: str) -> List[str]:
+        with self._lock:
+            return list(self._by_document.get(document_id, ()))
+
+    def contents(self, ids: Iterable[str]) -> List[str]:
+        with self._lock:
+            positions = [self._positions[chunk_id] for chunk_id in ids if chunk_id in self._positions]
+            return [self._payloads[p]["content"] for p in positions if "content" in self._payloads[p]]
+
+    def document_ids(self) -> List[str]:
+        with self._lock:
+            return [doc for doc, ids in self._by_document.items() if ids]
+
+    def _maybe_train(self):
+        live = len(self)
+        if live < self.exact_threshold:
+            return
+        if self._centroids is None or live >= 2 * self._trained_size:
+            self.train()
+
+    def train(self, iterations: int = 10, sample_size: int = 65536, seed: int = 0):
+        """
+        Spherical k-means over (a sample of) the live vectors.
+        """
+        with self._lock:
+            live = np.flatnonzero(self._alive[:self._size])
+            if len(live) == 0:
+                return
+            rng = np.random.default_rng(seed)
+            nlist = max(1, min(len(live), int(math.sqrt(len(live)))))
+            sample = live if len(live) <= sample_size else rng.choice(live, sample_size, replace=False)
+            data = self._matrix[sample]
+            centroids = data[rng.choice(len(data), nlist, replace=False)].copy()
+            for _ in range(iterations):
+                assign = np.argmax(data @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assign, data)
+                empty = np.bincount(assign, minlength=nlist) == 0
+                sums[empty] = centroids[empty]
+                centroids = _normalize(sums)
+
+            self._centroids = centroids.astype(np.float32)
+            self._assign[:self._size] = np.argmax(self._matrix[:self._size] @ self._centroids.T, axis=1)
+            self._trained_size = len(live)
+            self._list_order = None
+            logger.info(f"Trained IVF index: {nlist} lists over {len(live)} vectors")
+
+    def _lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._list_order is None:
+            assign = self._assign[:self._size]
+            self._list_order = np.argsort(assign, kind="stable")
+            counts = np.bincount(assign, minlength=len(self._centroids))
+            self._list_offsets = np.concatenate([[0], np.cumsum(counts)])
+        return self._list_order, self._list_offsets
+
+    def _candidates(self, query: np.ndarray) -> Optional[np.ndarray]:
+        # Caller holds the lock; None means "scan everything"
+        if self._centroids is None or len(self) < self.exact_threshold:
+            return None
+        order, offsets = self._lists()
+        probes = np.argsort(-(self._centroids @ query))[:self.nprobe]
+        return np.concatenate([order[offsets[p]:offsets[p + 1]] for p in probes])
+
+    def search(self, vector, top_k: int = 5, document_ids: Optional[Iterable[str]] = None) -> List[dict]:
+        """
+        Returns up to top_k {"id", "score", "document_id", **payload} hits, best first.
+        """
+        start = time.perf_counter()
+        query = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        with self._lock:
+            if self._size == 0 or top_k <= 0:
+                return []
+            candidates = self._candidates(query)
+            if candidates is None:
+                candidates = np.arange(self._size)
+            mask = self._alive[candidates]
+            if document_ids is not None:
+                wanted = set(document_ids)
+                mask &= np.fromiter((self._documents[i] in wanted for i in candidates), dtype=bool, count=len(candidates))
+            candidates = candidates[mask]
+            if len(candidates) == 0:
+                return []
+
+            scores = self._matrix[candidates] @ query
+            k = min(top_k, len(candidates))
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            hits = [
+                {"id": self._ids[candidates[i]], "score": float(scores[i]), "document_id": self._documents[candidates[i]], **self._payloads[candidates[i]]}
+                for i in best
+            ]
+            self._searches += 1
+            self._total_search_ms += (time.perf_counter() - start) * 1000
+            return hits
+
+    def save(self, path: str):
+        """
+        Writes a compacted snapshot to `path` (files replaced atomically).
+        """
+        with self._lock:
+            live = np.flatnonzero(self._alive[:self._size])
+            os.makedirs(path, exist_ok=True)
+
+            def write(name: str, writer):
+                tmp = os.path.join(path, f".{name}.tmp")
+                with open(tmp, "wb") as f:
+                    writer(f)
+                os.replace(tmp, os.path.join(path, name))
+
+            write(VECTORS_FILE, lambda f: np.save(f, np.ascontiguousarray(self._matrix[live])))
+            write(CHUNKS_FILE, lambda f: f.writelines(
+                (json.dumps({"id": self._ids[i], "document_id": self._documents[i], "payload": self._payloads[i]}) + "\n").encode("utf-8")
+                for i in live
+            ))
+            if self._centroids is not None:
+                write(IVF_FILE, lambda f: np.savez(f, centroids=self._centroids, assign=self._assign[live], trained_size=self._trained_size))
+            elif os.path.exists(os.path.join(path, IVF_FILE)):
+                os.remove(os.path.join(path, IVF_FILE))
+            manifest = {"dim": self.dim, "count": len(live), "model_name": self.model_name, "saved_at": time.time()}
+            write(MANIFEST_FILE, lambda f: f.write(json.dumps(manifest).encode("utf-8")))
+        logger.info(f"Saved vector index snapshot ({len(live)} vectors) to {path}")
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "VectorIndex":
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        index = cls(dim=manifest["dim"], model_name=manifest.get("model_name"), **kwargs)
+
+        # Read-only memory map; the first add() copies into a growable buffer
+        matrix = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r")
+        with open(os.path.join(path, CHUNKS_FILE), encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        if len(rows) != matrix.shape[0]:
+            raise ValueError(f"Snapshot at {path} is inconsistent: {len(rows)} chunks, {matrix.shape[0]} vectors")
+
+        index._matrix = matrix
+        index._size = len(rows)
+        index._alive = np.ones(len(rows), dtype=bool)
+        index._assign = np.zeros(len(rows), dtype=np.int32)
+        for i, row in enumerate(rows):
+            index._ids.append(row["id"])
+            index._documents.append(row["document_id"])
+            index._payloads.append(row.get("payload", {}))
+            index._positions[row["id"]] = i
+            index._by_document.setdefault(row["document_id"], set()).add(row["id"])
+
+        ivf_path = os.path.join(path, IVF_FILE)
+        if os.path.exists(ivf_path):
+            with np.load(ivf_path) as ivf:
+                index._centroids = ivf["centroids"]
+                index._assign = ivf["assign"].astype(np.int32)
+                index._trained_size = int(ivf["trained_size"])
+        logger.info(f"Loaded vector index snapshot ({len(rows)} vectors) from {path}")
+        return index
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "vectors": len(self),
+                "deleted": self._size - len(self),
+                "dim": self.dim,
+                "model_name": self.model_name,
+                "mode": "ivf" if self._centroids is not None and len(self) >= self.exact_threshold else "exact",
+                "lists": len(self._centroids) if self._centroids is not None else 0,
+                "nprobe": self.nprobe,
+                "memory_mapped": isinstance(self._matrix, np.memmap),
+                "searches": self._searches,
+                "avg_search_ms": round(self._total_search_ms / self._searches, 3) if self._searches else None,
+            }
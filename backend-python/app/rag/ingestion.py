@@ -1,94 +1,285 @@
 import logging
 import os
+import time
 from pathlib import Path
+from typing import Iterator, List, Tuple
 from llama_index.readers.docling import DoclingReader
-from llama_index.core.node_parser import SemanticSplitterNodeParser
-from llama_index.core.ingestion import IngestionPipeline
-from llama_index.core.schema import Document
+from llama_index.core.schema import BaseNode, Document
 from .factory import RAGFactory
+from .chunking import ChunkerRegistry, build_splitter, resolve_strategy
+from .bucketing import LengthBucketer, text_lengths
+from .cache import CachedEmbedding, EmbeddingCache
+from .manifest import chunk_hash
+from .parsing import DoclingParserPool, parse_file
+from ..config import settings
 
 logger = logging.getLogger("rag_ingestion")
 
+# Document metadata keys that are bookkeeping, not content to embed
+FILE_EXCLUDED_EMBED_KEYS = ["filename", "file_path", "page_label", "chunking_strategy"]
+
+
 class IngestionService:
+    _reader = None
+
+    @classmethod
+    def get_reader(cls) -> DoclingReader:
+        """
+        Long-lived Docling reader for in-process parsing; its converter keeps
+        the layout models loaded between files.
+        """
+        if cls._reader is None:
+            cls._reader = DoclingReader()
+        return cls._reader
+
+    @staticmethod
+    def _file_documents(file_path: str, parsed: List[Tuple[str, dict]], metadata: dict = None) -> List[Document]:
+        base_metadata = metadata or {}
+        docs = []
+        for text, doc_metadata in parsed:
+            doc = Document(text=text, metadata={**doc_metadata, **base_metadata})
+            doc.metadata["filename"] = base_metadata.get("filename", os.path.basename(file_path))
+            doc.metadata["file_path"] = str(file_path)
+            # Filter out utility keys from embedding
+            doc.excluded_embed_metadata_keys = list(FILE_EXCLUDED_EMBED_KEYS)
+            docs.append(doc)
+        return docs
+
+    @staticmethod
+    def _split_documents(docs: List[Document], embed_model) -> List[BaseNode]:
+        """
+        Splits documents with their chunking strategy (semantic by default).
+        """
+        nodes = []
+        for doc in docs:
+            node_parser = ChunkerRegistry.get(resolve_strategy(doc.metadata), embed_model)
+            nodes.extend(node_parser.get_nodes_from_documents([doc]))
+        return nodes
+
     @staticmethod
     def process_file(file_path: str, metadata: dict = None):
         """
-        Parses file and processes into hierarchical chunks.
+        Parses a file with Docling (PDFs page by page, through the page cache),
+        chunks and embeds it. Returns the embedded nodes; persisting them is up to the caller.
         """
         try:
             # Parse document layout and content
             logger.info(f"Starting ingestion for {file_path}")
-            reader = DoclingReader()
-            docs = reader.load_data(file_path=file_path)
-            
-            logger.info(f"Parsed {len(docs)} document objects.")
-
-            # Enrich with metadata
-            base_metadata = metadata or {}
-            for doc in docs:
-                doc.metadata.update(base_metadata)
-                doc.metadata["filename"] = base_metadata.get("filename", os.path.basename(file_path))
-                # Filter out utility keys from embedding
-                doc.excluded_embed_metadata_keys = ["filename", "page_label"]
-
-            # Semantic Chunking for better context preservation
-            embed_model = RAGFactory.get_embedding_model()
-            node_parser = SemanticSplitterNodeParser(
-                buffer_size=1, 
-                breakpoint_percentile_threshold=95, 
-                embed_model=embed_model
-            )
-            
-            # Generate nodes
-            nodes = node_parser.get_nodes_from_documents(docs)
-            
-            logger.info(f"Generated {len(nodes)} semantic chunks.")
+            parsed = parse_file(IngestionService.get_reader(), file_path)
+            if parsed.error:
+                raise ValueError(parsed.error)
+            logger.info(f"Parsed {len(parsed.documents)} document objects ({parsed.cached_pages} pages from cache).")
+            docs = IngestionService._file_documents(file_path, parsed.documents, metadata)
 
-            pipeline = IngestionPipeline(
-                transformations=[embed_model],
-                vector_store=RAGFactory.get_vector_store()
-            )
+            with RAGFactory.acquire("embedding") as embed_model:
+                nodes = IngestionService._split_documents(docs, embed_model)
+                logger.info(f"Generated {len(nodes)} chunks.")
+                IngestionService._embed_nodes([node for node in nodes if node.embedding is None], embed_model)
 
-            result_nodes = pipeline.run(nodes=nodes)
-            
-            logger.info(f"Ingestion complete. Processing complete.")
-            return result_nodes
+            logger.info(f"Ingestion complete for {file_path}.")
+            return nodes
 
         except Exception as e:
             logger.error(f"Ingestion failed for {file_path}: {e}")
             raise e
-        
+
     @staticmethod
-    def process_text(text: str, metadata: dict = None):
+    def process_files(paths: List[str], metadata: dict = None, parser_pool: DoclingParserPool = None, embed_batch: int = None) -> Iterator[dict]:
+        """
+        Batch file ingestion: files are parsed in a DoclingParserPool while
+        this process chunks them and embeds the chunks of several files
+        together in shared batches of about `embed_batch` chunks.
+
+        Yields one result per file, in completion order:
+        {"file", "nodes", "parse_ms", "cached_pages", "failed_pages"} or
+        {"file", "error"}. A PDF with failed_pages was ingested without them.
+        """
+        embed_batch = max(1, embed_batch or settings.file_ingest_embed_batch)
+        own_pool = parser_pool is None
+        pool = parser_pool or DoclingParserPool()
+        waiting: List[dict] = []
+
+        def flush(embed_model) -> List[dict]:
+            nodes = [node for result in waiting for node in result["nodes"] if node.embedding is None]
+            if nodes:
+                IngestionService._embed_nodes(nodes, embed_model)
+            ready = list(waiting)
+            waiting.clear()
+            return ready
+
+        try:
+            with RAGFactory.acquire("embedding") as embed_model:
+                for parsed in pool.parse(paths):
+                    if parsed.error:
+                        yield {"file": parsed.path, "error": parsed.error}
+                        continue
+                    try:
+                        docs = IngestionService._file_documents(parsed.path, parsed.documents, metadata)
+                        nodes = IngestionService._split_documents(docs, embed_model)
+                    except Exception as e:
+                        logger.error(f"Chunking {parsed.path} failed: {e}")
+                        yield {"file": parsed.path, "error": str(e)}
+                        continue
+                    waiting.append({
+                        "file": parsed.path,
+                        "nodes": nodes,
+                        "parse_ms": round(parsed.parse_ms, 2),
+                        "cached_pages": parsed.cached_pages,
+                        "failed_pages": parsed.failed_pages,
+                    })
+                    if sum(len(result["nodes"]) for result in waiting) >= embed_batch:
+                        yield from flush(embed_model)
+                yield from flush(embed_model)
+        finally:
+            if own_pool:
+                pool.close()
+
+    @staticmethod
+    def process_text(text: str, metadata: dict = None, timings: dict = None, embed_mode: str = None, progress=None):
         """
         Process raw text input.
         Bypasses Docling (as layout is lost), but applies Semantic Chunking and Embedding.
+
+        embed_mode "batch" embeds the final chunks in batches of ingest_embed_batch_size,
+        "reuse" pools the sentence-group embeddings the splitter already computed.
+        Per-stage durations (ms) are written into `timings` if given, and
+        `progress(stage, done, total)` is called as chunks get embedded.
         """
         try:
             logger.info("Starting ingestion for raw text.")
+            embed_mode = embed_mode or settings.ingest_embed_mode
             doc = Document(text=text, metadata=metadata or {})
             
             # Semantic Chunking & Embedding
-            embed_model = RAGFactory.get_embedding_model()
-            # Use Semantic Chunking for text as well for consistency
-            node_parser = SemanticSplitterNodeParser(
-                buffer_size=1, 
-                breakpoint_percentile_threshold=95, 
-                embed_model=embed_model
-            )
+            # Hold a handle so a runtime model swap doesn't change models mid-document
+            with RAGFactory.acquire("embedding") as embed_model:
+                return IngestionService._split_and_embed(doc, embed_model, embed_mode, timings, progress)
             
-            # Generate nodes
-            nodes = node_parser.get_nodes_from_documents([doc])
+        except Exception as e:
+            logger.error(f"Text ingestion failed: {e}")
+            raise e
 
-            # Embed nodes
-            for node in nodes:
-                node.embedding = embed_model.get_text_embedding(node.get_content())
-            
-            logger.info(f"Text ingestion complete. Generated {len(nodes)} semantic chunks.")
+    @staticmethod
+    def process_text_incremental(text: str, metadata: dict = None, known_hashes=frozenset(), timings: dict = None, progress=None):
+        """
+        Like process_text, for a new version of an already ingested document.
+        The splitter's sentence-group embeddings go through the EmbeddingCache,
+        so unchanged passages aren't re-embedded while finding breakpoints,
+        and chunks whose hash is in `known_hashes` are returned unembedded
+        (embedding None). Every node gets metadata["chunk_hash"].
+        """
+        try:
+            logger.info(f"Starting incremental ingestion ({len(known_hashes)} known chunks).")
+            doc = Document(text=text, metadata=metadata or {})
+            with RAGFactory.acquire("embedding") as embed_model:
+                splitter_model = CachedEmbedding(embed_model, EmbeddingCache.instance())
+                nodes = IngestionService._split_and_embed(
+                    doc, embed_model, "batch", timings, progress,
+                    splitter_model=splitter_model,
+                    skip=lambda node: node.metadata["chunk_hash"] in known_hashes,
+                )
             return nodes
-            
         except Exception as e:
-            logger.error(f"Text ingestion failed: {e}")
+            logger.error(f"Incremental text ingestion failed: {e}")
             raise e
 
+    @staticmethod
+    def _split_and_embed(doc: Document, embed_model, embed_mode: str, timings: dict = None, progress=None, splitter_model=None, skip=None):
+        """
+        Splits one document with its chunking strategy and embeds the resulting chunks.
+        `splitter_model` overrides the model used to find breakpoints, and
+        chunks for which `skip(node)` is true are left unembedded.
+        """
+        strategy = resolve_strategy(doc.metadata)
+        if splitter_model is None:
+            node_parser = ChunkerRegistry.get(strategy, embed_model, embed_mode)
+        else:
+            node_parser = build_splitter(strategy, splitter_model, embed_mode)
+        
+        # Generate nodes
+        if progress:
+            progress("splitting", 0, 0)
+        start = time.perf_counter()
+        nodes = node_parser.get_nodes_from_documents([doc])
+        split_done = time.perf_counter()
+
+        if skip:
+            for node in nodes:
+                node.metadata["chunk_hash"] = chunk_hash(node.get_content())
+                for excluded in (node.excluded_embed_metadata_keys, node.excluded_llm_metadata_keys):
+                    if "chunk_hash" not in excluded:
+                        excluded.append("chunk_hash")
+
+        # Embed nodes (batched forward passes for everything the splitter didn't embed)
+        pending = [node for node in nodes if node.embedding is None and not (skip and skip(node))]
+        already_embedded = len(nodes) - len(pending)
+        if progress:
+            progress("embedding", already_embedded, len(nodes))
+        done = already_embedded
+
+        def on_batch(n: int):
+            nonlocal done
+            done += n
+            if progress:
+                progress("embedding", done, len(nodes))
+
+        IngestionService._embed_nodes(pending, embed_model, timings, on_batch)
+        embed_done = time.perf_counter()
+
+        if timings is not None:
+            timings["split_ms"] = round((split_done - start) * 1000, 2)
+            timings["embed_ms"] = round((embed_done - split_done) * 1000, 2)
+        
+        logger.info(
+            f"Text ingestion complete. Generated {len(nodes)} chunks "
+            f"(strategy={strategy}, mode={embed_mode}, split={(split_done - start):.2f}s, embed={(embed_done - split_done):.2f}s)."
+        )
+        return nodes
+
+    @staticmethod
+    def _embed_nodes(nodes, embed_model, timings: dict = None, on_batch=None):
+        """
+        Embeds `nodes` in place, through the embedding cache and length
+        bucketing when enabled. `on_batch(n)` is called after each batch.
+        Only texts that reach the model count towards the token report.
+        """
+        texts = [node.get_content() for node in nodes]
+        vectors = [None] * len(texts)
+        todo = texts
+        cache = EmbeddingCache.instance() if settings.embedding_cache_enabled else None
+        if cache:
+            # Boilerplate chunks and re-uploads are served from the cache
+            for i, vector in enumerate(cache.get_many(texts)):
+                if vector is not None:
+                    vectors[i] = vector.tolist()
+            todo = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+            served = len(texts) - len(todo)
+            if on_batch and served:
+                on_batch(served)
+
+        embedded = []
+        if todo and settings.length_bucketing_enabled:
+            # Similar-length chunks share a batch, so short chunks aren't padded to long ones
+            token_report = {}
+            embedded = LengthBucketer.instance("embed").run(
+                todo, embed_model.get_text_embedding_batch, text_lengths(embed_model)(todo), on_batch=on_batch, report=token_report
+            )
+            if timings is not None and token_report:
+                timings["embed_tokens"] = timings.get("embed_tokens", 0) + token_report["tokens"]
+                timings["embed_padded_tokens"] = timings.get("embed_padded_tokens", 0) + token_report["padded_tokens"]
+        elif todo:
+            batch_size = max(1, settings.ingest_embed_batch_size)
+            for i in range(0, len(todo), batch_size):
+                embedded.extend(embed_model.get_text_embedding_batch(todo[i:i + batch_size]))
+                if on_batch:
+                    on_batch(len(todo[i:i + batch_size]))
 
+        if cache:
+            if todo:
+                cache.put_many(todo, embedded)
+            fresh = dict(zip(todo, embedded))
+            vectors = [v if v is not None else list(fresh[t]) for t, v in zip(texts, vectors)]
+        else:
+            vectors = embedded
+        for node, vector in zip(nodes, vectors):
+            node.embedding = vector
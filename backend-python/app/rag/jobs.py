@@ -0,0 +1,284 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Optional
+
+from .concurrency import QueueFullError
+
+logger = logging.getLogger("rag_jobs")
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+def process_tag(pid: int) -> Optional[str]:
+    """
+    "<boot id>:<pid>:<start time>" of a running process, or None once it has
+    exited. The start time tells a reused pid (e.g. pid 1 after a container
+    restart) apart from the process that created a job.
+    """
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            boot_id = f.read().strip()
+        with open(f"/proc/{pid}/stat") as f:
+            # Field 22 (starttime); the command name before it may contain spaces
+            start = f.read().rsplit(")", 1)[1].split()[19]
+    except FileNotFoundError:
+        if os.path.isdir("/proc"):
+            return None
+        # No procfs: fall back to whether the pid exists
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return None
+        except PermissionError:
+            pass
+        boot_id, start = "", ""
+    return f"{boot_id}:{pid}:{start}"
+
+
+class IngestJobStore:
+    """
+    SQLite-backed ingest job state.
+    Every operation opens its own short-lived connection, so worker threads can
+    report progress without sharing a connection across threads.
+
+    Each job records the process that owns it (see process_tag), so several
+    uvicorn workers can share one store: a starting worker only fails jobs
+    whose owner is gone. Owners are checked by pid, so the workers sharing
+    a store must run on one host (one pid namespace).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.owner = process_tag(os.getpid())
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ingest_jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    chunks_done INTEGER NOT NULL DEFAULT 0,
+                    chunks_total INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    result TEXT,
+                    owner TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(ingest_jobs)")}
+            if "owner" not in columns:
+                # Stores created before jobs had owners; their unfinished jobs count as orphaned
+                conn.execute("ALTER TABLE ingest_jobs ADD COLUMN owner TEXT")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30.0)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _execute(self, sql: str, params: tuple = ()):
+        with self._lock, self._connect() as conn:
+            conn.execute(sql, params)
+
+    def create(self, job_id: str, priority: int = 0):
+        now = time.time()
+        self._execute(
+            "INSERT INTO ingest_jobs (id, status, stage, priority, owner, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, QUEUED, QUEUED, priority, self.owner, now, now)
+        )
+
+    def update_progress(self, job_id: str, stage: str, chunks_done: int = 0, chunks_total: int = 0):
+        self._execute(
+            "UPDATE ingest_jobs SET status = ?, stage = ?, chunks_done = ?, chunks_total = ?, updated_at = ? WHERE id = ?",
+            (RUNNING, stage, chunks_done, chunks_total, time.time(), job_id)
+        )
+
+    def complete(self, job_id: str, result: dict):
+        chunk_count = len(result.get("chunks", []))
+        self._execute(
+            "UPDATE ingest_jobs SET status = ?, stage = ?, chunks_done = ?, chunks_total = ?, result = ?, updated_at = ? WHERE id = ?",
+            (SUCCEEDED, "done", chunk_count, chunk_count, json.dumps(result), time.time(), job_id)
+        )
+
+    def fail(self, job_id: str, error: str):
+        self._execute(
+            "UPDATE ingest_jobs SET status = ?, stage = ?, error = ?, updated_at = ? WHERE id = ?",
+            (FAILED, "failed", error, time.time(), job_id)
+        )
+
+    def fail_incomplete(self, reason: str) -> int:
+        """
+        Marks jobs left queued/running by processes that have exited as
+        failed; jobs of live processes (other workers) are left alone.
+        """
+        with self._lock, self._connect() as conn:
+            owners = [row["owner"] for row in conn.execute(
+                "SELECT DISTINCT owner FROM ingest_jobs WHERE status IN (?, ?) AND owner IS NOT NULL", (QUEUED, RUNNING)
+            )]
+            orphaned = [owner for owner in owners if not self._alive(owner)]
+            cursor = conn.execute(
+                "UPDATE ingest_jobs SET status = ?, stage = ?, error = ?, updated_at = ? "
+                f"WHERE status IN (?, ?) AND (owner IS NULL OR owner IN ({', '.join('?' * len(orphaned)) or 'NULL'}))",
+                (FAILED, "failed", reason, time.time(), QUEUED, RUNNING, *orphaned)
+            )
+            return cursor.rowcount
+
+    @staticmethod
+    def _alive(owner: str) -> bool:
+        try:
+            pid = int(owner.split(":")[1])
+        except (IndexError, ValueError):
+            return False
+        return process_tag(pid) == owner
+
+    def delete(self, job_id: str):
+        self._execute("DELETE FROM ingest_jobs WHERE id = ?", (job_id,))
+
+    def purge_finished(self, older_than: float) -> int:
+        """
+        Deletes succeeded/failed jobs last updated more than `older_than` seconds ago.
+        """
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM ingest_jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (SUCCEEDED, FAILED, time.time() - older_than)
+            )
+            return cursor.rowcount
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM ingest_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+
+class IngestJobQueue:
+    """
+    Bounded priority queue of ingest jobs served by a fixed pool of async workers.
+
+    Higher `priority` runs first, FIFO within a priority. When the queue holds
+    `max_queued` jobs, submit() raises QueueFullError so callers can back off
+    instead of piling more CPU-bound ingests onto the embedder.
+    Store calls run in threads, as a finished job's result holds every chunk
+    embedding. Finished jobs are deleted `ttl` seconds after they finish.
+    """
+
+    def __init__(
+        self,
+        ingest_fn: Callable[..., Awaitable],
+        store: IngestJobStore,
+        workers: int = 2,
+        max_queued: int = 100,
+        ttl: float = 86400.0,
+    ):
+        self._ingest_fn = ingest_fn
+        self.store = store
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks = []
+        self._seq = itertools.count()
+        self._last_purge = time.monotonic()
+
+        interrupted = self.store.fail_incomplete("Interrupted by service restart")
+        if interrupted:
+            logger.warning(f"Marked {interrupted} unfinished ingest jobs as failed.")
+        self.store.purge_finished(self.ttl)
+
+    def _ensure_workers(self):
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue(maxsize=self.max_queued)
+        self._tasks = [t for t in self._tasks if not t.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._work()))
+
+    async def submit(self, text: str, metadata: dict = None, priority: int = 0) -> str:
+        self._ensure_workers()
+        if self._queue.full():
+            raise QueueFullError(f"Ingest queue is full ({self.max_queued} jobs waiting)")
+        await self._purge_expired()
+
+        job_id = uuid.uuid4().hex
+        await asyncio.to_thread(self.store.create, job_id, priority)
+        try:
+            self._queue.put_nowait((-priority, next(self._seq), job_id, text, metadata or {}))
+        except asyncio.QueueFull:
+            # Another submit took the last slot while the job row was written
+            await asyncio.to_thread(self.store.delete, job_id)
+            raise QueueFullError(f"Ingest queue is full ({self.max_queued} jobs waiting)")
+        logger.info(f"Queued ingest job {job_id} (priority={priority}, queued={self._queue.qsize()})")
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is not None and job["status"] == QUEUED and self._queue is not None:
+            job["queue_depth"] = self._queue.qsize()
+        return job
+
+    async def _purge_expired(self):
+        # At most once a minute; purging only matters while jobs keep arriving
+        if time.monotonic() - self._last_purge < 60.0:
+            return
+        self._last_purge = time.monotonic()
+        purged = await asyncio.to_thread(self.store.purge_finished, self.ttl)
+        if purged:
+            logger.info(f"Purged {purged} finished ingest jobs older than {self.ttl:.0f}s.")
+
+    async def _work(self):
+        while True:
+            _, _, job_id, text, metadata = await self._queue.get()
+            try:
+                await asyncio.to_thread(self.store.update_progress, job_id, "processing")
+
+                # Called from the ingest's worker thread
+                def progress(stage: str, done: int, total: int):
+                    self.store.update_progress(job_id, stage, done, total)
+
+                timings = {}
+                document_metadata, chunks = await self._ingest_fn(text, metadata, timings, progress)
+                await asyncio.to_thread(self.store.complete, job_id, {
+                    "document_metadata": document_metadata,
+                    "chunks": chunks,
+                    "timings": timings
+                })
+                logger.info(f"Ingest job {job_id} finished with {len(chunks)} chunks.")
+            except Exception as e:
+                logger.error(f"Ingest job {job_id} failed: {e}")
+                await asyncio.to_thread(self.store.fail, job_id, str(e))
+            finally:
+                self._queue.task_done()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
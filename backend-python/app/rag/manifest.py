@@ -0,0 +1,113 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from ..config import settings
+from .cache import normalize_text
+
+logger = logging.getLogger("rag_manifest")
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def chunk_ids(document_id: str, hashes: List[str]) -> List[str]:
+    """
+    Content-derived chunk ids, "<document_id>#<hash prefix>-<n>", where n
+    counts repeats of the same content, so unchanged chunks keep their id.
+    """
+    seen: Dict[str, int] = defaultdict(int)
+    ids = []
+    for h in hashes:
+        # Counted by prefix, which is all the id holds, so ids stay unique
+        # and can be continued from the prefixes of existing ids
+        ids.append(f"{document_id}#{h[:16]}-{seen[h[:16]]}")
+        seen[h[:16]] += 1
+    return ids
+
+
+def diff(previous: List[Tuple[str, str]], current: List[Tuple[str, str]]) -> Dict[str, List[str]]:
+    """
+    Compares (chunk_id, hash) lists of two versions of a document.
+    Returns {"added", "removed", "kept"} chunk ids.
+    """
+    old_ids = {chunk_id for chunk_id, _ in previous}
+    new_ids = [chunk_id for chunk_id, _ in current]
+    new_set = set(new_ids)
+    return {
+        "added": [chunk_id for chunk_id in new_ids if chunk_id not in old_ids],
+        "removed": [chunk_id for chunk_id, _ in previous if chunk_id not in new_set],
+        "kept": [chunk_id for chunk_id in new_ids if chunk_id in old_ids],
+    }
+
+
+class ChunkManifest:
+    """
+    SQLite record of which chunks (id, content hash, position) each document
+    was last ingested with; the baseline for incremental re-ingestion.
+    """
+    _instance: Optional["ChunkManifest"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunk_manifest (
+                    document_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    PRIMARY KEY (document_id, position)
+                )
+                """
+            )
+
+    @classmethod
+    def instance(cls) -> "ChunkManifest":
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls(settings.ingest_manifest_db_path)
+        return cls._instance
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30.0)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, document_id: str) -> List[Tuple[str, str]]:
+        """
+        (chunk_id, hash) pairs of the document's last ingest, in order.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT chunk_id, hash FROM chunk_manifest WHERE document_id = ? ORDER BY position",
+                (document_id,)
+            ).fetchall()
+        return [(chunk_id, h) for chunk_id, h in rows]
+
+    def replace(self, document_id: str, chunks: List[Tuple[str, str]]):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM chunk_manifest WHERE document_id = ?", (document_id,))
+            conn.executemany(
+                "INSERT INTO chunk_manifest (document_id, position, chunk_id, hash) VALUES (?, ?, ?, ?)",
+                [(document_id, position, chunk_id, h) for position, (chunk_id, h) in enumerate(chunks)]
+            )
+
+    def delete(self, document_id: str):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM chunk_manifest WHERE document_id = ?", (document_id,))
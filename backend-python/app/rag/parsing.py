@@ -0,0 +1,374 @@
+import hashlib
+import logging
+import multiprocessing as mp
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from ..config import settings
+
+logger = logging.getLogger("rag_parsing")
+
+# One DoclingReader (and with it one DocumentConverter and its loaded layout
+# models) per worker process, built by the pool initializer
+_reader = None
+
+
+def collect_files(paths: Iterable[str], recursive: bool = True, extensions: Sequence[str] = None) -> List[str]:
+    """
+    Expands directories into the files below them with a supported extension.
+    Explicitly listed files are kept as given. Order is stable (sorted per directory).
+    """
+    extensions = {e.lower() for e in (extensions or settings.file_ingest_extensions)}
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            walker = os.walk(path) if recursive else [(path, [], os.listdir(path))]
+            for root, dirs, names in walker:
+                dirs.sort()
+                files.extend(
+                    os.path.join(root, name) for name in sorted(names)
+                    if os.path.splitext(name)[1].lower() in extensions and os.path.isfile(os.path.join(root, name))
+                )
+        else:
+            files.append(path)
+    return files
+
+
+def _init_parser(threads: int):
+    global _reader
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except Exception:
+        pass
+    from llama_index.readers.docling import DoclingReader
+
+    _reader = DoclingReader()
+    try:
+        # Load the PDF pipeline (layout/table models) now rather than on the first file
+        from docling.datamodel.base_models import InputFormat
+        _reader.doc_converter.initialize_pipeline(InputFormat.PDF)
+    except Exception as e:
+        logger.warning(f"Could not pre-load the Docling PDF pipeline: {e}")
+
+
+def _parse(path: str) -> Tuple[List[Tuple[str, dict]], float]:
+    start = time.perf_counter()
+    docs = _reader.load_data(file_path=path)
+    # Plain tuples pickle cheaply and don't depend on llama-index object state
+    return [(doc.text, dict(doc.metadata or {})) for doc in docs], (time.perf_counter() - start) * 1000
+
+
+def parse_page(reader, path: str, page_no: int) -> str:
+    """
+    Markdown of one page (1-based) of a PDF, converted on its own.
+    """
+    document = reader.doc_converter.convert(path, page_range=(page_no, page_no)).document
+    return document.export_to_markdown(**reader.md_export_kwargs)
+
+
+def _parse_page(path: str, page_no: int) -> Tuple[str, float]:
+    start = time.perf_counter()
+    return parse_page(_reader, path, page_no), (time.perf_counter() - start) * 1000
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def pdf_page_count(path: str) -> int:
+    import pypdfium2
+
+    pdf = pypdfium2.PdfDocument(path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def parser_version() -> str:
+    """
+    Cache key component: Docling version, export format and `page_parser_version`
+    (bump the setting to invalidate cached pages after changing parser options).
+    """
+    try:
+        from importlib.metadata import version
+        docling_version = version("docling")
+    except Exception:
+        docling_version = "unknown"
+    return f"docling-{docling_version}-markdown-{settings.page_parser_version}"
+
+
+class PageCache:
+    """
+    SQLite cache of parsed page text keyed by (file hash, page number, parser
+    version), so re-ingesting an unchanged PDF (e.g. after a chunking change)
+    skips parsing, and a re-upload only parses pages that aren't cached.
+    """
+    _instance: Optional["PageCache"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS parsed_pages (
+                    file_hash TEXT NOT NULL,
+                    page_no INTEGER NOT NULL,
+                    parser_version TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    PRIMARY KEY (file_hash, page_no, parser_version)
+                )
+                """
+            )
+
+    @classmethod
+    def instance(cls) -> "PageCache":
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls(settings.page_cache_path)
+        return cls._instance
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30.0)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_pages(self, file_hash: str, version: str, page_count: int) -> Dict[int, str]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT page_no, text FROM parsed_pages WHERE file_hash = ? AND parser_version = ?",
+                (file_hash, version)
+            ).fetchall()
+        pages = {page_no: text for page_no, text in rows if page_no <= page_count}
+        self._hits += len(pages)
+        self._misses += page_count - len(pages)
+        return pages
+
+    def put(self, file_hash: str, version: str, page_no: int, text: str):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO parsed_pages (file_hash, page_no, parser_version, text) VALUES (?, ?, ?, ?)",
+                (file_hash, page_no, version, text)
+            )
+
+    def stats(self) -> dict:
+        total = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / total, 4) if total else None,
+        }
+
+
+@dataclass
+class ParsedFile:
+    path: str
+    documents: List[Tuple[str, dict]] = field(default_factory=list)
+    parse_ms: float = 0.0
+    error: Optional[str] = None
+    cached_pages: int = 0
+    failed_pages: List[int] = field(default_factory=list)
+
+
+@dataclass
+class _PagedFile:
+    """
+    Progress of one PDF being parsed page by page.
+    """
+    path: str
+    file_hash: str
+    page_count: int
+    pages: Dict[int, str]
+    missing: set
+    cached_pages: int = 0
+    failed_pages: List[int] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    parse_ms: float = 0.0
+
+    def complete(self, page_no: int, text: Optional[str] = None, parse_ms: float = 0.0, error: Optional[str] = None):
+        self.missing.discard(page_no)
+        self.parse_ms += parse_ms
+        if error is None:
+            self.pages[page_no] = text
+            PageCache.instance().put(self.file_hash, parser_version(), page_no, text)
+        else:
+            logger.error(f"Parsing page {page_no} of {self.path} failed: {error}")
+            self.failed_pages.append(page_no)
+            self.errors.append(error)
+
+    def result(self) -> ParsedFile:
+        if not self.pages:
+            return ParsedFile(self.path, parse_ms=self.parse_ms, error=f"All {self.page_count} pages failed: {self.errors[0] if self.errors else 'empty document'}")
+        # One document per page, so chunks never span pages and carry their page_label
+        return ParsedFile(
+            self.path,
+            [(self.pages[page_no], {"page_label": str(page_no)}) for page_no in sorted(self.pages)],
+            parse_ms=self.parse_ms,
+            cached_pages=self.cached_pages,
+            failed_pages=sorted(self.failed_pages),
+        )
+
+
+def plan_pages(path: str) -> Optional[_PagedFile]:
+    """
+    Page-level plan for a PDF: cached pages filled in, the rest in `missing`.
+    None for files that are parsed whole (non-PDFs, page parsing disabled,
+    or a PDF whose pages can't be counted).
+    """
+    if not settings.page_parsing_enabled or os.path.splitext(path)[1].lower() != ".pdf":
+        return None
+    try:
+        file_hash = file_sha256(path)
+        page_count = pdf_page_count(path)
+    except Exception as e:
+        logger.warning(f"Parsing {path} as a whole, page split failed: {e}")
+        return None
+    cached = PageCache.instance().get_pages(file_hash, parser_version(), page_count)
+    missing = set(range(1, page_count + 1)) - set(cached)
+    return _PagedFile(path, file_hash, page_count, dict(cached), missing, cached_pages=len(cached))
+
+
+def parse_file(reader, path: str) -> ParsedFile:
+    """
+    In-process parse of one file with `reader`, page by page (and through
+    the page cache) for PDFs.
+    """
+    paged = plan_pages(path)
+    if paged is None:
+        start = time.perf_counter()
+        docs = reader.load_data(file_path=path)
+        return ParsedFile(path, [(doc.text, dict(doc.metadata or {})) for doc in docs], (time.perf_counter() - start) * 1000)
+    for page_no in sorted(paged.missing):
+        start = time.perf_counter()
+        try:
+            paged.complete(page_no, parse_page(reader, path, page_no), (time.perf_counter() - start) * 1000)
+        except Exception as e:
+            paged.complete(page_no, parse_ms=(time.perf_counter() - start) * 1000, error=str(e) or type(e).__name__)
+    return paged.result()
+
+
+class DoclingParserPool:
+    """
+    Parses files with Docling in `workers` processes, each holding one
+    long-lived converter. PDFs are split into one task per page (see
+    plan_pages), so pages of a large PDF parse in parallel, cached pages are
+    skipped, and a bad page only loses that page.
+
+    parse() keeps at most `max_in_flight` tasks submitted and yields one
+    ParsedFile per file, in completion order, so parsing runs ahead of
+    whatever consumes the results without parsing the whole batch up front.
+    """
+
+    def __init__(self, workers: int = None, threads_per_worker: int = None, start_method: str = "spawn", max_in_flight: int = None):
+        self.workers = max(1, workers or settings.docling_workers)
+        threads = max(1, threads_per_worker or settings.docling_worker_threads)
+        self.max_in_flight = max_in_flight or 2 * self.workers
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=mp.get_context(start_method),
+            initializer=_init_parser,
+            initargs=(threads,),
+        )
+        logger.info(f"Started {self.workers} Docling parser processes ({threads} threads each)")
+
+    def parse(self, paths: Iterable[str]) -> Iterator[ParsedFile]:
+        remaining = iter(paths)
+        tasks = deque()  # (path, page_no or None for a whole-file parse)
+        paged: Dict[str, _PagedFile] = {}
+        ready = deque()
+        in_flight = {}
+        exhausted = False
+
+        def refill():
+            nonlocal exhausted
+            while len(in_flight) < self.max_in_flight and len(ready) < self.max_in_flight:
+                if not tasks:
+                    path = next(remaining, None)
+                    if path is None:
+                        exhausted = True
+                        return
+                    plan = plan_pages(path)
+                    if plan is None:
+                        tasks.append((path, None))
+                    elif not plan.missing:
+                        ready.append(plan.result())
+                    else:
+                        paged[path] = plan
+                        tasks.extend((path, page_no) for page_no in sorted(plan.missing))
+                    continue
+                path, page_no = tasks.popleft()
+                future = self._executor.submit(_parse, path) if page_no is None else self._executor.submit(_parse_page, path, page_no)
+                in_flight[future] = (path, page_no)
+
+        try:
+            while True:
+                refill()
+                while ready:
+                    yield ready.popleft()
+                if not in_flight:
+                    if exhausted and not tasks:
+                        break
+                    continue
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, page_no = in_flight.pop(future)
+                    if page_no is None:
+                        try:
+                            documents, parse_ms = future.result()
+                            ready.append(ParsedFile(path, documents, parse_ms))
+                        except Exception as e:
+                            logger.error(f"Parsing {path} failed: {e}")
+                            ready.append(ParsedFile(path, error=str(e) or type(e).__name__))
+                        continue
+
+                    plan = paged[path]
+                    try:
+                        text, parse_ms = future.result()
+                        plan.complete(page_no, text, parse_ms)
+                    except Exception as e:
+                        plan.complete(page_no, error=str(e) or type(e).__name__)
+                    if not plan.missing:
+                        ready.append(paged.pop(path).result())
+        finally:
+            # The pool may be shared, so a closed or abandoned parse drops its queued tasks
+            for future in in_flight:
+                future.cancel()
+
+    @property
+    def broken(self) -> bool:
+        """
+        True once a worker process died; the executor then rejects new tasks.
+        """
+        return bool(self._executor._broken)
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> "DoclingParserPool":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,9 +1,11 @@
-from typing import List, Optional
+from typing import ClassVar, Dict, List, Optional
 from llama_index.core.postprocessor.types import BaseNodePostprocessor
-from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
 from flashrank import Ranker, RerankRequest
 import logging
 
+from .compression import compress_context, count_tokens
+
 logger = logging.getLogger("rag_postprocessor")
 
 class FlashRankRerank(BaseNodePostprocessor):
@@ -13,12 +15,22 @@ class FlashRankRerank(BaseNodePostprocessor):
     model_name: str = "ms-marco-MiniLM-L-12-v2"
     top_n: int = 5
     _ranker: Optional[Ranker] = None
+    _shared_rankers: ClassVar[Dict[str, Ranker]] = {}
 
     def __init__(self, model_name: str = "ms-marco-MiniLM-L-12-v2", top_n: int = 5):
         super().__init__()
         self.model_name = model_name
         self.top_n = top_n
-        self._ranker = Ranker(model_name=model_name, cache_dir="./ollama_data/flashrank")
+        self._ranker = self.get_shared_ranker(model_name)
+
+    @classmethod
+    def get_shared_ranker(cls, model_name: str) -> Ranker:
+        """
+        One Ranker per model for the whole process (also used by startup warm-up).
+        """
+        if model_name not in cls._shared_rankers:
+            cls._shared_rankers[model_name] = Ranker(model_name=model_name, cache_dir="./ollama_data/flashrank")
+        return cls._shared_rankers[model_name]
 
     @classmethod
     def class_name(cls) -> str:
@@ -72,3 +84,47 @@ class FlashRankRerank(BaseNodePostprocessor):
             logger.error(f"FlashRank failed: {e}")
             # Fallback to original nodes, maybe sliced
             return nodes[:self.top_n]
+
+
+class LLMLinguaPostprocessor(BaseNodePostprocessor):
+    """
+    Compresses node texts with LLMLingua-2 down to a prompt token budget, for
+    llama-index query pipelines (/ask runs app.rag.compression directly).
+    Nodes compressed to nothing are dropped.
+    """
+    target_token: int = 3000
+
+    def __init__(self, target_token: int = 3000):
+        super().__init__()
+        self.target_token = target_token
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LLMLinguaPostprocessor"
+
+    def _postprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        if not nodes:
+            return nodes
+
+        query = query_bundle.query_str if query_bundle else ""
+        texts = [n.node.get_content() for n in nodes]
+        tokens = [count_tokens(text) for text in texts]
+        total = sum(tokens)
+        if total <= self.target_token:
+            return nodes
+
+        # Each node is compressed on its own, to its share of the budget, so its
+        # text can't shift onto another node when chunks are split, emptied or cut
+        result = []
+        for n, text, count in zip(nodes, texts, tokens):
+            compressed, _ = compress_context(query, [text], "llmlingua", max(1, self.target_token * count // total))
+            text = "\n\n".join(compressed)
+            if not text.strip():
+                continue
+            result.append(NodeWithScore(node=TextNode(text=text, id_=n.node.node_id, metadata=n.node.metadata), score=n.score))
+        logger.info(f"LLMLingua: {total} -> {sum(count_tokens(n.node.get_content()) for n in result)} tokens")
+        return result
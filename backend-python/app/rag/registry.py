@@ -0,0 +1,182 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("rag_registry")
+
+
+class _Slot:
+    """
+    One loaded model version plus the number of handles currently using it.
+    """
+
+    def __init__(self, model: Any, version: int, load_ms: float):
+        self.model = model
+        self.version = version
+        self.load_ms = load_ms
+        self.refs = 0
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of heavyweight models.
+
+    - Single-flight: concurrent cold callers of get()/acquire() wait for one
+      load instead of each loading their own copy.
+    - Handles: acquire() pins the current version with a reference count, so
+      unload()/swap() never pull a model out from under a running request.
+      Retired versions are dropped once their last handle is released.
+    - Swap: the replacement is loaded before the switch, so requests keep
+      using the old version until the new one is ready.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._slots: Dict[str, _Slot] = {}
+        self._retired: Dict[str, list] = {}
+        self._versions: Dict[str, int] = {}
+        self._released = threading.Condition(self._lock)
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        with self._lock:
+            self._loaders[name] = loader
+            self._load_locks.setdefault(name, threading.Lock())
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._slots
+
+    def _load(self, name: str, loader: Callable[[], Any]) -> _Slot:
+        start = time.perf_counter()
+        model = loader()
+        load_ms = round((time.perf_counter() - start) * 1000, 2)
+        with self._lock:
+            version = self._versions.get(name, 0) + 1
+            self._versions[name] = version
+        logger.info(f"Loaded model '{name}' v{version} in {load_ms}ms")
+        return _Slot(model, version, load_ms)
+
+    def _slot(self, name: str) -> _Slot:
+        slot = self._slots.get(name)
+        if slot is not None:
+            return slot
+
+        if name not in self._loaders:
+            raise KeyError(f"No loader registered for model '{name}'")
+
+        # Single-flight: only the first cold caller loads, the rest wait for it
+        with self._load_locks[name]:
+            slot = self._slots.get(name)
+            if slot is None:
+                slot = self._load(name, self._loaders[name])
+                with self._lock:
+                    self._slots[name] = slot
+            return slot
+
+    def get(self, name: str) -> Any:
+        """
+        Returns the current model, loading it on first use.
+        """
+        return self._slot(name).model
+
+    @contextmanager
+    def acquire(self, name: str):
+        """
+        Reference-counted handle on the current model version.
+        """
+        while True:
+            slot = self._slot(name)
+            with self._lock:
+                # The slot may have been swapped/unloaded between lookup and pin
+                if self._slots.get(name) is slot:
+                    slot.refs += 1
+                    break
+        try:
+            yield slot.model
+        finally:
+            released = []
+            with self._lock:
+                slot.refs -= 1
+                if slot.refs == 0:
+                    released = self._drop_retired(name)
+                    self._released.notify_all()
+            self._close(name, released)
+
+    def _drop_retired(self, name: str) -> List[_Slot]:
+        # Caller holds the lock; the returned slots are closed after releasing it
+        retired = self._retired.get(name, [])
+        self._retired[name] = [s for s in retired if s.refs > 0]
+        return [s for s in retired if s.refs == 0]
+
+    @staticmethod
+    def _close(name: str, slots: List[_Slot]):
+        # Called without the lock: closing a worker pool joins processes, which
+        # would otherwise block every get()/acquire() meanwhile
+        for s in slots:
+            logger.info(f"Released retired model '{name}' v{s.version}")
+            # Models owning processes or connections (e.g. worker pools) expose close()
+            close = getattr(s.model, "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception as e:
+                    logger.warning(f"Closing retired model '{name}' v{s.version} failed: {e}")
+            s.model = None
+
+    def _retire(self, name: str, slot: Optional[_Slot]) -> List[_Slot]:
+        # Caller holds the lock
+        if slot is None:
+            return []
+        self._retired.setdefault(name, []).append(slot)
+        return self._drop_retired(name)
+
+    def unload(self, name: str, wait: bool = False, timeout: Optional[float] = None) -> bool:
+        """
+        Removes the current version; the next get() loads it again.
+        With wait=True, blocks until handles on the old version are released.
+        Returns False if the wait timed out.
+        """
+        with self._load_locks.setdefault(name, threading.Lock()):
+            with self._lock:
+                slot = self._slots.pop(name, None)
+                released = self._retire(name, slot)
+        self._close(name, released)
+        if slot is not None:
+            logger.info(f"Unloaded model '{name}' v{slot.version} ({slot.refs} handles still open)")
+        if wait and slot is not None:
+            with self._lock:
+                return self._released.wait_for(lambda: slot.refs == 0, timeout=timeout)
+        return True
+
+    def swap(self, name: str, loader: Callable[[], Any]) -> Any:
+        """
+        Loads a replacement with `loader`, makes it current and registers it
+        as the loader for future reloads. In-flight handles keep the old version.
+        """
+        with self._load_locks.setdefault(name, threading.Lock()):
+            new_slot = self._load(name, loader)
+            with self._lock:
+                old_slot = self._slots.get(name)
+                self._slots[name] = new_slot
+                self._loaders[name] = loader
+                released = self._retire(name, old_slot)
+        self._close(name, released)
+        return new_slot.model
+
+    def stats(self) -> dict:
+        with self._lock:
+            names = set(self._loaders) | set(self._slots)
+            report = {}
+            for name in sorted(names):
+                slot = self._slots.get(name)
+                report[name] = {
+                    "loaded": slot is not None,
+                    "version": slot.version if slot else None,
+                    "load_ms": slot.load_ms if slot else None,
+                    "refs": slot.refs if slot else 0,
+                    "retired_in_use": len(self._retired.get(name, [])),
+                }
+            return report
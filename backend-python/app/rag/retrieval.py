@@ -0,0 +1,149 @@
+import hashlib
+import logging
+import os
+import threading
+from typing import List, Optional
+
+from ..config import settings
+from .cache import AnswerCache
+from .index import MANIFEST_FILE, VectorIndex
+from .manifest import chunk_hash, chunk_ids
+
+logger = logging.getLogger("rag_retrieval")
+
+
+def content_document_id(digest: str) -> str:
+    """
+    Document id for a document without document_id/filename, from the sha256 of its text.
+    """
+    return f"sha256-{digest[:32]}"
+
+
+class RetrievalService:
+    """
+    Local retrieval over the in-process VectorIndex, for deployments that
+    search without the Java/pgvector round trip.
+    Ingested chunks are added by AIService.ingest_document when
+    `vector_index_enabled` is set; the index is snapshotted to
+    `vector_index_path` on shutdown and via POST /index/snapshot.
+    """
+    _index: Optional[VectorIndex] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_index(cls) -> VectorIndex:
+        if cls._index is None:
+            with cls._lock:
+                if cls._index is None:
+                    cls._index = cls._load_index()
+        return cls._index
+
+    @staticmethod
+    def _load_index() -> VectorIndex:
+        options = {"nprobe": settings.vector_index_nprobe, "exact_threshold": settings.vector_index_exact_threshold}
+        path = settings.vector_index_path
+        if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+            index = VectorIndex.load(path, **options)
+            if index.model_name and index.model_name != settings.embedding_model_name:
+                logger.warning(
+                    f"Vector index at {path} was built with {index.model_name}, "
+                    f"but the embedder is {settings.embedding_model_name}; re-ingest to search it"
+                )
+            return index
+        return VectorIndex(model_name=settings.embedding_model_name, **options)
+
+    @staticmethod
+    def document_id(metadata: dict, text: Optional[str] = None) -> Optional[str]:
+        """
+        Index id of a document: its document_id or filename, otherwise derived
+        from its content (when `text` is given), so re-ingesting the same text
+        replaces its chunks instead of adding another copy.
+        """
+        document_id = metadata.get("document_id") or metadata.get("filename")
+        if document_id:
+            return str(document_id)
+        if text is None:
+            return None
+        return content_document_id(hashlib.sha256(text.encode("utf-8")).hexdigest())
+
+    @classmethod
+    def add_chunks(cls, document_id: str, chunks: List[dict], start: int = 0) -> List[str]:
+        """
+        Indexes the chunks of one document, replacing any it had before.
+        Returns the chunk ids, the content-derived ids of manifest.chunk_ids
+        that incremental re-ingests and document_chunks metadata also use;
+        each indexed chunk's metadata gets its chunk_id and chunk_hash.
+        Streaming ingest adds later batches with `start` > 0, which appends
+        instead of replacing.
+        """
+        index = cls.get_index()
+        previous = []
+        if start == 0:
+            cls._invalidate_answers(index, index.chunk_ids(document_id), {chunk["content"] for chunk in chunks})
+            index.remove_document(document_id)
+        else:
+            # Hash prefixes of the earlier batches, so repeats keep counting up
+            previous = [chunk_id.rsplit("#", 1)[1].rsplit("-", 1)[0] for chunk_id in index.chunk_ids(document_id)]
+        if not chunks:
+            return []
+        hashes = [chunk_hash(chunk["content"]) for chunk in chunks]
+        ids = chunk_ids(document_id, previous + hashes)[len(previous):]
+        index.add(
+            ids,
+            [chunk["embedding"] for chunk in chunks],
+            document_id,
+            [
+                {"content": chunk["content"], "metadata": {**chunk.get("metadata", {}), "chunk_id": chunk_id, "chunk_hash": h}}
+                for chunk, chunk_id, h in zip(chunks, ids, hashes)
+            ],
+        )
+        logger.info(f"Indexed {len(ids)} chunks for document {document_id}")
+        return ids
+
+    @classmethod
+    def apply_delta(cls, document_id: str, added: List[dict], kept_ids: List[str]):
+        """
+        Applies an incremental re-ingest: drops the document's chunks that
+        weren't kept and indexes the added ones under their own ids.
+        """
+        index = cls.get_index()
+        kept = set(kept_ids)
+        removed = [chunk_id for chunk_id in index.chunk_ids(document_id) if chunk_id not in kept]
+        cls._invalidate_answers(index, removed)
+        index.remove_ids(removed)
+        if added:
+            index.add(
+                [chunk["id"] for chunk in added],
+                [chunk["embedding"] for chunk in added],
+                document_id,
+                [{"content": chunk["content"], "metadata": chunk.get("metadata", {})} for chunk in added],
+            )
+
+    @classmethod
+    def remove_document(cls, document_id: str) -> int:
+        index = cls.get_index()
+        cls._invalidate_answers(index, index.chunk_ids(document_id))
+        return index.remove_document(document_id)
+
+    @staticmethod
+    def _invalidate_answers(index: VectorIndex, chunk_ids: List[str], keep: set = frozenset()):
+        """
+        Drops cached answers generated from chunks that are about to leave the index.
+        """
+        contents = [content for content in index.contents(chunk_ids) if content not in keep]
+        if contents:
+            AnswerCache.instance().invalidate_texts(contents)
+
+    @classmethod
+    def search(cls, query_embedding: List[float], top_k: int = 5, document_ids: Optional[List[str]] = None) -> List[dict]:
+        return cls.get_index().search(query_embedding, top_k=top_k, document_ids=document_ids)
+
+    @classmethod
+    def snapshot(cls, path: str = None):
+        if cls._index is None:
+            return
+        cls._index.save(path or settings.vector_index_path)
+
+    @classmethod
+    def stats(cls) -> dict:
+        return cls.get_index().stats()
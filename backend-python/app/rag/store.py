@@ -0,0 +1,248 @@
+import io
+import json
+import logging
+import struct
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..config import settings
+
+logger = logging.getLogger("rag_store")
+
+
+def vector_literal(embedding: Sequence[float]) -> str:
+    return "[" + ",".join(repr(float(x)) for x in embedding) + "]"
+
+
+# COPY ... (FORMAT binary) framing, see the PostgreSQL COPY docs
+COPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+COPY_COLUMNS = ("id", "content", "source_file", "embedding", "document_id", "metadata")
+
+
+def _field(data: Optional[bytes]) -> bytes:
+    if data is None:
+        return struct.pack(">i", -1)
+    return struct.pack(">i", len(data)) + data
+
+
+def vector_binary(embedding: Sequence[float]) -> bytes:
+    """
+    pgvector's binary wire format: int16 dim, int16 unused, dim big-endian float4.
+    """
+    values = np.asarray(embedding, dtype=">f4")
+    return struct.pack(">hh", len(values), 0) + values.tobytes()
+
+
+def encode_copy_rows(rows: Iterable[tuple]) -> bytes:
+    """
+    Encodes (id, content, source_file, embedding, document_id, metadata)
+    tuples as a binary COPY stream for document_chunks.
+    """
+    out = io.BytesIO()
+    out.write(COPY_SIGNATURE + struct.pack(">ii", 0, 0))
+    for chunk_id, content, source_file, embedding, document_id, metadata in rows:
+        out.write(struct.pack(">h", len(COPY_COLUMNS)))
+        out.write(_field(struct.pack(">q", chunk_id)))
+        out.write(_field(content.encode("utf-8")))
+        out.write(_field(source_file.encode("utf-8") if source_file is not None else None))
+        out.write(_field(vector_binary(embedding)))
+        out.write(_field(document_id.bytes if document_id is not None else None))
+        # jsonb binary format: version byte 1 + JSON text
+        out.write(_field(b"\x01" + json.dumps(metadata or {}).encode("utf-8")))
+    out.write(struct.pack(">h", -1))
+    return out.getvalue()
+
+
+class ChunkStore:
+    """
+    Pooled access to the `document_chunks` table (see init.sql), using its
+    HNSW index for vector search and its GIN tsvector index for keyword search.
+    Chunks are written with binary COPY (vectors in pgvector's binary format).
+    psycopg2 is imported on first use, so the service still runs without a
+    database when only the Java backend talks to Postgres.
+    """
+    _instance: Optional["ChunkStore"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, dsn: str, min_connections: int = 1, max_connections: int = 10):
+        import psycopg2.pool
+
+        self._pool = psycopg2.pool.ThreadedConnectionPool(min_connections, max_connections, dsn)
+        # ThreadedConnectionPool raises when exhausted; make callers wait instead
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self.max_connections = max_connections
+        self._in_use = 0
+        self._queries = 0
+        self._total_query_ms = 0.0
+
+    @classmethod
+    def instance(cls) -> "ChunkStore":
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls(settings.database_url, settings.db_pool_min, settings.db_pool_max)
+        return cls._instance
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrows a pooled connection; commits on success, rolls back on error.
+        """
+        with self._slots:
+            conn = self._pool.getconn()
+            self._in_use += 1
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                self._in_use -= 1
+                self._pool.putconn(conn)
+
+    def _query(self, sql: str, params: tuple) -> List[dict]:
+        start = time.perf_counter()
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                columns = [c[0] for c in cur.description]
+                rows = [dict(zip(columns, row)) for row in cur.fetchall()]
+        self._queries += 1
+        self._total_query_ms += (time.perf_counter() - start) * 1000
+        return rows
+
+    def vector_search(self, embedding: Sequence[float], limit: int, filters: Optional[dict] = None) -> List[dict]:
+        """
+        Nearest chunks by cosine distance (HNSW, vector_cosine_ops).
+        """
+        vector = vector_literal(embedding)
+        where, params = "", (vector, vector)
+        if filters:
+            where, params = "WHERE metadata @> %s::jsonb", (vector, json.dumps(filters), vector)
+        return self._query(
+            "SELECT id, content, source_file, metadata, 1 - (embedding <=> %s::vector) AS score "
+            f"FROM document_chunks {where} ORDER BY embedding <=> %s::vector LIMIT %s",
+            params + (limit,),
+        )
+
+    def keyword_search(self, query: str, limit: int, filters: Optional[dict] = None) -> List[dict]:
+        """
+        Full-text matches ranked by ts_rank over the generated search_vector (GIN).
+        """
+        where, params = "", (query,)
+        if filters:
+            where, params = " AND metadata @> %s::jsonb", (query, json.dumps(filters))
+        return self._query(
+            "SELECT id, content, source_file, metadata, ts_rank(search_vector, q) AS score "
+            "FROM document_chunks, plainto_tsquery('english', %s) q "
+            f"WHERE search_vector @@ q{where} ORDER BY score DESC LIMIT %s",
+            params + (limit,),
+        )
+
+    def copy_chunks(self, chunks: List[dict], document_id: Optional[str] = None, source_file: Optional[str] = None) -> List[int]:
+        """
+        Writes chunks ({"content", "embedding", "metadata"}) with one binary
+        COPY in a single transaction and returns their ids. Ids are reserved
+        from the table's sequence first, since COPY can't return them.
+        With a document_id, the document's previous chunks are replaced.
+        """
+        if not chunks:
+            return []
+        doc_uuid = uuid.UUID(str(document_id)) if document_id else None
+        start = time.perf_counter()
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                if doc_uuid is not None:
+                    cur.execute("DELETE FROM document_chunks WHERE document_id = %s", (str(doc_uuid),))
+                ids, size = self._copy(cur, chunks, doc_uuid, source_file)
+        logger.info(f"Copied {len(ids)} chunks ({size} bytes) in {(time.perf_counter() - start) * 1000:.1f}ms")
+        return ids
+
+    def copy_file_chunks(self, chunks: List[dict], file_path: str, source_file: Optional[str] = None) -> List[int]:
+        """
+        Like copy_chunks, for a backfilled file that has no documents row:
+        the chunks are written with a NULL document_id (document_chunks.document_id
+        references documents, which the Java backend owns) and replace the
+        chunks a previous run stored for the same metadata file_path.
+        """
+        start = time.perf_counter()
+        rows = [{**chunk, "metadata": {**chunk.get("metadata", {}), "file_path": file_path}} for chunk in chunks]
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "DELETE FROM document_chunks WHERE document_id IS NULL AND metadata->>'file_path' = %s",
+                    (file_path,),
+                )
+                ids, size = self._copy(cur, rows, None, source_file) if rows else ([], 0)
+        logger.info(f"Copied {len(ids)} chunks of {file_path} ({size} bytes) in {(time.perf_counter() - start) * 1000:.1f}ms")
+        return ids
+
+    def chunk_hashes(self, document_id: str) -> List[Tuple[str, str]]:
+        """
+        (chunk_id, chunk_hash) pairs of a document's stored chunks, in insertion
+        order. Rows stored without them (e.g. written by the Java backend) are
+        left out, so an incremental re-ingest replaces them.
+        """
+        rows = self._query(
+            "SELECT metadata->>'chunk_id' AS chunk_id, metadata->>'chunk_hash' AS chunk_hash "
+            "FROM document_chunks WHERE document_id = %s ORDER BY id",
+            (str(uuid.UUID(str(document_id))),),
+        )
+        return [(row["chunk_id"], row["chunk_hash"]) for row in rows if row["chunk_id"] and row["chunk_hash"]]
+
+    def apply_delta(self, document_id: str, added: List[dict], kept_ids: List[str], source_file: Optional[str] = None) -> Tuple[List[int], int]:
+        """
+        Applies an incremental re-ingest in one transaction: deletes the
+        document's chunks whose metadata chunk_id isn't in `kept_ids` and COPYs
+        the added chunks. Returns the added rows' ids and the deleted row count.
+        """
+        doc_uuid = uuid.UUID(str(document_id))
+        start = time.perf_counter()
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "DELETE FROM document_chunks WHERE document_id = %s "
+                    "AND NOT (COALESCE(metadata->>'chunk_id', '') = ANY(%s))",
+                    (str(doc_uuid), list(kept_ids)),
+                )
+                deleted = cur.rowcount
+                ids, _ = self._copy(cur, added, doc_uuid, source_file) if added else ([], 0)
+        logger.info(
+            f"Applied delta to document {doc_uuid}: +{len(ids)} -{deleted} chunks "
+            f"in {(time.perf_counter() - start) * 1000:.1f}ms"
+        )
+        return ids, deleted
+
+    @staticmethod
+    def _copy(cur, chunks: List[dict], doc_uuid: Optional[uuid.UUID], source_file: Optional[str]) -> Tuple[List[int], int]:
+        cur.execute(
+            "SELECT nextval(pg_get_serial_sequence('document_chunks', 'id')) FROM generate_series(1, %s)",
+            (len(chunks),),
+        )
+        ids = [row[0] for row in cur.fetchall()]
+        payload = encode_copy_rows(
+            (chunk_id, chunk["content"], source_file, chunk["embedding"], doc_uuid, chunk.get("metadata", {}))
+            for chunk_id, chunk in zip(ids, chunks)
+        )
+        cur.copy_expert(
+            f"COPY document_chunks ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT binary)",
+            io.BytesIO(payload),
+        )
+        return ids, len(payload)
+
+    def close(self):
+        self._pool.closeall()
+
+    def stats(self) -> dict:
+        return {
+            "max_connections": self.max_connections,
+            "in_use": self._in_use,
+            "queries": self._queries,
+            "avg_query_ms": round(self._total_query_ms / self._queries, 2) if self._queries else None,
+        }
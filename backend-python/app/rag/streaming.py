@@ -0,0 +1,105 @@
+import logging
+import time
+from typing import List
+
+from llama_index.core.schema import BaseNode, Document
+
+from ..config import settings
+from .cache import CachedEmbedding, EmbeddingCache
+from .chunking import build_splitter, resolve_strategy
+from .ingestion import IngestionService
+
+logger = logging.getLogger("rag_streaming")
+
+
+class StreamingChunker:
+    """
+    Splits and embeds a document that arrives in parts, holding only a
+    bounded window of it in memory.
+
+    Text is buffered until `window_chars` have arrived, then the window is
+    split with the document's chunking strategy. All chunks but the last are
+    final; the last one may have been cut by the window edge, so its text is
+    carried over and split again together with the next window (the
+    splitter's sentence embeddings for it come from the embedding cache). Final chunks are embedded in
+    windows of `embed_window` chunks and returned by feed()/finish() as soon
+    as their window is full.
+    """
+
+    def __init__(self, embed_model, metadata: dict = None, window_chars: int = None, embed_window: int = None, embed_mode: str = None):
+        self.embed_model = embed_model
+        self.metadata = metadata or {}
+        self.window_chars = max(1, window_chars or settings.stream_window_chars)
+        self.embed_window = max(1, embed_window or settings.stream_embed_window)
+        self.timings = {"split_ms": 0.0, "embed_ms": 0.0}
+        self.characters = 0
+        self.chunks = 0
+        self._buffer = ""
+        self._pending: List[BaseNode] = []
+
+        splitter_model = embed_model
+        if settings.embedding_cache_enabled:
+            splitter_model = CachedEmbedding(embed_model, EmbeddingCache.instance())
+        self.strategy = resolve_strategy(self.metadata)
+        self._parser = build_splitter(self.strategy, splitter_model, embed_mode or settings.ingest_embed_mode)
+
+    def feed(self, text: str) -> List[BaseNode]:
+        """
+        Adds the next part of the document; returns chunks that are ready.
+        """
+        self._buffer += text
+        self.characters += len(text)
+        while len(self._buffer) >= self.window_chars:
+            buffered = len(self._buffer)
+            self._split(final=False)
+            if len(self._buffer) >= buffered:
+                # No chunk boundary in this window yet, wait for more text
+                break
+        return self._embed(final=False)
+
+    def finish(self) -> List[BaseNode]:
+        """
+        Splits whatever is left and returns the remaining chunks.
+        """
+        if self._buffer.strip():
+            self._split(final=True)
+        self._buffer = ""
+        return self._embed(final=True)
+
+    def _split(self, final: bool):
+        start = time.perf_counter()
+        nodes = self._parser.get_nodes_from_documents([Document(text=self._buffer, metadata=dict(self.metadata))])
+        self.timings["split_ms"] += (time.perf_counter() - start) * 1000
+
+        if final or not nodes:
+            ready, carry = nodes, ""
+        elif len(nodes) > 1:
+            tail = nodes[-1].get_content()
+            position = self._buffer.rfind(tail)
+            ready, carry = nodes[:-1], self._buffer[position:] if position >= 0 else tail
+        elif len(self._buffer) >= 2 * self.window_chars:
+            # A single chunk spanning two windows; cut it here to bound memory
+            ready, carry = nodes, ""
+        else:
+            ready, carry = [], self._buffer
+
+        for node in ready:
+            # Windows are split independently; drop links to the per-window Document
+            node.relationships = {}
+            node.metadata["chunk_index"] = self.chunks
+            self.chunks += 1
+        self._pending.extend(ready)
+        self._buffer = carry
+
+    def _embed(self, final: bool) -> List[BaseNode]:
+        size = len(self._pending) if final else len(self._pending) // self.embed_window * self.embed_window
+        if size == 0:
+            return []
+        ready, self._pending = self._pending[:size], self._pending[size:]
+
+        start = time.perf_counter()
+        for i in range(0, len(ready), self.embed_window):
+            window = [node for node in ready[i:i + self.embed_window] if node.embedding is None]
+            IngestionService._embed_nodes(window, self.embed_model, self.timings)
+        self.timings["embed_ms"] += (time.perf_counter() - start) * 1000
+        return ready
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Iterable
+
+logger = logging.getLogger("rag_warmup")
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class ModelWarmup:
+    """
+    Loads models concurrently at startup and tracks per-model load state.
+
+    Each task loads its model and runs one dummy inference so kernels and
+    caches are warm before the first real request.
+    """
+
+    def __init__(self):
+        self._models: Dict[str, dict] = {}
+        self._required: set = set()
+
+    async def run(self, tasks: Dict[str, Callable[[], Awaitable]], required: Iterable[str] = ()):
+        self._required = set(required)
+        for name in tasks:
+            self._models[name] = {"state": PENDING, "load_ms": None, "error": None}
+
+        start = time.perf_counter()
+        await asyncio.gather(*(self._load(name, task) for name, task in tasks.items()))
+        logger.info(f"Model warm-up finished in {time.perf_counter() - start:.2f}s: {self.states()}")
+
+    async def _load(self, name: str, task: Callable[[], Awaitable]):
+        model = self._models[name]
+        model["state"] = LOADING
+        start = time.perf_counter()
+        try:
+            await task()
+            model["state"] = READY
+        except Exception as e:
+            logger.error(f"Warm-up of {name} failed: {e}")
+            model["state"] = FAILED
+            model["error"] = str(e)
+        finally:
+            model["load_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    def states(self) -> Dict[str, str]:
+        return {name: model["state"] for name, model in self._models.items()}
+
+    @property
+    def ready(self) -> bool:
+        if not self._models:
+            return False
+        if any(m["state"] in (PENDING, LOADING) for m in self._models.values()):
+            return False
+        return all(self._models[name]["state"] == READY for name in self._required if name in self._models)
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready,
+            "models": {name: dict(model) for name, model in self._models.items()},
+        }
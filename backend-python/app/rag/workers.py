@@ -0,0 +1,398 @@
+import logging
+import math
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeoutError
+from functools import partial
+from itertools import count
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+from ..config import settings
+
+logger = logging.getLogger("rag_workers")
+
+# Smallest shard worth sending to its own worker
+MIN_SHARD_SIZE = 8
+
+
+def _core_sets(workers: int) -> List[List[int]]:
+    """
+    Splits the cores this process may run on into one contiguous set per worker.
+    With fewer cores than workers, workers share cores round-robin.
+    """
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    if len(cores) < workers:
+        return [[cores[i % len(cores)]] for i in range(workers)]
+    size = len(cores) // workers
+    return [cores[i * size:(i + 1) * size] for i in range(workers)]
+
+
+def _worker_main(worker_id: int, model_factory: Callable[[], Any], threads: int, cores: Optional[List[int]], tasks, results):
+    """
+    Entry point of one worker process: loads its own model copy, then embeds
+    text batches from `tasks` and hands each result matrix back through a
+    shared-memory block named in the reply.
+    """
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except Exception:
+        pass
+
+    start = time.perf_counter()
+    try:
+        model = model_factory()
+    except Exception as e:
+        results.put(("failed", worker_id, str(e)))
+        return
+    results.put(("ready", worker_id, round((time.perf_counter() - start) * 1000, 2)))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        job_id, texts = task
+        try:
+            matrix = np.ascontiguousarray(model.get_text_embedding_batch(texts), dtype=np.float32)
+            block = shared_memory.SharedMemory(create=True, size=max(1, matrix.nbytes))
+            np.ndarray(matrix.shape, dtype=np.float32, buffer=block.buf)[:] = matrix
+            # The parent unlinks the block; without this, this process's resource
+            # tracker keeps every block and reports them as leaked at shutdown
+            resource_tracker.unregister(block._name, "shared_memory")
+            results.put(("done", job_id, (block.name, matrix.shape)))
+            block.close()
+        except Exception as e:
+            results.put(("error", job_id, str(e)))
+
+
+class EmbeddingWorkerPool:
+    """
+    N worker processes, each holding its own embedding model, pinned to its
+    own core set and running `threads_per_worker` intra-op threads.
+
+    Each worker has its own task queue and shards go to the least busy one;
+    vectors come back through shared memory instead of being pickled.
+    `embed()` is thread-safe, splits large inputs across workers and gives up
+    after `job_timeout` seconds. A worker that dies is respawned; only the
+    jobs it held fail.
+    """
+
+    def __init__(
+        self,
+        model_factory: Callable[[], Any],
+        workers: int = 2,
+        threads_per_worker: int = 1,
+        pin_cores: bool = True,
+        start_method: str = "spawn",
+        job_timeout: Optional[float] = None,
+        health_interval: float = 0.5,
+    ):
+        self.workers = max(1, workers)
+        self.threads_per_worker = max(1, threads_per_worker)
+        self.job_timeout = job_timeout
+        self.health_interval = health_interval
+        self._model_factory = model_factory
+        self._ctx = mp.get_context(start_method)
+        self._results = self._ctx.Queue()
+        self._pending: Dict[int, Future] = {}
+        # job id -> worker index holding it
+        self._assigned: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._ids = count()
+        self._closed = False
+        self._ready: Set[int] = set()
+        self._broken: Set[int] = set()
+        self._ready_event = threading.Event()
+        self._load_ms: Dict[int, float] = {}
+        self._error: Optional[str] = None
+
+        # Stats
+        self._jobs = 0
+        self._texts = 0
+        self._restarts = 0
+
+        self._core_sets = _core_sets(self.workers) if pin_cores else [None] * self.workers
+        self._task_queues: List[Any] = [None] * self.workers
+        self._processes: List[Any] = [None] * self.workers
+        for i in range(self.workers):
+            self._start_worker(i)
+        self._listener = threading.Thread(target=self._listen, name="embed-pool-listener", daemon=True)
+        self._listener.start()
+        logger.info(f"Started {self.workers} embedding workers ({self.threads_per_worker} threads each)")
+
+    def _start_worker(self, i: int):
+        previous = self._task_queues[i]
+        if previous is not None:
+            # Nobody reads the dead worker's queue any more; don't block exit on it
+            previous.cancel_join_thread()
+            previous.close()
+        tasks = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(i, self._model_factory, self.threads_per_worker, self._core_sets[i], tasks, self._results),
+            name=f"embed-worker-{i}",
+            daemon=True,
+        )
+        process.start()
+        self._task_queues[i] = tasks
+        self._processes[i] = process
+
+    def wait_ready(self, timeout: Optional[float] = None):
+        """
+        Blocks until every worker has loaded its model.
+        """
+        if not self._ready_event.wait(timeout):
+            raise TimeoutError(f"Embedding workers not ready after {timeout}s")
+        if self._error:
+            raise RuntimeError(self._error)
+
+    def _listen(self):
+        next_check = time.monotonic() + self.health_interval
+        while not self._closed or self._pending:
+            message = None
+            try:
+                message = self._results.get(timeout=self.health_interval)
+            except queue.Empty:
+                pass
+            except (EOFError, OSError):
+                break
+
+            if message is not None:
+                self._handle(*message)
+            # Checked on a clock, not only when results stop arriving, so a dead
+            # worker's jobs fail while the others keep producing
+            if time.monotonic() >= next_check:
+                next_check = time.monotonic() + self.health_interval
+                self._check_workers()
+            if message is None and self._closed:
+                break
+
+    def _handle(self, kind: str, key: int, payload):
+        if kind == "ready":
+            self._load_ms[key] = payload
+            self._ready.add(key)
+            if len(self._ready) == self.workers:
+                self._ready_event.set()
+            return
+        if kind == "failed":
+            message = f"Embedding worker {key} failed to load: {payload}"
+            if not self._ready_event.is_set():
+                self._fail_all(message)
+            else:
+                # A respawned worker that can't load its model is left out for good
+                self._broken.add(key)
+                self._fail_worker_jobs(key, message)
+            return
+
+        with self._lock:
+            future = self._pending.pop(key, None)
+            self._assigned.pop(key, None)
+        # Read (and unlink) the block even when nobody waits for it any more
+        result = self._read_block(*payload) if kind == "done" else RuntimeError(payload)
+        if future is None or future.cancelled():
+            return
+        try:
+            if kind == "done":
+                future.set_result(result)
+            else:
+                future.set_exception(result)
+        except InvalidStateError:
+            # Cancelled by a timed-out embed() in the meantime
+            pass
+
+    @staticmethod
+    def _read_block(name: str, shape) -> np.ndarray:
+        block = shared_memory.SharedMemory(name=name)
+        try:
+            return np.ndarray(shape, dtype=np.float32, buffer=block.buf).copy()
+        finally:
+            block.close()
+            block.unlink()
+
+    def _check_workers(self):
+        if self._closed:
+            return
+        for i, process in enumerate(self._processes):
+            if process.is_alive() or i in self._broken:
+                continue
+            message = f"Embedding worker {i} exited unexpectedly (exit code {process.exitcode})"
+            if not self._ready_event.is_set():
+                self._fail_all(message)
+                return
+            logger.error(message)
+            logger.warning(f"Respawning embedding worker {i}")
+            # Under the lock, so no job is routed to the dead worker's queue meanwhile
+            with self._lock:
+                lost = self._take_jobs(i)
+                self._ready.discard(i)
+                self._restarts += 1
+                self._start_worker(i)
+            self._fail(lost, message)
+
+    def _fail_worker_jobs(self, worker: int, message: str):
+        logger.error(message)
+        with self._lock:
+            lost = self._take_jobs(worker)
+        self._fail(lost, message)
+
+    def _take_jobs(self, worker: int) -> List[Future]:
+        # Caller holds the lock
+        job_ids = [job_id for job_id, holder in self._assigned.items() if holder == worker]
+        for job_id in job_ids:
+            del self._assigned[job_id]
+        return [self._pending.pop(job_id) for job_id in job_ids]
+
+    @staticmethod
+    def _fail(futures: List[Future], message: str):
+        for future in futures:
+            if not future.done():
+                future.set_exception(RuntimeError(message))
+
+    def _fail_all(self, message: str):
+        logger.error(message)
+        self._error = message
+        self._ready_event.set()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._assigned = {}
+        self._fail(list(pending.values()), message)
+
+    def _submit(self, texts: List[str]) -> Future:
+        future = Future()
+        with self._lock:
+            if self._error:
+                raise RuntimeError(self._error)
+            if self._closed:
+                raise RuntimeError("Embedding worker pool is closed")
+            usable = [i for i in range(self.workers) if i not in self._broken]
+            if not usable:
+                raise RuntimeError("No embedding workers left")
+            load = Counter(self._assigned.values())
+            worker = min(usable, key=lambda i: load[i])
+            job_id = next(self._ids)
+            self._pending[job_id] = future
+            self._assigned[job_id] = worker
+            self._jobs += 1
+            self._texts += len(texts)
+            # Queue.put only hands the task to the queue's feeder thread
+            self._task_queues[worker].put((job_id, list(texts)))
+        return future
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embeds texts on the workers and returns a float32 (n, dim) matrix in input order.
+        """
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        shards = min(self.workers, math.ceil(len(texts) / MIN_SHARD_SIZE))
+        size = math.ceil(len(texts) / shards)
+        futures = [self._submit(texts[i:i + size]) for i in range(0, len(texts), size)]
+        deadline = time.monotonic() + self.job_timeout if self.job_timeout else None
+        try:
+            return np.vstack([
+                future.result(timeout=max(0.0, deadline - time.monotonic()) if deadline else None)
+                for future in futures
+            ])
+        except FutureTimeoutError:
+            for future in futures:
+                future.cancel()
+            raise TimeoutError(f"Embedding {len(texts)} texts took longer than {self.job_timeout}s")
+
+    def close(self, timeout: float = 5.0):
+        if self._closed:
+            return
+        self._closed = True
+        for tasks in self._task_queues:
+            tasks.put(None)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        if self._pending:
+            self._fail_all("Embedding worker pool is closed")
+        logger.info("Embedding worker pool stopped")
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "threads_per_worker": self.threads_per_worker,
+            "ready": len(self._ready),
+            "alive": sum(p.is_alive() for p in self._processes),
+            "restarts": self._restarts,
+            "broken": sorted(self._broken),
+            "load_ms": dict(self._load_ms),
+            "jobs": self._jobs,
+            "texts": self._texts,
+            "in_flight": len(self._pending),
+            "error": self._error,
+        }
+
+
+class PooledEmbedding(BaseEmbedding):
+    """
+    llama-index embedding model that runs on an EmbeddingWorkerPool, so the
+    splitter, ingestion and /embed all use the worker processes unchanged.
+    """
+    _pool: Any = PrivateAttr()
+
+    def __init__(self, model_name: str, pool: EmbeddingWorkerPool, **kwargs):
+        super().__init__(model_name=model_name, **kwargs)
+        self._pool = pool
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "PooledEmbedding"
+
+    @property
+    def pool(self) -> EmbeddingWorkerPool:
+        return self._pool
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._get_text_embeddings([query])[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._pool.embed(texts).tolist()
+
+    def close(self):
+        self._pool.close()
+
+
+def build_pooled_embedding(model_name: str, backend: str = None) -> PooledEmbedding:
+    """
+    Starts `embed_workers` processes, each building its own copy of the
+    configured embedding backend, and waits until they are loaded.
+    """
+    from .backends import build_embedding_model
+
+    pool = EmbeddingWorkerPool(
+        partial(build_embedding_model, model_name, backend or settings.inference_backend),
+        workers=settings.embed_workers,
+        threads_per_worker=settings.embed_worker_threads,
+        pin_cores=settings.embed_worker_pin_cores,
+        job_timeout=settings.embed_worker_job_timeout,
+    )
+    try:
+        pool.wait_ready(settings.embed_worker_start_timeout)
+    except Exception:
+        pool.close()
+        raise
+    # Batches are split across workers by the pool, not by llama-index
+    return PooledEmbedding(model_name=model_name, pool=pool, embed_batch_size=max(MIN_SHARD_SIZE, settings.ingest_embed_batch_size))
@@ -2,27 +2,59 @@ import logging
 from typing import List, Optional, Dict, Any
 import re
 import json
+import time
 import asyncio
+import datetime
+import hashlib
+import os
+import threading
+import uuid
+
+import numpy as np
 
 from tenacity import retry, stop_after_attempt, wait_exponential
 
-from sentence_transformers import CrossEncoder
 from .config import settings
 from .rag.factory import RAGFactory
 from .rag.ingestion import IngestionService
+from .rag.parsing import DoclingParserPool, collect_files
+from .rag.batching import EmbeddingBatcher
+from .rag.bucketing import LengthBucketer, pair_lengths
+from .rag.cache import AnswerCache, EmbeddingCache, ScoreCache
+from .rag.compression import compress_context
+from .rag.concurrency import ConcurrencyLimiter, QueueFullError
+from .rag.gateway import LLMGateway
+from .rag.jobs import IngestJobQueue, IngestJobStore
+from .rag.retrieval import RetrievalService, content_document_id
+from .rag.manifest import ChunkManifest, chunk_hash, chunk_ids, diff
+from .rag.store import ChunkStore
+from .rag.streaming import StreamingChunker
+from .rag.fusion import reciprocal_rank_fusion
+from .rag.warmup import ModelWarmup
+from .rag.postprocessors import FlashRankRerank
 from llama_index.core.schema import NodeWithScore, TextNode
 from .prompts.manager import PromptManager
 
 logger = logging.getLogger("ai_service")
 
+FILE_INGEST_TARGETS = ("postgres", "index", "none")
+
+# extract_metadata only reads the head of a document
+METADATA_HEAD_CHARS = 4000
+
+NO_CONTEXT_ANSWER = "I can only answer questions based on selected documents. Please ensure the system has retrieved relevant documents."
+
 class AIService:
-    _reranker = None
+    _embed_batcher = None
+    _ingest_jobs = None
+    _parser_pool = None
+    _parser_pool_lock = threading.Lock()
+    _file_ingest_limiter = None
+    _warmup = ModelWarmup()
 
     @classmethod
     def _get_reranker(cls):
-        if(cls._reranker == None):
-            cls._reranker = CrossEncoder("BAAI/bge-reranker-base")
-        return cls._reranker
+        return RAGFactory.get_reranker()
 
     @classmethod
     def initialize(cls):
@@ -37,13 +69,52 @@ class AIService:
         logger.info("RAG Factory initialized successfully.")
 
     @classmethod
-    def process_document(cls, text: str, metadata: dict = {}) -> List[dict]:
+    async def warm_up(cls):
+        """
+        Loads embedder, cross-encoder and FlashRank in parallel, runs one dummy
+        inference through each and asks Ollama to load the LLM with keep_alive.
+        Progress is reported by AIService.readiness().
+        """
+        logger.info("Warming up models...")
+
+        def warm_embedder():
+            RAGFactory.get_embedding_model().get_text_embedding_batch(["warm up"])
+
+        def warm_reranker():
+            cls._get_reranker().predict([["warm up", "warm up"]])
+
+        def warm_flashrank():
+            from flashrank import RerankRequest as FlashRankRequest
+            ranker = FlashRankRerank.get_shared_ranker(settings.flashrank_model_name)
+            ranker.rerank(FlashRankRequest(query="warm up", passages=[{"id": "0", "text": "warm up"}]))
+
+        async def warm_llm():
+            llm = RAGFactory.get_llm()
+            # An empty prompt only loads the model and keeps it resident for keep_alive
+            await llm.async_client.generate(model=settings.ollama_model, prompt="", keep_alive=settings.ollama_keep_alive)
+
+        tasks = {
+            "embedder": lambda: asyncio.to_thread(warm_embedder),
+            "reranker": lambda: asyncio.to_thread(warm_reranker),
+            "llm": warm_llm,
+        }
+        if settings.warmup_flashrank:
+            tasks["flashrank"] = lambda: asyncio.to_thread(warm_flashrank)
+
+        await cls._warmup.run(tasks, required=["embedder", "reranker"])
+
+    @classmethod
+    def readiness(cls) -> dict:
+        return cls._warmup.report()
+
+    @classmethod
+    def process_document(cls, text: str, metadata: dict = {}, timings: dict = None, progress=None) -> List[dict]:
         """
         Delegates document processing to IngestionService.
         """
         try:
             logger.info("Processing document text...")
-            nodes = IngestionService.process_text(text, metadata)
+            nodes = IngestionService.process_text(text, metadata, timings=timings, progress=progress)
             
             # Convert Nodes back to list of dicts for backward compatibility/response format
             results = []
@@ -59,36 +130,488 @@ class AIService:
             raise e
 
     @classmethod
-    async def ask_llm(cls, question: str, context: str = "") -> Dict[str, Any]:
+    def get_generation_limiter(cls) -> ConcurrencyLimiter:
+        return LLMGateway.instance().limiter("chat")
+
+    @classmethod
+    async def ingest_document(cls, text: str, metadata: dict = None, timings: dict = None, progress=None):
+        """
+        Runs LLM metadata extraction and chunk+embed concurrently, then attaches
+        the merged document metadata to every chunk.
+        Chunk embeddings don't depend on metadata (MetadataMode.NONE), so the
+        two stages only meet at the end.
+        Returns (document_metadata, chunks).
+        """
+        metadata = metadata or {}
+        timings = timings if timings is not None else {}
+        start = time.perf_counter()
+
+        async def timed_extract():
+            meta_start = time.perf_counter()
+            extracted = await cls.extract_metadata(text)
+            timings["metadata_ms"] = round((time.perf_counter() - meta_start) * 1000, 2)
+            return extracted
+
+        extracted_meta, chunks = await asyncio.gather(
+            timed_extract(),
+            asyncio.to_thread(cls.process_document, text, metadata, timings, progress)
+        )
+
+        # Merge with request metadata, prioritizing request-provided values
+        final_doc_metadata = {**extracted_meta, **metadata}
+        for chunk in chunks:
+            chunk["metadata"] = {**chunk["metadata"], **final_doc_metadata}
+
+        if settings.vector_index_enabled:
+            index_start = time.perf_counter()
+            document_id = RetrievalService.document_id(metadata, text)
+            ids = await asyncio.to_thread(RetrievalService.add_chunks, document_id, chunks)
+            # The index is now the baseline for /ingest/incremental of this document
+            hashes = [chunk_hash(chunk["content"]) for chunk in chunks]
+            await asyncio.to_thread(ChunkManifest.instance().replace, document_id, list(zip(ids, hashes)))
+            timings["index_ms"] = round((time.perf_counter() - index_start) * 1000, 2)
+
+        timings["total_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return final_doc_metadata, chunks
+
+    @classmethod
+    async def ingest_incremental(cls, text: str, metadata: dict = None, timings: dict = None, store: bool = False) -> Dict[str, Any]:
+        """
+        Re-ingests a new version of a document: chunks are hashed and diffed
+        against the document's previous chunks, and only added chunks are
+        embedded. Returns the add/remove/keep delta; added chunks carry their
+        content, embedding and metadata (with chunk_id and chunk_hash).
+        metadata must identify the document ("document_id" or "filename").
+
+        The baseline is the chunk manifest, or with `store` the chunks in
+        document_chunks (metadata.document_id must then be the document's
+        UUID); the delta is then applied there and the added rows' ids returned.
+        """
+        metadata = metadata or {}
+        timings = timings if timings is not None else {}
+        document_id = metadata.get("document_id") or metadata.get("filename")
+        if not document_id:
+            raise ValueError("Incremental ingest needs metadata.document_id or metadata.filename")
+        document_id = str(document_id)
+        if store:
+            uuid.UUID(str(metadata.get("document_id")))
+        start = time.perf_counter()
+
+        manifest = ChunkManifest.instance()
+        if store:
+            previous = await asyncio.to_thread(ChunkStore.instance().chunk_hashes, document_id)
+        else:
+            previous = await asyncio.to_thread(manifest.get, document_id)
+        known_hashes = {h for _, h in previous}
+
+        async def timed_extract():
+            meta_start = time.perf_counter()
+            extracted = await cls.extract_metadata(text)
+            timings["metadata_ms"] = round((time.perf_counter() - meta_start) * 1000, 2)
+            return extracted
+
+        extracted_meta, nodes = await asyncio.gather(
+            timed_extract(),
+            asyncio.to_thread(IngestionService.process_text_incremental, text, metadata, known_hashes, timings)
+        )
+        final_doc_metadata = {**extracted_meta, **metadata}
+
+        hashes = [node.metadata["chunk_hash"] for node in nodes]
+        current = list(zip(chunk_ids(document_id, hashes), hashes))
+        delta = diff(previous, current)
+        added_ids = set(delta["added"])
+        added = [
+            {
+                "id": chunk_id,
+                "content": node.get_content(),
+                "embedding": node.embedding if node.embedding is not None else await cls.embed_query(node.get_content()),
+                "metadata": {**node.metadata, **final_doc_metadata, "chunk_id": chunk_id},
+            }
+            for (chunk_id, _), node in zip(current, nodes)
+            if chunk_id in added_ids
+        ]
+
+        stored_ids, deleted = [], 0
+        if store:
+            store_start = time.perf_counter()
+            stored_ids, deleted = await asyncio.to_thread(
+                ChunkStore.instance().apply_delta, document_id, added, delta["kept"], metadata.get("filename")
+            )
+            timings["store_ms"] = round((time.perf_counter() - store_start) * 1000, 2)
+        await asyncio.to_thread(manifest.replace, document_id, current)
+        if delta["removed"]:
+            # Chunk ids embed their content hash; drop answers generated from removed content
+            removed = set(delta["removed"])
+            AnswerCache.instance().invalidate_chunks({h for chunk_id, h in previous if chunk_id in removed})
+        if settings.vector_index_enabled:
+            await asyncio.to_thread(RetrievalService.apply_delta, document_id, added, delta["kept"])
+
+        timings["total_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        logger.info(
+            f"Incremental ingest of {document_id}: +{len(delta['added'])} -{len(delta['removed'])} "
+            f"={len(delta['kept'])} chunks, timings={timings}"
+        )
+        return {
+            "document_id": document_id,
+            "document_metadata": final_doc_metadata,
+            "added": added,
+            "removed": delta["removed"],
+            "kept": delta["kept"],
+            "stored_ids": stored_ids,
+            "deleted_rows": deleted,
+        }
+
+    @classmethod
+    async def ingest_stream(cls, parts, metadata: dict = None):
+        """
+        Streaming variant of ingest_document for documents too large to hold
+        in memory. `parts` is an async iterator of text pieces (e.g. a chunked
+        request body). Yields a "chunk" event per chunk as soon as its embed
+        window is done, a "metadata" event once the document metadata has been
+        extracted from the head of the text, and a final "done" event with
+        counts and timings (or an "error" event).
+        """
+        metadata = metadata or {}
+        start = time.perf_counter()
+        timings = {}
+        document_id = RetrievalService.document_id(metadata)
+        if document_id is None and settings.vector_index_enabled:
+            # Chunks are indexed before the whole text (and so its hash) is known
+            yield {"type": "error", "message": "Streaming ingest into the vector index needs metadata.document_id or metadata.filename"}
+            return
+        content_hash = hashlib.sha256()
+        head = ""
+        extract_task = None
+        metadata_sent = False
+
+        async def timed_extract(text: str):
+            meta_start = time.perf_counter()
+            extracted = await cls.extract_metadata(text)
+            timings["metadata_ms"] = round((time.perf_counter() - meta_start) * 1000, 2)
+            return {**extracted, **metadata}
+
+        async def chunk_events(nodes):
+            chunks = [
+                {"index": node.metadata["chunk_index"], "content": node.get_content(), "embedding": node.embedding, "metadata": node.metadata}
+                for node in nodes
+            ]
+            if chunks and settings.vector_index_enabled:
+                await asyncio.to_thread(RetrievalService.add_chunks, document_id, chunks, chunks[0]["index"])
+            return [{"type": "chunk", **chunk} for chunk in chunks]
+
+        try:
+            with RAGFactory.acquire("embedding") as embed_model:
+                chunker = StreamingChunker(embed_model, metadata)
+                async for part in parts:
+                    content_hash.update(part.encode("utf-8"))
+                    if extract_task is None:
+                        head += part
+                        if len(head) >= METADATA_HEAD_CHARS:
+                            extract_task = asyncio.create_task(timed_extract(head[:METADATA_HEAD_CHARS]))
+                            head = ""
+                    for event in await chunk_events(await asyncio.to_thread(chunker.feed, part)):
+                        yield event
+                    if extract_task is not None and extract_task.done() and not metadata_sent:
+                        metadata_sent = True
+                        yield {"type": "metadata", "document_metadata": extract_task.result()}
+
+                for event in await chunk_events(await asyncio.to_thread(chunker.finish)):
+                    yield event
+            if extract_task is None:
+                extract_task = asyncio.create_task(timed_extract(head))
+            if not metadata_sent:
+                yield {"type": "metadata", "document_metadata": await extract_task}
+        except Exception as e:
+            logger.error(f"Streaming ingest failed: {e}")
+            yield {"type": "error", "message": str(e)}
+            return
+        finally:
+            if extract_task is not None and not extract_task.done():
+                extract_task.cancel()
+
+        timings["split_ms"] = round(chunker.timings["split_ms"], 2)
+        timings["embed_ms"] = round(chunker.timings["embed_ms"], 2)
+        for key in ("embed_tokens", "embed_padded_tokens"):
+            if key in chunker.timings:
+                timings[key] = chunker.timings[key]
+        timings["total_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        document_id = document_id or content_document_id(content_hash.hexdigest())
+        logger.info(f"Streaming ingest of {chunker.characters} characters: {chunker.chunks} chunks, timings={timings}")
+        yield {"type": "done", "document_id": document_id, "chunks": chunker.chunks, "characters": chunker.characters, "timings": timings}
+
+    @classmethod
+    async def ingest_and_store(cls, text: str, metadata: dict = None, timings: dict = None) -> Dict[str, Any]:
+        """
+        ingest_document, then writes the chunks to document_chunks with one
+        binary COPY. Returns ids and counts instead of the chunks.
+        With a document_id, each chunk's metadata gets its chunk_id and
+        chunk_hash and the chunk manifest is updated, so later
+        /ingest/incremental calls diff against what was stored.
+        """
+        metadata = metadata or {}
+        timings = timings if timings is not None else {}
+        final_doc_metadata, chunks = await cls.ingest_document(text, metadata, timings)
+
+        document_id = metadata.get("document_id")
+        current = []
+        if document_id:
+            hashes = [chunk_hash(chunk["content"]) for chunk in chunks]
+            current = list(zip(chunk_ids(str(document_id), hashes), hashes))
+            for chunk, (chunk_id, h) in zip(chunks, current):
+                chunk["metadata"] = {**chunk["metadata"], "chunk_id": chunk_id, "chunk_hash": h}
+
+        store_start = time.perf_counter()
+        ids = await asyncio.to_thread(
+            ChunkStore.instance().copy_chunks,
+            chunks,
+            document_id,
+            metadata.get("filename"),
+        )
+        timings["store_ms"] = round((time.perf_counter() - store_start) * 1000, 2)
+        if document_id:
+            await asyncio.to_thread(ChunkManifest.instance().replace, str(document_id), current)
+        return {
+            "document_id": document_id,
+            "chunk_ids": ids,
+            "chunk_count": len(ids),
+            "document_metadata": final_doc_metadata,
+        }
+
+    @classmethod
+    def get_parser_pool(cls) -> DoclingParserPool:
+        """
+        The Docling parser processes shared by /ingest/files requests,
+        started on first use and replaced if a worker process died.
+        """
+        with cls._parser_pool_lock:
+            if cls._parser_pool is not None and cls._parser_pool.broken:
+                logger.warning("Docling parser pool is broken, restarting it")
+                cls._parser_pool.close()
+                cls._parser_pool = None
+            if cls._parser_pool is None:
+                cls._parser_pool = DoclingParserPool()
+            return cls._parser_pool
+
+    @classmethod
+    def get_file_ingest_limiter(cls) -> ConcurrencyLimiter:
+        if cls._file_ingest_limiter is None:
+            cls._file_ingest_limiter = ConcurrencyLimiter("file_ingest", settings.file_ingest_max_concurrent)
+        return cls._file_ingest_limiter
+
+    @classmethod
+    async def ingest_files(cls, paths: List[str], metadata: dict = None, target: str = "index", recursive: bool = True, extract_metadata: bool = False):
+        """
+        Batch file ingestion for backfills: files (or directories) are parsed
+        in the shared Docling parser pool and their chunks embedded in shared
+        batches. Yields a "start" event once one of file_ingest_max_concurrent
+        slots is free (QueueFullError otherwise), a "file" event per file once
+        its chunks are stored, then a "done" event with throughput. A file event
+        with failed_pages is a PDF ingested without those pages; "done" counts
+        such files as partial (they are also counted as ingested).
+
+        target: "index" (local vector index), "postgres" (binary COPY into
+        document_chunks) or "none" (parse, chunk and embed only). In the index
+        each file's document_id is a uuid5 of its absolute path; in Postgres the
+        chunks have no documents row, so they are stored with a NULL
+        document_id and keyed by metadata file_path. Either way re-running a
+        backfill replaces the file's chunks. LLM metadata extraction is off by
+        default, as it would dominate a large backfill.
+        """
+        if target not in FILE_INGEST_TARGETS:
+            raise ValueError(f"Unknown target '{target}', expected one of {FILE_INGEST_TARGETS}")
+        metadata = metadata or {}
+        files = collect_files(paths, recursive=recursive)
+        ingested = failed = partial = chunk_total = 0
+
+        def store(file_path: str, document_id: str, chunks: List[dict]):
+            if target == "postgres":
+                ChunkStore.instance().copy_file_chunks(chunks, file_path, os.path.basename(file_path))
+            elif target == "index":
+                RetrievalService.add_chunks(document_id, chunks)
+
+        async with cls.get_file_ingest_limiter().slot():
+            yield {"type": "start", "files": len(files)}
+            start = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            results = asyncio.Queue(maxsize=2)
+            stopped = threading.Event()
+
+            def put(item) -> bool:
+                try:
+                    future = asyncio.run_coroutine_threadsafe(results.put(item), loop)
+                except RuntimeError:
+                    return False
+                while not stopped.is_set():
+                    try:
+                        future.result(timeout=0.5)
+                        return True
+                    except TimeoutError:
+                        continue
+                future.cancel()
+                return False
+
+            def produce():
+                # The whole generator lives on this thread, so it is never
+                # resumed or closed from two threads at once
+                generator = None
+                try:
+                    generator = IngestionService.process_files(files, metadata, parser_pool=cls.get_parser_pool())
+                    for result in generator:
+                        if not put(result):
+                            break
+                except Exception as e:
+                    logger.error(f"File ingest failed: {e}")
+                    put({"fatal": str(e)})
+                finally:
+                    if generator is not None:
+                        generator.close()
+                    put(None)
+
+            threading.Thread(target=produce, name="file-ingest", daemon=True).start()
+            try:
+                while True:
+                    result = await results.get()
+                    if result is None:
+                        break
+                    if "fatal" in result:
+                        yield {"type": "error", "message": result["fatal"]}
+                        return
+                    if "error" in result:
+                        failed += 1
+                        yield {"type": "file", "file": result["file"], "error": result["error"]}
+                        continue
+
+                    nodes = result.pop("nodes")
+                    file_metadata = {}
+                    document_id = None
+                    if target != "postgres":
+                        document_id = str(uuid.uuid5(uuid.NAMESPACE_URL, os.path.abspath(result["file"])))
+                        file_metadata["document_id"] = document_id
+                    if extract_metadata and nodes:
+                        file_metadata = {**(await cls.extract_metadata(nodes[0].get_content())), **file_metadata}
+                    chunks = [
+                        {"content": node.get_content(), "embedding": node.embedding, "metadata": {**node.metadata, **file_metadata}}
+                        for node in nodes
+                    ]
+                    store_start = time.perf_counter()
+                    try:
+                        await asyncio.to_thread(store, os.path.abspath(result["file"]), document_id, chunks)
+                    except Exception as e:
+                        logger.error(f"Storing chunks of {result['file']} failed: {e}")
+                        failed += 1
+                        yield {"type": "file", "file": result["file"], "error": str(e)}
+                        continue
+                    ingested += 1
+                    if result.get("failed_pages"):
+                        partial += 1
+                    chunk_total += len(chunks)
+                    yield {
+                        "type": "file",
+                        **result,
+                        "document_id": document_id,
+                        "chunks": len(chunks),
+                        "store_ms": round((time.perf_counter() - store_start) * 1000, 2),
+                    }
+            finally:
+                # The producer stops after its current file and closes the generator itself
+                stopped.set()
+
+        elapsed = time.perf_counter() - start
+        files_per_min = round(ingested / elapsed * 60, 2) if elapsed > 0 else None
+        logger.info(f"Ingested {ingested}/{len(files)} files ({chunk_total} chunks) in {elapsed:.1f}s, {files_per_min} files/min")
+        yield {
+            "type": "done",
+            "files": len(files),
+            "ingested": ingested,
+            "failed": failed,
+            "partial": partial,
+            "chunks": chunk_total,
+            "elapsed_s": round(elapsed, 2),
+            "files_per_min": files_per_min,
+        }
+
+    @classmethod
+    def get_ingest_jobs(cls) -> IngestJobQueue:
+        if cls._ingest_jobs is None:
+            cls._ingest_jobs = IngestJobQueue(
+                cls.ingest_document,
+                IngestJobStore(settings.ingest_job_db_path),
+                workers=settings.ingest_job_workers,
+                max_queued=settings.ingest_job_queue_size,
+                ttl=settings.ingest_job_ttl_seconds
+            )
+        return cls._ingest_jobs
+
+    @staticmethod
+    def _build_chat_prompt(question: str, context: str) -> str:
+        # Add current date for relative time understanding
+        today_str = datetime.date.today().strftime("%Y-%m-%d")
+        
+        # Reconstruct chunks list for the PromptManager
+        chunks = context.split("\n---\n")
+        return PromptManager.get_chat_prompt(chunks, question, today_str)
+
+    @classmethod
+    async def _compress_context(cls, question: str, context: str, method: str = None):
+        """
+        Runs the context compression stage; returns the compressed context and its token report.
+        """
+        chunks, report = await asyncio.to_thread(
+            compress_context, question, context.split("\n---\n"), method, None, cls.get_embeddings_array
+        )
+        logger.info(
+            f"Context compression ({report['method']}): {report['tokens_before']} -> {report['tokens_after']} tokens "
+            f"in {report['compress_ms']}ms"
+        )
+        return "\n---\n".join(chunks), report
+
+    @classmethod
+    async def ask_llm(cls, question: str, context: str = "", compression: str = None) -> Dict[str, Any]:
         """
         Delegates RAG query to RetrievalService.
         If context is provided (e.g. from Java), we bypass retrieval and use the LLM directly.
+        The context goes through the compression stage (`compression` overrides
+        settings.context_compression) before it is rendered into the prompt.
         """
         try:
             logger.info(f"Processing query: {question}")
             
             if context and len(context.strip()) > 10:
                 logger.info("Using provided context for generation.")
-                llm = RAGFactory.get_llm()
-                
-                # Add current date for relative time understanding
-                import datetime
-                today_str = datetime.date.today().strftime("%Y-%m-%d")
-                
-                # Reconstruct chunks list for the PromptManager
                 chunks = context.split("\n---\n")
-                prompt = PromptManager.get_chat_prompt(chunks, question, today_str)
-                response = llm.complete(prompt)
-                response_text = response.text
+                # Answers depend on the model, today's date in the prompt and how the context was compressed
+                scope = f"{settings.ollama_model}:{datetime.date.today().isoformat()}:{compression or settings.context_compression}"
+                cache = AnswerCache.instance() if settings.answer_cache_enabled else None
+                question_embedding = None
+                if cache:
+                    if cache.semantic_threshold is not None:
+                        try:
+                            question_embedding = await cls.embed_query(question)
+                        except Exception as e:
+                            logger.warning(f"Answer cache: question embedding failed, exact match only: {e}")
+                    cached = cache.get(scope, chunks, question, question_embedding)
+                    if cached:
+                        logger.info(f"Answer cache hit ({cached['match']}).")
+                        return {"answer": cached["answer"], "sources": ["Provided Context"], "cached": True}
+
+                compressed, report = await cls._compress_context(question, context, compression)
+                prompt = cls._build_chat_prompt(question, compressed)
+                # Non-blocking generation, bounded so a burst of questions queues instead of piling onto Ollama;
+                # identical questions over identical context in flight share one generation
+                response_text = await LLMGateway.instance().complete(prompt, "chat")
+                if cache:
+                    cache.put(scope, chunks, question, response_text, question_embedding)
                 
                 return {
                     "answer": response_text,
-                    "sources": ["Provided Context"]
+                    "sources": ["Provided Context"],
+                    "cached": False,
+                    "compression": report
                 }
 
             # Fallback for no context: Just warn the user that context is required
             return {
-                "answer": "I can only answer questions based on selected documents. Please ensure the system has retrieved relevant documents.",
+                "answer": NO_CONTEXT_ANSWER,
                 "sources": []
             }
             
@@ -105,31 +628,91 @@ class AIService:
                 "answer": str(response),
                 "sources": sources
             }
+        except QueueFullError:
+            logger.warning("Generation queue is full, rejecting request.")
+            raise
         except Exception as e:
             logger.error(f"RAG query failed: {e}")
             return {"answer": "Error generating response.", "sources": []}
 
+    @classmethod
+    async def stream_llm(cls, question: str, context: str = "", compression: str = None):
+        """
+        Streams the answer as token events, followed by a final "done" event
+        carrying sources, timing and the context compression report. Closing
+        the generator closes the Ollama stream, which cancels the generation.
+        """
+        start = time.perf_counter()
+        first_token_ms = None
+
+        if not (context and len(context.strip()) > 10):
+            yield {"type": "token", "delta": NO_CONTEXT_ANSWER}
+            yield {"type": "done", "sources": [], "timing": {"ttft_ms": 0.0, "total_ms": 0.0}}
+            return
+
+        try:
+            logger.info(f"Streaming query: {question}")
+            compressed, report = await cls._compress_context(question, context, compression)
+            prompt = cls._build_chat_prompt(question, compressed)
+
+            async with LLMGateway.instance().stream(prompt, "chat") as stream:
+                async for chunk in stream:
+                    if not chunk.delta:
+                        continue
+                    if first_token_ms is None:
+                        first_token_ms = round((time.perf_counter() - start) * 1000, 2)
+                    yield {"type": "token", "delta": chunk.delta}
+        except QueueFullError as e:
+            logger.warning("Generation queue is full, rejecting stream.")
+            yield {"type": "error", "message": str(e)}
+            return
+        except Exception as e:
+            logger.error(f"RAG stream failed: {e}")
+            yield {"type": "error", "message": "Error generating response."}
+            return
+
+        yield {
+            "type": "done",
+            "sources": ["Provided Context"],
+            "timing": {
+                "ttft_ms": first_token_ms,
+                "total_ms": round((time.perf_counter() - start) * 1000, 2)
+            },
+            "compression": report
+        }
+
     @classmethod
     def rerank(cls, query: str, documents: List[str], top_k: int = 5) -> List[Dict]:
         """
-        [PLACEHOLDER] Future Reranking Step
-        
-        TODO: Implement a Cross-Encoder here.
-        Currently, this method just mocks the scoring but keeps the architecture ready.
+        Scores (query, document) pairs with the Cross-Encoder and returns the top_k.
+        Pairs already in the ScoreCache skip the model.
         """
         try:
             # 1. Check if we have documents to rerank
             if not documents:
                 return []
                 
-            # 2. Lazy load the Model
-            reranker = cls._get_reranker()
+            # 2. Reuse scores of pairs we have already seen
+            cache = ScoreCache.instance() if settings.rerank_cache_enabled else None
+            scores = cache.get_many(query, documents) if cache else [None] * len(documents)
+            missing = [i for i, score in enumerate(scores) if score is None]
             
-            # 3. Predict Scores (Vectorized)
-            pairs = [[query, doc] for doc in documents]
-            scores = reranker.predict(pairs)
+            if missing:
+                # 3. Lazy load the Model
+                reranker = cls._get_reranker()
+                
+                # 4. Predict Scores for unseen pairs only (Vectorized, length-bucketed)
+                pairs = [[query, documents[i]] for i in missing]
+                if settings.length_bucketing_enabled:
+                    predicted = LengthBucketer.instance("rerank").run(pairs, reranker.predict, pair_lengths(reranker)(pairs))
+                else:
+                    predicted = reranker.predict(pairs)
+                for i, score in zip(missing, predicted):
+                    scores[i] = float(score)
+                if cache:
+                    cache.put_many(query, [documents[i] for i in missing], [scores[i] for i in missing])
             
-            # 4. Combine and Sort
+            # 5. Combine and Sort
             # Zip returns an iterator of tuples (doc, score)
             ranked_results = []
             for doc, score in zip(documents, scores):
@@ -141,7 +724,7 @@ class AIService:
             # Sort by score descending
             ranked_results.sort(key=lambda x: x["score"], reverse=True)
             
-            # 5. Return Top K
+            # 6. Return Top K
             return ranked_results[:top_k]
             
         except Exception as e:
@@ -158,7 +741,6 @@ class AIService:
         Extracts metadata using the LLM.
         """
         try:
-            llm = RAGFactory.get_llm()
             prompt_str = f"""
             Analyze the following document text and extract detailed metadata in strict JSON format.
             Do NOT include markdown formatting or backticks. Just the raw JSON object.
@@ -174,15 +756,13 @@ class AIService:
             - "summary": (String) Concise summary of content
             
             Document Text:
-            {text[:4000]}
+            {text[:METADATA_HEAD_CHARS]}
             """
             
-            # Async extraction with timeout
-            import asyncio
-            response = await asyncio.wait_for(llm.acomplete(prompt_str), timeout=30.0)
+            # The timeout covers the generation only, not the wait behind other metadata calls
+            json_str = await LLMGateway.instance().complete(prompt_str, "metadata", timeout=settings.llm_metadata_timeout)
             
             # JSON extraction
-            json_str = response.text
             match = re.search(r'\{.*\}', json_str, re.DOTALL)
             if match:
                 return json.loads(match.group(0))
@@ -200,12 +780,182 @@ class AIService:
         Generates an embedding vector for the given text.
         """
         try:
+            if settings.embedding_cache_enabled:
+                return cls.get_embeddings([text])[0]
             embed_model = RAGFactory.get_embedding_model()
             return embed_model.get_text_embedding(text)
         except Exception as e:
             logger.error(f"Embedding generation failed: {e}")
             raise e
 
+    @classmethod
+    def get_embeddings(cls, texts: List[str]) -> List[List[float]]:
+        """
+        Generates embedding vectors for several texts in one batched forward pass.
+        """
+        try:
+            embed_model = RAGFactory.get_embedding_model()
+            if settings.embedding_cache_enabled:
+                return EmbeddingCache.instance().embed(texts, embed_model.get_text_embedding_batch)
+            return embed_model.get_text_embedding_batch(texts)
+        except Exception as e:
+            logger.error(f"Batch embedding generation failed: {e}")
+            raise e
+
+    @classmethod
+    def get_embeddings_array(cls, texts: List[str]) -> np.ndarray:
+        """
+        Like get_embeddings, but returns a float32 (n, dim) matrix for the compact wire formats.
+        """
+        embed_model = RAGFactory.get_embedding_model()
+        if settings.embedding_cache_enabled:
+            return EmbeddingCache.instance().embed_array(texts, embed_model.get_text_embedding_batch)
+        return np.asarray(embed_model.get_text_embedding_batch(texts), dtype=np.float32)
+
+    @classmethod
+    def get_embed_batcher(cls) -> EmbeddingBatcher:
+        if cls._embed_batcher is None:
+            cls._embed_batcher = EmbeddingBatcher(
+                cls.get_embeddings,
+                window_ms=settings.embed_batch_window_ms,
+                max_batch_size=settings.embed_batch_max_size
+            )
+        return cls._embed_batcher
+
+    @classmethod
+    async def embed_query(cls, text: str) -> List[float]:
+        """
+        Embeds a single text, coalescing concurrent callers into micro-batches.
+        """
+        if not settings.embed_batching_enabled:
+            return await asyncio.to_thread(cls.get_embedding, text)
+        return await cls.get_embed_batcher().embed(text)
+
+    @classmethod
+    async def shutdown(cls):
+        if cls._embed_batcher is not None:
+            await cls._embed_batcher.stop()
+            cls._embed_batcher = None
+        if cls._ingest_jobs is not None:
+            await cls._ingest_jobs.stop()
+        if settings.vector_index_enabled:
+            await asyncio.to_thread(RetrievalService.snapshot)
+        if cls._parser_pool is not None:
+            await asyncio.to_thread(cls._parser_pool.close)
+            cls._parser_pool = None
+        if ChunkStore._instance is not None:
+            ChunkStore._instance.close()
+            ChunkStore._instance = None
+        if settings.embed_workers > 0:
+            # Stops the embedding worker processes
+            await asyncio.to_thread(RAGFactory.unload, "embedding", True, 30.0)
+
+    @classmethod
+    async def search(cls, query: str, top_k: int = 5, document_ids: Optional[List[str]] = None, timings: dict = None) -> List[dict]:
+        """
+        Embeds the query and searches the in-process vector index.
+        """
+        timings = timings if timings is not None else {}
+        start = time.perf_counter()
+        query_embedding = await cls.embed_query(query)
+        embedded = time.perf_counter()
+        # The first search may load the index snapshot from disk
+        hits = await asyncio.to_thread(RetrievalService.search, query_embedding, top_k, document_ids)
+        timings["embed_ms"] = round((embedded - start) * 1000, 2)
+        timings["search_ms"] = round((time.perf_counter() - embedded) * 1000, 3)
+        return hits
+
+    @classmethod
+    def _retrieve(cls, retriever: str, query: str, query_embedding: List[float], limit: int, filters: dict) -> List[dict]:
+        """
+        One retriever for /answer; failures are logged and count as no hits.
+        """
+        try:
+            if settings.answer_retrieval == "local":
+                if retriever != "vector":
+                    return []
+                hits = RetrievalService.search(query_embedding, top_k=limit)
+                return [{**hit, "source_file": hit.get("metadata", {}).get("filename", hit["document_id"])} for hit in hits]
+            store = ChunkStore.instance()
+            if retriever == "vector":
+                return store.vector_search(query_embedding, limit, filters)
+            return store.keyword_search(query, limit, filters)
+        except Exception as e:
+            logger.error(f"{retriever} search failed: {e}")
+            return []
+
+    @classmethod
+    async def answer(cls, question: str, top_k: int = None, filters: dict = None, timings: dict = None) -> Dict[str, Any]:
+        """
+        Fused RAG in one process: embed -> vector + keyword search -> RRF ->
+        cross-encoder rerank -> generation. Per-stage durations (ms) go into `timings`.
+        """
+        timings = timings if timings is not None else {}
+        top_k = top_k or settings.answer_context_chunks
+        start = time.perf_counter()
+
+        def lap(stage: str, since: float) -> float:
+            now = time.perf_counter()
+            timings[f"{stage}_ms"] = round((now - since) * 1000, 2)
+            return now
+
+        plan = cls.plan_query(question)
+        query = plan.get("rewritten_question") or question
+        filters = {**plan.get("filters", {}), **(filters or {})}
+
+        query_embedding = await cls.embed_query(query)
+        t = lap("embed", start)
+
+        limit = settings.answer_candidates_per_retriever
+        vector_hits, keyword_hits = await asyncio.gather(
+            asyncio.to_thread(cls._retrieve, "vector", query, query_embedding, limit, filters),
+            asyncio.to_thread(cls._retrieve, "keyword", query, query_embedding, limit, filters),
+        )
+        t = lap("search", t)
+
+        candidates = reciprocal_rank_fusion({"vector": vector_hits, "keyword": keyword_hits}, k=settings.rrf_k)
+        candidates = candidates[:settings.answer_rerank_candidates]
+        t = lap("fuse", t)
+
+        by_content = {}
+        for candidate in candidates:
+            by_content.setdefault(candidate["content"], candidate)
+        ranked = await asyncio.to_thread(cls.rerank, query, list(by_content), top_k)
+        t = lap("rerank", t)
+
+        chunks = []
+        for result in ranked:
+            candidate = by_content[result["content"]]
+            chunks.append({
+                "id": str(candidate["id"]),
+                "source_file": candidate.get("source_file"),
+                "page_label": (candidate.get("metadata") or {}).get("page_label"),
+                "score": result["score"],
+                "rrf_score": candidate["rrf_score"],
+                "ranks": candidate["ranks"],
+            })
+
+        context = "\n---\n".join(result["content"] for result in ranked)
+        response = await cls.ask_llm(query, context)
+        lap("generate", t)
+        timings["total_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+        sources = list(dict.fromkeys(
+            f"📄 {c['source_file']} (p.{c['page_label']})" if c["page_label"] else f"📄 {c['source_file']}"
+            for c in chunks if c["source_file"]
+        ))
+        logger.info(
+            f"Answer: {len(vector_hits)} vector + {len(keyword_hits)} keyword hits, "
+            f"{len(candidates)} fused, {len(chunks)} in context, timings={timings}"
+        )
+        return {
+            "answer": response["answer"],
+            "sources": sources or ["Internal Knowledge Base"],
+            "chunks": chunks,
+            "cached": response.get("cached", False),
+            "compression": response.get("compression"),
+        }
+
     @classmethod
     def plan_query(cls, question: str) -> Dict[str, Any]:
         """
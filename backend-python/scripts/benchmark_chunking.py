@@ -0,0 +1,81 @@
+import sys
+import os
+import json
+import time
+import argparse
+
+# Add parent directory to path to import app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+from llama_index.core.schema import Document
+
+from app.config import settings
+from app.rag.backends import build_embedding_model
+from app.rag.chunking import CHUNKING_STRATEGIES, build_splitter
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "fixtures", "chunking_corpus.json")
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def evaluate(strategy: str, model, corpus: dict, repeats: int, top_k: int) -> dict:
+    """
+    Splits the corpus with `strategy`, then answers each question by cosine
+    search over the chunk embeddings. A question counts as a hit when a
+    top_k chunk of the right document contains its answer string.
+    """
+    splitter = build_splitter(strategy, model)
+    documents = [Document(text=d["text"], metadata={"filename": d["filename"]}) for d in corpus["documents"]]
+
+    splitter.get_nodes_from_documents(documents[:1])  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        nodes = splitter.get_nodes_from_documents(documents)
+    split_s = (time.perf_counter() - start) / repeats
+
+    chunks = _normalize(np.asarray(model.get_text_embedding_batch([n.get_content() for n in nodes]), dtype=np.float32))
+    hits, reciprocal_ranks = 0, []
+    for item in corpus["questions"]:
+        query = _normalize(np.asarray([model.get_query_embedding(item["question"])], dtype=np.float32))[0]
+        ranking = np.argsort(-(chunks @ query))[:top_k]
+        rank = next(
+            (r + 1 for r, i in enumerate(ranking)
+             if nodes[i].metadata["filename"] == item["document"] and item["answer"] in nodes[i].get_content()),
+            None,
+        )
+        hits += rank is not None
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+
+    return {
+        "chunks": len(nodes),
+        "avg_chars": sum(len(n.get_content()) for n in nodes) / max(1, len(nodes)),
+        "chunks_per_s": len(nodes) / split_s,
+        "hit_rate": hits / len(corpus["questions"]),
+        "mrr": float(np.mean(reciprocal_ranks)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunking speed and retrieval quality per chunking strategy")
+    parser.add_argument("--strategies", nargs="+", default=list(CHUNKING_STRATEGIES))
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="JSON with documents [{filename, text}] and questions [{question, document, answer}]")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = json.load(f)
+    model = build_embedding_model(settings.embedding_model_name)
+
+    print(f"{'strategy':<22}{'chunks':>8}{'avg chars':>11}{'chunks/s':>11}{'hit@' + str(args.top_k):>8}{'mrr':>7}")
+    for strategy in args.strategies:
+        r = evaluate(strategy, model, corpus, args.repeats, args.top_k)
+        print(f"{strategy:<22}{r['chunks']:>8}{r['avg_chars']:>11.0f}{r['chunks_per_s']:>11.1f}{r['hit_rate']:>8.2f}{r['mrr']:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import sys
+import os
+import json
+import time
+import argparse
+
+# Add parent directory to path to import app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+from ollama import Client
+
+from app.config import settings
+from app.prompts.manager import PromptManager
+from app.rag.backends import build_embedding_model
+from app.rag.compression import COMPRESSION_METHODS, compress_context
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "fixtures", "chunking_corpus.json")
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def build_contexts(corpus: dict, model, top_k: int) -> list:
+    """
+    Paragraph chunks of every document, ranked by similarity to each
+    question, stand in for the reranked chunks ChatService sends to /ask.
+    """
+    chunks = [p.strip() for d in corpus["documents"] for p in d["text"].split("\n\n") if p.strip()]
+    matrix = _normalize(np.asarray(model.get_text_embedding_batch(chunks), dtype=np.float32))
+    contexts = []
+    for item in corpus["questions"]:
+        query = _normalize(np.asarray([model.get_query_embedding(item["question"])], dtype=np.float32))[0]
+        contexts.append([chunks[i] for i in np.argsort(-(matrix @ query))[:top_k]])
+    return contexts
+
+
+def generate(client: Client, prompt: str) -> dict:
+    start = time.perf_counter()
+    response = client.chat(
+        model=settings.ollama_model,
+        messages=[{"role": "user", "content": prompt}],
+        options={"temperature": 0.0, "num_ctx": 8192},
+        keep_alive=settings.ollama_keep_alive,
+    )
+    return {
+        "answer": response["message"]["content"],
+        "prompt_tokens": response.get("prompt_eval_count") or 0,
+        "prompt_eval_ms": (response.get("prompt_eval_duration") or 0) / 1e6,
+        "total_ms": (time.perf_counter() - start) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt-eval time saved vs answer drift per context compression method")
+    parser.add_argument("--methods", nargs="+", default=list(COMPRESSION_METHODS))
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="JSON with documents [{filename, text}] and questions [{question, document, answer}]")
+    parser.add_argument("--budget", type=int, default=200, help="context token budget (the fixture corpus is small)")
+    parser.add_argument("--top-k", type=int, default=10, help="chunks per context")
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = json.load(f)
+    model = build_embedding_model(settings.embedding_model_name)
+    client = Client(host=settings.ollama_base_url)
+
+    def embed_array(texts):
+        return np.asarray(model.get_text_embedding_batch(texts), dtype=np.float32)
+
+    contexts = build_contexts(corpus, model, args.top_k)
+    generate(client, "warm up")
+
+    baseline = {}
+    print(f"{'method':<12}{'ctx tokens':>11}{'after':>8}{'compress ms':>13}{'prompt tok':>12}{'prompt eval ms':>16}{'total ms':>10}{'hit':>6}{'drift':>7}")
+    for method in args.methods:
+        rows = []
+        for i, (item, chunks) in enumerate(zip(corpus["questions"], contexts)):
+            compressed, report = compress_context(item["question"], chunks, method, args.budget, embed_array)
+            prompt = PromptManager.get_chat_prompt(compressed, item["question"])
+            result = generate(client, prompt)
+            if method == "none":
+                baseline[i] = result["answer"]
+            reference = baseline.get(i)
+            drift = None
+            if reference is not None:
+                vectors = _normalize(embed_array([reference, result["answer"]]))
+                drift = 1.0 - float(vectors[0] @ vectors[1])
+            rows.append({
+                **report,
+                **result,
+                "hit": item["answer"].lower() in result["answer"].lower(),
+                "drift": drift,
+            })
+
+        drifts = [r["drift"] for r in rows if r["drift"] is not None]
+        print(
+            f"{method:<12}{np.mean([r['tokens_before'] for r in rows]):>11.0f}{np.mean([r['tokens_after'] for r in rows]):>8.0f}"
+            f"{np.mean([r['compress_ms'] for r in rows]):>13.1f}{np.mean([r['prompt_tokens'] for r in rows]):>12.0f}"
+            f"{np.mean([r['prompt_eval_ms'] for r in rows]):>16.1f}{np.mean([r['total_ms'] for r in rows]):>10.1f}"
+            f"{np.mean([r['hit'] for r in rows]):>6.2f}{(np.mean(drifts) if drifts else float('nan')):>7.3f}"
+        )
+    if "none" not in args.methods:
+        print("drift needs the 'none' method as the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,19 @@
 import sys
 import os
+import time
+import uuid
+import argparse
 
 # Add parent directory to path to import app
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
+from app.config import settings
 from app.rag.ingestion import IngestionService
-from app.rag.factory import RAGFactory
+from app.rag.parsing import DoclingParserPool, collect_files
+from app.rag.retrieval import RetrievalService
+from app.rag.store import ChunkStore
 
-def main():
-    print("Initializing RAG...")
-    # Trigger initialization
-    RAGFactory.get_vector_store()
-    
-    cv_text = """
+MOCK_CV = """
     John Doe
     Senior Software Engineer
 
@@ -33,14 +34,67 @@ def main():
     MSc Computer Science, Tech University
     2011 - 2016
     """
-    
+
+
+def ingest_mock_cv():
     print("Ingesting Mock CV...")
+    nodes = IngestionService.process_text(
+        text=MOCK_CV,
+        metadata={"filename": "cv_mock.txt", "category": "CV"}
+    )
+    print(f"Successfully ingested {len(nodes)} nodes.")
+
+
+def ingest_files(args):
+    files = collect_files(args.paths, recursive=not args.no_recursive)
+    print(f"Ingesting {len(files)} files with {args.workers} Docling workers (target={args.target})...")
+
+    start = time.perf_counter()
+    ingested = failed = chunks = 0
+    with DoclingParserPool(workers=args.workers) as pool:
+        for result in IngestionService.process_files(files, parser_pool=pool):
+            if "error" in result:
+                failed += 1
+                print(f"  FAILED {result['file']}: {result['error']}")
+                continue
+            file_path = os.path.abspath(result["file"])
+            rows = [{"content": n.get_content(), "embedding": n.embedding, "metadata": dict(n.metadata)} for n in result["nodes"]]
+            if args.target == "postgres":
+                # Backfilled files have no documents row: NULL document_id, keyed by metadata file_path
+                ChunkStore.instance().copy_file_chunks(rows, file_path, os.path.basename(file_path))
+            elif args.target == "index":
+                document_id = str(uuid.uuid5(uuid.NAMESPACE_URL, file_path))
+                for row in rows:
+                    row["metadata"]["document_id"] = document_id
+                RetrievalService.add_chunks(document_id, rows)
+            ingested += 1
+            chunks += len(rows)
+            elapsed = time.perf_counter() - start
+            missing = f", PARTIAL: pages {result['failed_pages']} failed" if result["failed_pages"] else ""
+            print(f"  {result['file']}: {len(rows)} chunks, parsed in {result['parse_ms'] / 1000:.1f}s{missing} "
+                  f"[{ingested + failed}/{len(files)}, {ingested / elapsed * 60:.1f} files/min]")
+
+    if args.target == "index":
+        RetrievalService.snapshot()
+    elapsed = time.perf_counter() - start
+    print(f"Done: {ingested} files, {chunks} chunks, {failed} failed in {elapsed:.1f}s "
+          f"({ingested / elapsed * 60:.1f} files/min)")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest files or directories (no arguments: ingest a mock CV)")
+    parser.add_argument("paths", nargs="*", help="files or directories")
+    parser.add_argument("--workers", type=int, default=settings.docling_workers, help="Docling parser processes")
+    parser.add_argument("--target", choices=["index", "postgres", "none"], default="index")
+    parser.add_argument("--no-recursive", action="store_true")
+    args = parser.parse_args()
+
     try:
-        nodes = IngestionService.process_text(
-            text=cv_text,
-            metadata={"filename": "cv_mock.txt", "category": "CV"}
-        )
-        print(f"Successfully ingested {len(nodes)} nodes.")
+        if not args.paths:
+            ingest_mock_cv()
+        elif ingest_files(args):
+            sys.exit(2)
     except Exception as e:
         print(f"Ingestion failed: {e}")
         sys.exit(1)
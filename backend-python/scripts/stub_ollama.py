@@ -0,0 +1,180 @@
+import sys
+import re
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Stand-in for an Ollama server: answers /api/chat and /api/generate
+# (streamed or not) with canned text after a configurable delay, simulates
+# the model unloading after keep_alive, and counts requests and TCP
+# connections so connection reuse, coalescing and concurrency limits can be
+# checked without a GPU. Used by tests/rag/test_llm_gateway.py; run it on
+# its own to point the service at it (OLLAMA_BASE_URL=http://127.0.0.1:11435).
+
+
+def parse_keep_alive(value, default: float = 300.0) -> float:
+    """
+    Seconds the model stays loaded; Ollama accepts numbers (seconds) and
+    durations like "30m". Negative keeps the model loaded forever.
+    """
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.fullmatch(r"(-?\d+(?:\.\d+)?)([hms]?)", str(value).strip())
+    if not match:
+        return default
+    return float(match.group(1)) * {"h": 3600, "m": 60, "s": 1, "": 1}[match.group(2)]
+
+
+class StubOllama:
+    def __init__(self, port: int = 0, delay: float = 0.05, load_delay: float = 0.0, token_delay: float = 0.0):
+        self.delay = delay
+        self.load_delay = load_delay
+        self.token_delay = token_delay
+        self.requests = []
+        self.connections = 0
+        self.active = 0
+        self.max_active = 0
+        self.loads = 0
+        self._resident_until = 0.0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self) -> "StubOllama":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubOllama":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _load_model(self, keep_alive):
+        """
+        Pays load_delay when the model isn't resident, then keeps it for keep_alive.
+        """
+        with self._lock:
+            cold = time.monotonic() >= self._resident_until
+            if cold:
+                self.loads += 1
+        if cold:
+            time.sleep(self.load_delay)
+        seconds = parse_keep_alive(keep_alive)
+        with self._lock:
+            self._resident_until = float("inf") if seconds < 0 else time.monotonic() + seconds
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, payload: dict):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_stream(self, parts):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for part in parts:
+                    line = (json.dumps(part) + "\n").encode("utf-8")
+                    self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                    self.wfile.flush()
+                    time.sleep(stub.token_delay)
+                self.wfile.write(b"0\r\n\r\n")
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with stub._lock:
+                    stub.requests.append({"path": self.path, **body})
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                try:
+                    self._respond(body)
+                finally:
+                    with stub._lock:
+                        stub.active -= 1
+
+            def _respond(self, body: dict):
+                stub._load_model(body.get("keep_alive"))
+                if self.path == "/api/generate":
+                    prompt = body.get("prompt") or ""
+                elif self.path == "/api/chat":
+                    prompt = (body.get("messages") or [{}])[-1].get("content", "")
+                else:
+                    self.send_error(404)
+                    return
+                if not prompt:
+                    # Ollama's load-only request
+                    self._send_json({"model": body.get("model"), "response": "", "done": True})
+                    return
+
+                time.sleep(stub.delay)
+                words = f"Echo: {prompt[:80]}".split(" ")
+                if self.path == "/api/chat":
+                    parts = [{"model": body.get("model"), "message": {"role": "assistant", "content": w + " "}, "done": False} for w in words]
+                    final = {"model": body.get("model"), "message": {"role": "assistant", "content": ""}, "done": True}
+                    whole = {"model": body.get("model"), "message": {"role": "assistant", "content": " ".join(words)}, "done": True}
+                else:
+                    parts = [{"model": body.get("model"), "response": w + " ", "done": False} for w in words]
+                    final = {"model": body.get("model"), "response": "", "done": True}
+                    whole = {"model": body.get("model"), "response": " ".join(words), "done": True}
+
+                if body.get("stream", True):
+                    self._send_stream(parts + [final])
+                else:
+                    self._send_json(whole)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Ollama server for local testing")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--delay", type=float, default=0.5, help="seconds per generation")
+    parser.add_argument("--load-delay", type=float, default=5.0, help="seconds to load a model that isn't resident")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds between streamed tokens")
+    args = parser.parse_args()
+
+    stub = StubOllama(args.port, args.delay, args.load_delay, args.token_delay).start()
+    print(f"Stub Ollama listening on {stub.url}")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"  requests={len(stub.requests)} connections={stub.connections} loads={stub.loads} max_active={stub.max_active}")
+    except KeyboardInterrupt:
+        stub.stop()
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
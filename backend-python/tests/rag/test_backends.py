@@ -0,0 +1,114 @@
+import os
+import pytest
+import numpy as np
+from unittest.mock import MagicMock, patch
+import sys
+
+# MOCK DOCLING
+sys.modules["llama_index.readers.docling"] = MagicMock()
+sys.modules["llama_index.readers.docling"].DoclingReader = MagicMock()
+
+from app.rag import backends
+from app.rag.backends import FastEmbedReranker, build_embedding_model, build_reranker, quantized_file_name
+from app.config import settings
+
+
+@patch("app.rag.backends.HuggingFaceEmbedding")
+def test_torch_backend_builds_huggingface_embedding(MockEmbed):
+    model = build_embedding_model("BAAI/bge-small-en-v1.5", backend="torch")
+
+    assert model is MockEmbed.return_value
+    kwargs = MockEmbed.call_args.kwargs
+    assert kwargs["model_name"] == "BAAI/bge-small-en-v1.5"
+    assert "backend" not in kwargs
+
+
+@patch.object(settings, "onnx_quantize", True)
+@patch("app.rag.backends._hub_has_file", return_value=True)
+@patch("app.rag.backends.HuggingFaceEmbedding")
+def test_onnx_backend_loads_published_int8_file(MockEmbed, _):
+    build_embedding_model("BAAI/bge-small-en-v1.5", backend="onnx")
+
+    kwargs = MockEmbed.call_args.kwargs
+    assert kwargs["backend"] == "onnx"
+    assert kwargs["device"] == "cpu"
+    assert kwargs["model_kwargs"] == {"file_name": quantized_file_name()}
+
+
+@patch.object(settings, "onnx_quantize", True)
+@patch("app.rag.backends._hub_has_file", return_value=False)
+@patch("app.rag.backends.CrossEncoder")
+def test_onnx_backend_quantizes_when_no_published_file(MockCrossEncoder, _, tmp_path):
+    with patch.object(settings, "onnx_export_dir", str(tmp_path)), \
+         patch("sentence_transformers.export_dynamic_quantized_onnx_model") as mock_export:
+        build_reranker("BAAI/bge-reranker-base", backend="onnx")
+
+    local_dir = os.path.join(str(tmp_path), "BAAI__bge-reranker-base")
+    mock_export.assert_called_once_with(MockCrossEncoder.return_value, settings.onnx_quantization_config, local_dir)
+    # Final model is loaded from the local export
+    assert MockCrossEncoder.call_args.args == (local_dir,)
+    assert MockCrossEncoder.call_args.kwargs["model_kwargs"] == {"file_name": quantized_file_name()}
+
+
+@patch.object(settings, "onnx_quantize", False)
+@patch("app.rag.backends.CrossEncoder")
+def test_onnx_backend_without_quantization(MockCrossEncoder):
+    build_reranker("BAAI/bge-reranker-base", backend="onnx")
+
+    MockCrossEncoder.assert_called_once_with("BAAI/bge-reranker-base", device="cpu", backend="onnx")
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        build_reranker("BAAI/bge-reranker-base", backend="tensorrt")
+
+
+def test_fastembed_reranker_matches_cross_encoder_interface():
+    reranker = FastEmbedReranker.__new__(FastEmbedReranker)
+    reranker.batch_size = 8
+    reranker._model = MagicMock()
+    reranker._model.rerank_pairs.return_value = iter([0.0, 2.0, -2.0])
+
+    scores = reranker.predict([["q", "a"], ["q", "b"], ["q", "c"]])
+
+    assert scores.shape == (3,)
+    assert scores[0] == pytest.approx(0.5)
+    assert list(np.argsort(-scores)) == [1, 0, 2]
+    assert reranker.predict([]).shape == (0,)
+
+
+# Parity against the torch path downloads real models; run with RUN_BACKEND_PARITY=1
+parity = pytest.mark.skipif(not os.getenv("RUN_BACKEND_PARITY"), reason="set RUN_BACKEND_PARITY=1 to run")
+
+PARITY_TEXTS = [
+    "The invoice is due within thirty days of receipt.",
+    "Payment terms: net 30.",
+    "The candidate has five years of Python experience.",
+    "Quarterly revenue grew by twelve percent.",
+]
+PARITY_QUERY = "When does the invoice have to be paid?"
+
+
+@parity
+@pytest.mark.parametrize("backend", ["onnx", "fastembed"])
+def test_embedding_parity_with_torch(backend):
+    reference = np.asarray(build_embedding_model(settings.embedding_model_name, "torch").get_text_embedding_batch(PARITY_TEXTS))
+    candidate = np.asarray(build_embedding_model(settings.embedding_model_name, backend).get_text_embedding_batch(PARITY_TEXTS))
+
+    reference /= np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate /= np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosine = np.sum(reference * candidate, axis=1)
+    assert cosine.min() > 0.98
+
+
+@parity
+@pytest.mark.parametrize("backend", ["onnx", "fastembed"])
+def test_rerank_order_parity_with_torch(backend):
+    pairs = [[PARITY_QUERY, text] for text in PARITY_TEXTS]
+    reference = np.asarray(build_reranker(settings.reranker_model_name, "torch").predict(pairs))
+    candidate = np.asarray(build_reranker(settings.reranker_model_name, backend).predict(pairs))
+
+    # The top passage must match and the top-2 set must agree
+    assert np.argmax(candidate) == np.argmax(reference)
+    assert set(np.argsort(-candidate)[:2]) == set(np.argsort(-reference)[:2])
+    assert np.abs(candidate - reference).max() < 0.1
@@ -0,0 +1,78 @@
+import pytest
+import asyncio
+from unittest.mock import MagicMock, patch
+import sys
+
+# MOCK DOCLING
+sys.modules["llama_index.readers.docling"] = MagicMock()
+sys.modules["llama_index.readers.docling"].DoclingReader = MagicMock()
+
+from app.rag.batching import EmbeddingBatcher
+from app.services import AIService
+from app.config import settings
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_batch():
+    calls = []
+
+    def embed_batch(texts):
+        calls.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+    batcher = EmbeddingBatcher(embed_batch, window_ms=20, max_batch_size=16)
+    try:
+        results = await asyncio.gather(*(batcher.embed("x" * i) for i in range(1, 6)))
+    finally:
+        await batcher.stop()
+
+    # Order is preserved per caller
+    assert results == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+    assert len(calls) == 1
+    stats = batcher.stats()
+    assert stats["batches"] == 1
+    assert stats["items"] == 5
+    assert stats["batch_size_histogram"]["<=8"] == 1
+
+
+@pytest.mark.asyncio
+async def test_max_batch_size_splits_batches():
+    calls = []
+
+    def embed_batch(texts):
+        calls.append(len(texts))
+        return [[0.0] for _ in texts]
+
+    batcher = EmbeddingBatcher(embed_batch, window_ms=50, max_batch_size=2)
+    try:
+        await asyncio.gather(*(batcher.embed(str(i)) for i in range(5)))
+    finally:
+        await batcher.stop()
+
+    assert sum(calls) == 5
+    assert max(calls) <= 2
+
+
+@pytest.mark.asyncio
+async def test_batch_failure_propagates_to_callers():
+    def embed_batch(texts):
+        raise ValueError("bad input")
+
+    batcher = EmbeddingBatcher(embed_batch, window_ms=1)
+    try:
+        with pytest.raises(ValueError):
+            await batcher.embed("text")
+    finally:
+        await batcher.stop()
+
+
+@patch.object(settings, "embedding_cache_enabled", False)
+@patch("app.services.RAGFactory")
+def test_get_embeddings_uses_batch_api(MockFactory):
+    mock_model = MockFactory.get_embedding_model.return_value
+    mock_model.get_text_embedding_batch.return_value = [[0.1], [0.2]]
+
+    vectors = AIService.get_embeddings(["a", "b"])
+
+    mock_model.get_text_embedding_batch.assert_called_once_with(["a", "b"])
+    assert vectors == [[0.1], [0.2]]
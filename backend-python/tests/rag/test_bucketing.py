@@ -0,0 +1,98 @@
+import pytest
+from unittest.mock import MagicMock, patch
+import sys
+
+# MOCK DOCLING
+sys.modules["llama_index.readers.docling"] = MagicMock()
+sys.modules["llama_index.readers.docling"].DoclingReader = MagicMock()
+
+from app.rag.bucketing import LengthBucketer, pair_lengths, text_lengths
+from app.services import AIService
+from app.config import settings
+
+
+def test_results_come_back_in_input_order():
+    bucketer = LengthBucketer(bounds=(4, 16), max_batch_tokens=32, max_batch_size=8)
+    items = ["a" * n for n in (20, 1, 9, 2, 15, 3)]
+    calls = []
+
+    def fn(batch):
+        calls.append([len(x) for x in batch])
+        return [len(x) for x in batch]
+
+    results = bucketer.run(items, fn, [len(x) for x in items])
+
+    assert results == [20, 1, 9, 2, 15, 3]
+    # One batch per bucket, shortest first; the >16 bucket runs alone
+    assert calls == [[1, 2, 3], [9, 15], [20]]
+
+
+def test_bucket_batch_size_follows_token_budget():
+    bucketer = LengthBucketer(bounds=(8, 64), max_batch_tokens=128, max_batch_size=32)
+
+    batches = bucketer.plan([8] * 40 + [64] * 5)
+
+    # Short bucket is capped by max_batch_size, long bucket by the token budget
+    assert [len(b) for b in batches] == [16, 16, 8, 2, 2, 1]
+    assert sorted(i for b in batches for i in b) == list(range(45))
+
+
+def test_padding_is_reported():
+    bucketer = LengthBucketer(bounds=(4, 16), max_batch_tokens=1000, max_batch_size=2)
+    lengths = [1, 16, 2, 15]
+    report = {}
+
+    bucketer.run(list(range(4)), lambda batch: batch, lengths, report=report)
+
+    assert report == {"tokens": 34, "padded_tokens": 4 + 32, "batches": 2}
+    stats = bucketer.stats()
+    assert stats["padding_tokens"] == 2
+    # Input order with batches of 2 pads [1, 16] and [2, 15] to 32 + 30 tokens
+    assert stats["unbucketed_padded_tokens"] == 62
+
+
+def test_length_functions_fall_back_without_tokenizer():
+    model = MagicMock()
+
+    assert text_lengths(model)(["abcdefgh"]) == [4]
+    assert pair_lengths(model)([("abcd", "abcdefgh")]) == [7]
+
+
+@patch.object(settings, "rerank_cache_enabled", False)
+@patch.object(settings, "length_bucketing_enabled", True)
+def test_rerank_scores_in_buckets_but_ranks_original_documents():
+    reranker = MagicMock()
+    reranker.predict.side_effect = lambda pairs: [float(len(doc)) for _, doc in pairs]
+    documents = ["x" * 600, "short", "y" * 200]
+
+    with patch.object(AIService, "_get_reranker", return_value=reranker), \
+         patch.object(LengthBucketer, "instance", return_value=LengthBucketer(bounds=(16, 64), max_batch_tokens=4096)):
+        results = AIService.rerank("q", documents, top_k=3)
+
+    assert [r["score"] for r in results] == [600.0, 200.0, 5.0]
+    assert [len(c.args[0]) for c in reranker.predict.call_args_list] == [1, 1, 1]
+
+
+@patch.object(settings, "embedding_cache_enabled", True)
+@patch.object(settings, "length_bucketing_enabled", True)
+def test_cached_chunks_are_not_counted_as_embedded_tokens():
+    from llama_index.core.schema import TextNode
+    from app.rag.cache import EmbeddingCache
+    from app.rag.ingestion import IngestionService
+
+    embed_model = MagicMock()
+    embed_model.get_text_embedding_batch.side_effect = lambda texts: [[float(len(t))] for t in texts]
+    cache = EmbeddingCache("model", memory_budget_bytes=1024 * 1024)
+    cache.put_many(["a" * 40], [[40.0]])
+    nodes = [TextNode(text="a" * 40), TextNode(text="b" * 8), TextNode(text="b" * 8)]
+    timings, progress = {}, []
+
+    with patch.object(EmbeddingCache, "instance", return_value=cache), \
+         patch.object(LengthBucketer, "instance", return_value=LengthBucketer(bounds=(16, 64))):
+        IngestionService._embed_nodes(nodes, embed_model, timings, on_batch=progress.append)
+
+    # Only the one distinct uncached text reached the model, and only it is counted
+    embed_model.get_text_embedding_batch.assert_called_once_with(["b" * 8])
+    assert timings == {"embed_tokens": 4, "embed_padded_tokens": 4}
+    assert [n.embedding for n in nodes] == [[40.0], [8.0], [8.0]]
+    assert sum(progress) == 3
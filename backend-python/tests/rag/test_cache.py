@@ -0,0 +1,197 @@
+import pytest
+from unittest.mock import MagicMock, patch
+import sys
+
+# MOCK DOCLING
+sys.modules["llama_index.readers.docling"] = MagicMock()
+sys.modules["llama_index.readers.docling"].DoclingReader = MagicMock()
+
+from app.rag.cache import AnswerCache, EmbeddingCache, ScoreCache
+from app.services import AIService
+from app.config import settings
+
+
+def fake_embed(texts):
+    return [[float(len(t)), 1.0] for t in texts]
+
+
+def test_repeated_and_normalized_texts_hit_cache():
+    cache = EmbeddingCache("model", memory_budget_bytes=1024 * 1024)
+    embed = MagicMock(side_effect=fake_embed)
+
+    first = cache.embed(["hello world", "footer"], embed)
+    second = cache.embed(["  hello   world ", "footer", "new"], embed)
+
+    assert first == [[11.0, 1.0], [6.0, 1.0]]
+    assert second[:2] == first
+    # Only the unseen text reached the model the second time
+    assert embed.call_args_list[1].args[0] == ["new"]
+    stats = cache.stats()
+    assert stats["hits_memory"] == 2
+    assert stats["misses"] == 3
+
+
+def test_duplicates_in_one_call_are_embedded_once():
+    cache = EmbeddingCache("model", memory_budget_bytes=1024 * 1024)
+    embed = MagicMock(side_effect=fake_embed)
+
+    vectors = cache.embed(["disclaimer", "disclaimer", "body"], embed)
+
+    embed.assert_called_once_with(["disclaimer", "body"])
+    assert vectors[0] == vectors[1]
+
+
+def test_memory_budget_evicts_least_recently_used():
+    # Room for roughly two 2-d float32 entries
+    cache = EmbeddingCache("model", memory_budget_bytes=2 * (8 + 200))
+    cache.embed(["a", "b"], fake_embed)
+    cache.get_many(["a"])  # touch "a" so "b" is the LRU entry
+    cache.embed(["c"], fake_embed)
+
+    hits = cache.get_many(["a", "b", "c"])
+    assert hits[0] is not None
+    assert hits[1] is None
+    assert hits[2] is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_persistent_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    EmbeddingCache("model", 1024 * 1024, path).embed(["persisted"], fake_embed)
+
+    restarted = EmbeddingCache("model", 1024 * 1024, path)
+    embed = MagicMock(side_effect=fake_embed)
+    vectors = restarted.embed(["persisted"], embed)
+
+    embed.assert_not_called()
+    assert vectors == [[9.0, 1.0]]
+    assert restarted.stats()["hits_disk"] == 1
+
+
+def test_model_name_is_part_of_key():
+    assert EmbeddingCache("model-a", 1024).key("text") != EmbeddingCache("model-b", 1024).key("text")
+
+
+def test_persisted_vectors_are_not_served_to_another_backend(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    EmbeddingCache("model", 1024 * 1024, path, backend="torch").embed(["persisted"], fake_embed)
+
+    with patch.object(settings, "inference_backend", "onnx"), \
+         patch.object(settings, "onnx_quantize", True), \
+         patch.object(settings, "embedding_model_name", "model"), \
+         patch.object(settings, "embedding_cache_path", path), \
+         patch.object(EmbeddingCache, "_instance", None):
+        quantized = EmbeddingCache.instance()
+
+    assert quantized.backend.startswith("onnx-qint8")
+    assert quantized.get_many(["persisted"]) == [None]
+
+
+def test_score_cache_ttl_and_size_limits():
+    now = [0.0]
+    cache = ScoreCache("reranker", max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    cache.put_many("q", ["a", "b", "c"], [0.1, 0.2, 0.3])
+
+    # Oldest entry evicted by the size limit
+    assert cache.get_many("q", ["a", "b", "c"]) == [None, 0.2, 0.3]
+
+    now[0] = 11.0
+    assert cache.get_many("q", ["b"]) == [None]
+    assert cache.stats()["expired"] == 1
+
+
+def test_rerank_only_scores_unseen_pairs():
+    cache = ScoreCache("reranker", max_entries=100, ttl_seconds=60)
+    reranker = MagicMock()
+    reranker.predict.side_effect = lambda pairs: [float(len(doc)) for _, doc in pairs]
+
+    with patch.object(ScoreCache, "instance", return_value=cache), \
+         patch.object(settings, "rerank_cache_enabled", True), \
+         patch.object(AIService, "_get_reranker", return_value=reranker):
+        first = AIService.rerank("query", ["short", "longer doc"], top_k=2)
+        second = AIService.rerank("query", ["longer doc", "new one here"], top_k=3)
+
+    assert [r["content"] for r in first] == ["longer doc", "short"]
+    assert reranker.predict.call_args_list[1].args[0] == [["query", "new one here"]]
+    assert [r["score"] for r in second] == [12.0, 10.0]
+
+
+def test_answer_cache_keys_on_chunk_set_and_question():
+    now = [0.0]
+    cache = AnswerCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    cache.put("llm", ["chunk one", "chunk two"], "What is it?", "An answer")
+
+    # Same chunks in any order, same question modulo whitespace and case
+    assert cache.get("llm", ["chunk two", "chunk  one"], "what is  it?")["answer"] == "An answer"
+    assert cache.get("llm", ["chunk one", "chunk two (edited)"], "What is it?") is None
+    assert cache.get("other-llm", ["chunk one", "chunk two"], "What is it?") is None
+
+    cache.put("llm", ["a"], "q1", "1")
+    cache.put("llm", ["b"], "q2", "2")
+    # Least recently used entry evicted by the size limit
+    assert cache.get("llm", ["chunk one", "chunk two"], "What is it?") is None
+    now[0] = 11.0
+    assert cache.get("llm", ["b"], "q2") is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_answer_cache_semantic_tier_matches_similar_questions_over_same_chunks():
+    cache = AnswerCache(max_entries=10, ttl_seconds=60, semantic_threshold=0.9)
+    cache.put("llm", ["chunk"], "Where does John work?", "TechCorp", question_embedding=[1.0, 0.1])
+
+    hit = cache.get("llm", ["chunk"], "Which company employs John?", question_embedding=[0.95, 0.12])
+    assert hit["answer"] == "TechCorp" and hit["match"] == "semantic"
+    assert cache.get("llm", ["chunk"], "When did John start?", question_embedding=[0.1, 1.0]) is None
+    assert cache.get("llm", ["other chunk"], "Which company employs John?", question_embedding=[0.95, 0.12]) is None
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_answer_cache_invalidates_answers_built_on_changed_chunks():
+    cache = AnswerCache(max_entries=10, ttl_seconds=60)
+    cache.put("llm", ["shared", "old text"], "q1", "1")
+    cache.put("llm", ["shared"], "q2", "2")
+
+    assert cache.invalidate_texts(["old  text"]) == 1
+    assert cache.get("llm", ["shared", "old text"], "q1") is None
+    assert cache.get("llm", ["shared"], "q2")["answer"] == "2"
+
+
+@pytest.mark.asyncio
+async def test_ask_llm_serves_repeated_questions_from_the_answer_cache():
+    cache = AnswerCache(max_entries=10, ttl_seconds=60)
+    gateway = MagicMock()
+
+    async def complete(prompt, endpoint):
+        return "Generated"
+
+    gateway.complete.side_effect = complete
+    with patch.object(AnswerCache, "instance", return_value=cache), \
+         patch.object(settings, "answer_cache_enabled", True), \
+         patch("app.services.LLMGateway.instance", return_value=gateway), \
+         patch("app.services.PromptManager.get_chat_prompt", return_value="Prompt"):
+        first = await AIService.ask_llm("What is it?", "Chunk one text\n---\nChunk two text")
+        second = await AIService.ask_llm("What is it?", "Chunk two text\n---\nChunk one text")
+        other = await AIService.ask_llm("Something else?", "Chunk one text\n---\nChunk two text")
+
+    assert first["cached"] is False and second["cached"] is True
+    assert second["answer"] == "Generated"
+    assert other["cached"] is False
+    assert gateway.complete.call_count == 2
+
+
+def test_removing_indexed_chunks_invalidates_their_answers(tmp_path):
+    from app.rag.index import VectorIndex
+    from app.rag.retrieval import RetrievalService
+
+    cache = AnswerCache(max_entries=10, ttl_seconds=60)
+    cache.put("llm", ["kept text"], "q1", "1")
+    cache.put("llm", ["kept text", "stale text"], "q2", "2")
+    index = VectorIndex(dim=2)
+    index.add(["doc#a", "doc#b"], [[1.0, 0.0], [0.0, 1.0]], "doc", [{"content": "kept text"}, {"content": "stale text"}])
+
+    with patch.object(AnswerCache, "instance", return_value=cache), \
+         patch.object(RetrievalService, "_index", index):
+        RetrievalService.apply_delta("doc", [], ["doc#a"])
+
+    assert cache.get("llm", ["kept text"], "q1")["answer"] == "1"
+    assert cache.get("llm", ["kept text", "stale text"], "q2") is None
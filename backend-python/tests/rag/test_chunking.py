@@ -0,0 +1,167 @@
+import pytest
+from unittest.mock import MagicMock, patch
+import sys
+
+# MOCK DOCLING
+sys.modules["llama_index.readers.docling"] = MagicMock()
+sys.modules["llama_index.readers.docling"].DoclingReader = MagicMock()
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import Document, TextNode
+from app.rag.chunking import ChunkerRegistry, PooledSemanticSplitter, SentenceSimilaritySplitter, build_splitter, resolve_strategy
+from app.rag.ingestion import IngestionService
+from app.config import settings
+
+
+class TopicEmbedding(BaseEmbedding):
+    """
+    Deterministic 2-d embedding: 'cat' sentences point one way, everything else the other.
+    """
+    def _embed(self, text: str):
+        return [1.0, 0.0] if "cat" in text else [0.0, 1.0]
+
+    def _get_text_embedding(self, text):
+        return self._embed(text)
+
+    def _get_query_embedding(self, query):
+        return self._embed(query)
+
+    async def _aget_query_embedding(self, query):
+        return self._embed(query)
+
+
+def split_sentences(text):
+    return [s.strip() + ". " for s in text.split(".") if s.strip()]
+
+
+def test_pooled_splitter_embeds_chunks_without_extra_calls():
+    embed_model = TopicEmbedding()
+    splitter = PooledSemanticSplitter(
+        buffer_size=0,
+        breakpoint_percentile_threshold=50,
+        embed_model=embed_model,
+        sentence_splitter=split_sentences,
+    )
+    doc = Document(text="The cat sat. The cat slept. Stocks fell. Markets closed.")
+
+    with patch.object(TopicEmbedding, "get_text_embedding_batch", wraps=embed_model.get_text_embedding_batch) as spy:
+        nodes = splitter.get_nodes_from_documents([doc])
+
+    # One batched call for the sentence groups, nothing afterwards
+    assert spy.call_count == 1
+    assert len(nodes) == 2
+    assert "cat" in nodes[0].get_content()
+    assert nodes[0].embedding == pytest.approx([1.0, 0.0])
+    assert nodes[1].embedding == pytest.approx([0.0, 1.0])
+
+
+@patch.object(settings, "embedding_cache_enabled", False)
+@patch("app.rag.ingestion.RAGFactory")
+@patch("app.rag.chunking.SemanticSplitterNodeParser")
+def test_process_text_embeds_nodes_in_one_batch(MockSplitter, MockFactory):
+    nodes = [TextNode(text="first chunk"), TextNode(text="second chunk")]
+    MockSplitter.return_value.get_nodes_from_documents.return_value = nodes
+    embed_model = MockFactory.acquire.return_value.__enter__.return_value
+    embed_model.get_text_embedding_batch.return_value = [[0.1], [0.2]]
+
+    timings = {}
+    result = IngestionService.process_text("text", {"key": "value"}, timings=timings, embed_mode="batch")
+
+    embed_model.get_text_embedding_batch.assert_called_once_with(["first chunk", "second chunk"])
+    embed_model.get_text_embedding.assert_not_called()
+    assert [n.embedding for n in result] == [[0.1], [0.2]]
+    assert set(timings) == {"split_ms", "embed_ms", "embed_tokens", "embed_padded_tokens"}
+
+    MockFactory.acquire.assert_called_once_with("embedding")
+
+
+def test_sentence_similarity_splitter_embeds_each_distinct_sentence_once():
+    embed_model = TopicEmbedding()
+    splitter = SentenceSimilaritySplitter(
+        breakpoint_percentile_threshold=50,
+        embed_model=embed_model,
+        sentence_splitter=split_sentences,
+    )
+    doc = Document(text="The cat sat. The cat sat. Stocks fell. Markets closed.")
+
+    with patch.object(TopicEmbedding, "get_text_embedding_batch", wraps=embed_model.get_text_embedding_batch) as spy:
+        nodes = splitter.get_nodes_from_documents([doc])
+
+    assert spy.call_count == 1
+    assert len(spy.call_args.args[0]) == 3
+    assert [n.get_content().strip() for n in nodes] == ["The cat sat. The cat sat.", "Stocks fell. Markets closed."]
+    assert all(n.embedding is None for n in nodes)
+
+
+def test_sentence_similarity_splitter_caps_chunk_length():
+    splitter = SentenceSimilaritySplitter(embed_model=TopicEmbedding(), sentence_splitter=split_sentences, max_chunk_chars=30)
+    nodes = splitter.get_nodes_from_documents([Document(text="The cat sat. The cat slept. The cat ate. The cat ran.")])
+
+    assert len(nodes) >= 2
+
+
+@pytest.mark.parametrize("strategy", ["token", "recursive"])
+def test_structural_strategies_need_no_embeddings(strategy):
+    embed_model = MagicMock()
+    with patch.object(settings, "chunk_size_tokens", 32), patch.object(settings, "chunk_overlap_tokens", 4):
+        splitter = build_splitter(strategy, embed_model)
+        text = "\n\n".join(f"Paragraph {i}. " + "Some words about the topic. " * 6 for i in range(4))
+        nodes = splitter.get_nodes_from_documents([Document(text=text)])
+
+    assert len(nodes) > 1
+    embed_model.get_text_embedding_batch.assert_not_called()
+
+
+def test_resolve_strategy_precedence():
+    with patch.object(settings, "chunking_strategy", "semantic"), \
+         patch.object(settings, "chunking_strategy_by_type", {".txt": "recursive", "Invoice": "token"}):
+        assert resolve_strategy({}) == "semantic"
+        assert resolve_strategy({"filename": "notes.TXT"}) == "recursive"
+        assert resolve_strategy({"filename": "a.txt", "document_type": "Invoice"}) == "token"
+        assert resolve_strategy({"filename": "a.txt", "chunking_strategy": "sentence_similarity"}) == "sentence_similarity"
+        assert resolve_strategy({"chunking_strategy": "token"}, requested="semantic") == "semantic"
+        with pytest.raises(ValueError):
+            resolve_strategy({"chunking_strategy": "paragraphs"})
+
+
+def test_sentence_similarity_reuses_cached_sentence_embeddings_across_documents():
+    from contextlib import contextmanager
+    from app.rag.cache import EmbeddingCache
+
+    ChunkerRegistry.clear()
+    embed_model = TopicEmbedding()
+    sent = []
+
+    def embed_batch(texts, **kwargs):
+        sent.append([t.strip() for t in texts])
+        return [embed_model._embed(t) for t in texts]
+
+    @contextmanager
+    def acquire(name):
+        yield embed_model
+
+    metadata = {"chunking_strategy": "sentence_similarity"}
+    with patch.object(settings, "embedding_cache_enabled", True), \
+         patch.object(EmbeddingCache, "_instance", EmbeddingCache("model", memory_budget_bytes=1024 * 1024)), \
+         patch("app.rag.ingestion.RAGFactory.acquire", side_effect=acquire), \
+         patch.object(TopicEmbedding, "get_text_embedding_batch", side_effect=embed_batch):
+        IngestionService.process_text("The cat sat. Stocks fell. Markets closed.", metadata, embed_mode="batch")
+        sent.clear()
+        IngestionService.process_text("The cat sat. Stocks fell. Bonds rose.", metadata, embed_mode="batch")
+
+    texts = [t for batch in sent for t in batch]
+    # Only the new sentence (and the new chunk) reached the model
+    assert "Bonds rose." in texts
+    assert "The cat sat." not in texts and "Stocks fell." not in texts
+    ChunkerRegistry.clear()
+
+
+def test_registry_reuses_splitters_until_the_model_changes():
+    ChunkerRegistry.clear()
+    first, second = TopicEmbedding(), TopicEmbedding()
+
+    splitter = ChunkerRegistry.get("semantic", first)
+    assert ChunkerRegistry.get("semantic", first) is splitter
+    assert ChunkerRegistry.get("semantic", first, "reuse") is not splitter
+    assert isinstance(ChunkerRegistry.get("semantic", first, "reuse"), PooledSemanticSplitter)
+    assert ChunkerRegistry.get("semantic", second) is not splitter
@@ -0,0 +1,136 @@
+import sys
+from unittest.mock import MagicMock
+
+# -- MOCKING DEPENDENCIES START --
+mock_docling = MagicMock()
+sys.modules["llama_index.readers.docling"] = mock_docling
+# -- MOCKING DEPENDENCIES END --
+
+import numpy as np
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+
+from app.config import settings
+from app.main import app
+from app.rag.compression import LLMLinguaCompressor, compress_context, count_tokens
+from app.rag.postprocessors import LLMLinguaPostprocessor
+from app.services import AIService
+
+VOCABULARY = ["build", "times", "reduced", "hiking", "trails", "invoice", "total", "weather"]
+
+CHUNKS = [
+    "Jane enjoys hiking on weekends. The weather was sunny.",
+    "Jane reduced build times by 40%. The invoice total was 1200 EUR.",
+    "The weather report mentions rain. Hiking trails were closed.",
+]
+
+
+def bag_of_words(texts):
+    return np.array([[float(w in t.lower()) for w in VOCABULARY] + [0.1] for t in texts])
+
+
+class TestCompressContext:
+    def test_context_within_budget_is_untouched(self):
+        chunks, report = compress_context("q", CHUNKS, "extractive", budget=10000, embed_fn=bag_of_words)
+
+        assert chunks == CHUNKS
+        assert report["method"] == "none"
+        assert report["tokens_before"] == report["tokens_after"] > 0
+
+    def test_budget_keeps_leading_chunks_and_cuts_the_last_at_a_sentence(self):
+        budget = count_tokens(CHUNKS[0]) + count_tokens("Jane reduced build times by 40%.")
+        chunks, report = compress_context("q", CHUNKS, "budget", budget=budget)
+
+        assert chunks == [CHUNKS[0], "Jane reduced build times by 40%."]
+        assert report["tokens_after"] <= budget < report["tokens_before"]
+        assert report["chunks_after"] == 2
+
+    def test_extractive_keeps_sentences_closest_to_the_question_in_reading_order(self):
+        budget = count_tokens("Jane reduced build times by 40%.") + count_tokens("Hiking trails were closed.")
+        chunks, report = compress_context("Were hiking trails open, and were build times reduced?", CHUNKS, "extractive", budget=budget, embed_fn=bag_of_words)
+
+        # Most similar sentences first, rendered in chunk order
+        assert chunks == ["Jane reduced build times by 40%.", "Hiking trails were closed."]
+        assert report["method"] == "extractive"
+        assert report["tokens_after"] <= budget
+
+    def test_llmlingua_compresses_each_chunk(self):
+        compressor = MagicMock()
+        compressor.compress_prompt.side_effect = lambda chunks, **kwargs: {
+            "compressed_prompt_list": [" ".join(c.split()[:3]) for c in chunks],
+            "compressed_prompt": "",
+        }
+        llmlingua = MagicMock()
+        llmlingua.PromptCompressor.return_value = compressor
+
+        with patch.dict(sys.modules, {"llmlingua": llmlingua}), \
+             patch.object(LLMLinguaCompressor, "_instance", None):
+            chunks, report = compress_context("q", CHUNKS, "llmlingua", budget=20)
+
+        assert chunks == ["Jane enjoys hiking", "Jane reduced build", "The weather report"]
+        assert compressor.compress_prompt.call_args.kwargs["target_token"] == 20
+        assert llmlingua.PromptCompressor.call_args.kwargs["use_llmlingua2"] is True
+        assert report["method"] == "llmlingua" and report["ratio"] < 1
+
+    def test_failing_method_falls_back_to_budget(self):
+        with patch.dict(sys.modules, {"llmlingua": None}), \
+             patch.object(LLMLinguaCompressor, "_instance", None):
+            chunks, report = compress_context("q", CHUNKS, "llmlingua", budget=count_tokens(CHUNKS[0]))
+
+        assert chunks == [CHUNKS[0]]
+        assert report["method"] == "budget"
+
+    def test_unknown_method_is_rejected(self):
+        with pytest.raises(ValueError):
+            compress_context("q", CHUNKS, "zip")
+
+
+class TestCompressionInAsk:
+    @pytest.mark.asyncio
+    async def test_ask_llm_renders_compressed_context_and_reports_tokens(self):
+        gateway = MagicMock()
+
+        async def complete(prompt, endpoint):
+            return "40%"
+
+        gateway.complete.side_effect = complete
+        with patch.object(settings, "answer_cache_enabled", False), \
+             patch.object(settings, "context_token_budget", count_tokens(CHUNKS[0])), \
+             patch("app.services.LLMGateway.instance", return_value=gateway), \
+             patch("app.services.PromptManager.get_chat_prompt", return_value="Prompt") as get_prompt:
+            result = await AIService.ask_llm("Build times?", "\n---\n".join(CHUNKS), "budget")
+
+        assert get_prompt.call_args.args[0] == [CHUNKS[0]]
+        assert result["compression"]["method"] == "budget"
+        assert result["compression"]["tokens_after"] < result["compression"]["tokens_before"]
+
+    def test_ask_rejects_unknown_compression(self):
+        response = TestClient(app).post("/ask", json={"question": "Q?", "context": "Some context", "compression": "zip"})
+        assert response.status_code == 422
+
+
+def test_llmlingua_postprocessor_compresses_each_node_on_its_own():
+    nodes = [NodeWithScore(node=TextNode(text=c, metadata={"filename": f"{i}.pdf"}), score=1.0 - i / 10) for i, c in enumerate(CHUNKS)]
+    # The middle chunk compresses to nothing, the others to their first word
+    compressed = {CHUNKS[0]: ["Jane"], CHUNKS[1]: [], CHUNKS[2]: ["The"]}
+    with patch("app.rag.postprocessors.compress_context", side_effect=lambda q, chunks, method, budget: (compressed[chunks[0]], {})) as compress:
+        result = LLMLinguaPostprocessor(target_token=20).postprocess_nodes(nodes, QueryBundle("Build times?"))
+
+    total = sum(count_tokens(c) for c in CHUNKS)
+    assert [call.args[1:] for call in compress.call_args_list] == [([c], "llmlingua", 20 * count_tokens(c) // total) for c in CHUNKS]
+    # Texts stay with their own node, and the emptied node is dropped
+    assert [(n.node.get_content(), n.node.metadata["filename"], n.score) for n in result] == [
+        ("Jane", "0.pdf", nodes[0].score),
+        ("The", "2.pdf", nodes[2].score),
+    ]
+
+
+def test_llmlingua_postprocessor_leaves_nodes_within_budget():
+    nodes = [NodeWithScore(node=TextNode(text=c), score=1.0) for c in CHUNKS]
+    with patch("app.rag.postprocessors.compress_context") as compress:
+        result = LLMLinguaPostprocessor(target_token=10000).postprocess_nodes(nodes, QueryBundle("Build times?"))
+
+    compress.assert_not_called()
+    assert result == nodes
@@ -0,0 +1,74 @@
+import pytest
+import asyncio
+from unittest.mock import MagicMock, patch
+import sys
+
+# MOCK DOCLING
+sys.modules["llama_index.readers.docling"] = MagicMock()
+sys.modules["llama_index.readers.docling"].DoclingReader = MagicMock()
+
+from app.rag.concurrency import ConcurrencyLimiter, QueueFullError
+from app.services import AIService
+
+
+@pytest.mark.asyncio
+async def test_limiter_caps_concurrency():
+    limiter = ConcurrencyLimiter("test", max_concurrent=2, max_queued=10)
+    peak = 0
+
+    async def work():
+        nonlocal peak
+        async with limiter.slot():
+            peak = max(peak, limiter.stats()["active"])
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(work() for _ in range(6)))
+
+    assert peak == 2
+    assert limiter.stats()["completed"] == 6
+
+
+@pytest.mark.asyncio
+async def test_limiter_rejects_when_queue_full():
+    limiter = ConcurrencyLimiter("test", max_concurrent=1, max_queued=1)
+    release = asyncio.Event()
+
+    async def hold():
+        async with limiter.slot():
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    waiter = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+
+    with pytest.raises(QueueFullError):
+        async with limiter.slot():
+            pass
+
+    release.set()
+    await asyncio.gather(holder, waiter)
+    assert limiter.stats()["rejected"] == 1
+
+
+@pytest.mark.asyncio
+@patch("app.services.PromptManager.get_chat_prompt", return_value="Prompt")
+@patch("app.services.RAGFactory.get_llm")
+async def test_ask_llm_does_not_block_event_loop(mock_get_llm, mock_get_prompt):
+    async def slow_acomplete(prompt):
+        await asyncio.sleep(0.05)
+        return MagicMock(text="Answer")
+
+    mock_get_llm.return_value.acomplete.side_effect = slow_acomplete
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        for _ in range(5):
+            await asyncio.sleep(0.005)
+            ticks += 1
+
+    result, _ = await asyncio.gather(AIService.ask_llm("Q?", "Some long enough context"), ticker())
+
+    assert result["answer"] == "Answer"
+    assert ticks == 5
+    mock_get_llm.return_value.complete.assert_not_called()
@@ -0,0 +1,258 @@
+import sys
+from unittest.mock import MagicMock
+
+# -- MOCKING DEPENDENCIES START --
+mock_docling = MagicMock()
+sys.modules["llama_index.readers.docling"] = mock_docling
+# -- MOCKING DEPENDENCIES END --
+
+import json
+import os
+import re
+from contextlib import contextmanager
+
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.rag.ingestion import IngestionService
+from app.rag.parsing import DoclingParserPool, collect_files
+from app.services import AIService
+
+
+class FakeDocument:
+    def __init__(self, text):
+        self.text = text
+        self.metadata = {}
+
+
+class FakeReader:
+    """
+    Stands in for DoclingReader in the (forked) parser processes.
+    """
+    def __init__(self):
+        self.doc_converter = MagicMock()
+        self.created_in = os.getpid()
+
+    def load_data(self, file_path):
+        if file_path.endswith("broken.pdf"):
+            raise ValueError("not a PDF")
+        with open(file_path) as f:
+            return [FakeDocument(f"{f.read()} (parsed in {os.getpid()} by reader of {self.created_in})")]
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    (tmp_path / "sub").mkdir()
+    for i in range(6):
+        (tmp_path / f"doc{i}.pdf").write_text(f"Document number {i}. " * 20)
+    (tmp_path / "sub" / "nested.md").write_text("Nested document. " * 20)
+    (tmp_path / "notes.xyz").write_text("ignored")
+    return tmp_path
+
+
+@pytest.fixture
+def pool():
+    # Other test modules swap their own docling mock into sys.modules
+    with patch.dict(sys.modules, {"llama_index.readers.docling": MagicMock(DoclingReader=FakeReader)}):
+        pool = DoclingParserPool(workers=2, start_method="fork")
+        yield pool
+        pool.close()
+
+
+@contextmanager
+def embedding_model(dim=4):
+    model = MagicMock()
+    model.get_text_embedding_batch.side_effect = lambda texts: [[float(len(t))] * dim for t in texts]
+
+    @contextmanager
+    def acquire(name):
+        yield model
+
+    with patch("app.rag.ingestion.RAGFactory.acquire", side_effect=acquire), \
+         patch("app.rag.ingestion.settings.embedding_cache_enabled", False), \
+         patch("app.rag.chunking.settings.chunking_strategy", "token"):
+        yield model
+
+
+class TestCollectFiles:
+    def test_expands_directories_by_extension(self, corpus):
+        files = collect_files([str(corpus)])
+
+        assert [os.path.relpath(f, corpus) for f in files] == [f"doc{i}.pdf" for i in range(6)] + [os.path.join("sub", "nested.md")]
+        assert len(collect_files([str(corpus)], recursive=False)) == 6
+        assert collect_files([str(corpus / "notes.xyz")]) == [str(corpus / "notes.xyz")]
+
+
+class TestDoclingParserPool:
+    def test_parses_in_worker_processes_with_one_reader_each(self, corpus, pool):
+        files = collect_files([str(corpus)]) + [str(corpus / "broken.pdf")]
+        results = {r.path: r for r in pool.parse(files)}
+
+        assert set(results) == set(files)
+        assert "not a PDF" in results[str(corpus / "broken.pdf")].error
+        parsed = [r for r in results.values() if not r.error]
+        pids = [re.search(r"parsed in (\d+) by reader of (\d+)", r.documents[0][0]).groups() for r in parsed]
+        # Every file was parsed outside this process, by the reader its worker built at start-up
+        assert all(parser == owner != str(os.getpid()) for parser, owner in pids)
+        assert len({parser for parser, _ in pids}) <= 2
+
+
+class TestProcessFiles:
+    def test_embeds_chunks_of_several_files_in_shared_batches(self, corpus, pool):
+        files = collect_files([str(corpus)]) + [str(corpus / "broken.pdf")]
+        with embedding_model() as model:
+            results = list(IngestionService.process_files(files, {"source": "backfill"}, parser_pool=pool, embed_batch=1000))
+
+        ok = [r for r in results if "error" not in r]
+        assert len(ok) == 7
+        assert [r["file"] for r in results if "error" in r] == [str(corpus / "broken.pdf")]
+        # All files fit in one shared embed batch
+        assert model.get_text_embedding_batch.call_count == 1
+        node = ok[0]["nodes"][0]
+        assert node.embedding is not None
+        assert node.metadata["source"] == "backfill"
+        assert node.metadata["filename"] == os.path.basename(ok[0]["file"])
+
+
+class TestIngestFilesService:
+    @pytest.mark.asyncio
+    async def test_indexes_each_file_under_a_stable_document_id(self, corpus):
+        from llama_index.core.schema import TextNode
+
+        def process_files(files, metadata, parser_pool=None):
+            for path in files:
+                yield {"file": path, "nodes": [TextNode(text=f"chunk of {path}", embedding=[1.0, 0.0])], "parse_ms": 5.0}
+            yield {"file": "missing.pdf", "error": "boom"}
+
+        with patch.object(AIService, "get_parser_pool"), \
+             patch("app.services.IngestionService.process_files", side_effect=process_files), \
+             patch("app.services.RetrievalService.add_chunks") as add_chunks:
+            events = [e async for e in AIService.ingest_files([str(corpus / "sub")], target="index")]
+
+        assert [e["type"] for e in events] == ["start", "file", "file", "done"]
+        assert events[2]["error"] == "boom"
+        document_id, chunks = add_chunks.call_args.args
+        assert document_id == events[1]["document_id"]
+        assert chunks[0]["metadata"]["document_id"] == document_id
+        assert events[-1]["ingested"] == 1 and events[-1]["failed"] == 1
+        assert events[-1]["files_per_min"] > 0
+
+        with patch.object(AIService, "get_parser_pool"), \
+             patch("app.services.IngestionService.process_files", side_effect=process_files), \
+             patch("app.services.RetrievalService.add_chunks"):
+            again = [e async for e in AIService.ingest_files([str(corpus / "sub")], target="index")]
+        assert again[1]["document_id"] == document_id
+
+    @pytest.mark.asyncio
+    async def test_postgres_chunks_have_no_document_id_and_are_keyed_by_path(self, corpus):
+        from llama_index.core.schema import TextNode
+
+        def process_files(files, metadata, parser_pool=None):
+            for path in files:
+                yield {"file": path, "nodes": [TextNode(text="chunk", embedding=[1.0, 0.0])], "parse_ms": 5.0}
+
+        store = MagicMock()
+        with patch.object(AIService, "get_parser_pool"), \
+             patch("app.services.ChunkStore.instance", return_value=store), \
+             patch("app.services.IngestionService.process_files", side_effect=process_files):
+            events = [e async for e in AIService.ingest_files([str(corpus / "sub")], target="postgres")]
+
+        path = str(corpus / "sub" / "nested.md")
+        chunks, file_path, source_file = store.copy_file_chunks.call_args.args
+        assert (file_path, source_file) == (path, "nested.md")
+        assert "document_id" not in chunks[0]["metadata"]
+        assert events[1]["document_id"] is None
+        store.copy_chunks.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_files_with_failed_pages_are_counted_as_partial(self, corpus):
+        from llama_index.core.schema import TextNode
+
+        def process_files(files, metadata, parser_pool=None):
+            yield {"file": "a.pdf", "nodes": [TextNode(text="a", embedding=[1.0])], "parse_ms": 5.0, "cached_pages": 2, "failed_pages": [3]}
+            yield {"file": "b.pdf", "nodes": [TextNode(text="b", embedding=[1.0])], "parse_ms": 5.0, "cached_pages": 0, "failed_pages": []}
+
+        with patch.object(AIService, "get_parser_pool"), \
+             patch("app.services.IngestionService.process_files", side_effect=process_files):
+            events = [e async for e in AIService.ingest_files([str(corpus / "sub")], target="none")]
+
+        assert events[1]["failed_pages"] == [3] and events[1]["cached_pages"] == 2
+        assert events[2]["failed_pages"] == []
+        assert events[-1]["ingested"] == 2 and events[-1]["partial"] == 1
+
+    @pytest.mark.asyncio
+    async def test_abandoned_stream_closes_the_generator_on_its_own_thread(self, corpus):
+        import threading
+        from llama_index.core.schema import TextNode
+
+        threads = {}
+        closed = threading.Event()
+
+        def process_files(files, metadata, parser_pool=None):
+            threads["started"] = threading.current_thread()
+            try:
+                for i in range(100):
+                    yield {"file": f"{i}.pdf", "nodes": [TextNode(text="chunk", embedding=[1.0])], "parse_ms": 1.0}
+            finally:
+                threads["closed"] = threading.current_thread()
+                closed.set()
+
+        with patch.object(AIService, "get_parser_pool"), \
+             patch("app.services.IngestionService.process_files", side_effect=process_files):
+            events = AIService.ingest_files([str(corpus / "sub")], target="none")
+            assert (await events.__anext__())["type"] == "start"
+            assert (await events.__anext__())["type"] == "file"
+            await events.aclose()
+            assert closed.wait(5)
+
+        assert threads["closed"] is threads["started"]
+        assert threads["started"] is not threading.current_thread()
+
+    @pytest.mark.asyncio
+    async def test_requests_beyond_the_limit_are_rejected(self, corpus):
+        from app.rag.concurrency import ConcurrencyLimiter, QueueFullError
+
+        with patch.object(AIService, "_file_ingest_limiter", ConcurrencyLimiter("file_ingest", 1)):
+            async with AIService.get_file_ingest_limiter().slot():
+                with pytest.raises(QueueFullError):
+                    await AIService.ingest_files([str(corpus / "sub")], target="none").__anext__()
+
+
+class TestFileIngestEndpoint:
+    def test_streams_file_events_and_summary(self, corpus):
+        client = TestClient(app)
+
+        async def fake_ingest(paths, metadata, target, recursive, extract_metadata):
+            assert paths == [str(corpus.resolve() / "sub")]
+            yield {"type": "file", "file": paths[0], "chunks": 3}
+            yield {"type": "done", "files": 1, "files_per_min": 60.0}
+
+        with patch("app.main.settings.file_ingest_root", str(corpus)), \
+             patch.object(AIService, "ingest_files", side_effect=fake_ingest):
+            response = client.post("/ingest/files", json={"paths": ["sub"], "target": "none"})
+
+        assert response.status_code == 200
+        events = [json.loads(line) for line in response.text.splitlines()]
+        assert [e["type"] for e in events] == ["file", "done"]
+
+    def test_rejects_paths_outside_the_root(self, corpus):
+        client = TestClient(app)
+        with patch("app.main.settings.file_ingest_root", str(corpus / "sub")):
+            response = client.post("/ingest/files", json={"paths": ["../doc0.pdf"]})
+
+        assert response.status_code == 403
+
+    def test_busy_file_ingest_is_429(self, corpus):
+        from app.rag.concurrency import QueueFullError
+
+        async def fake_ingest(paths, metadata, target, recursive, extract_metadata):
+            raise QueueFullError("file_ingest: 0 requests already queued")
+            yield
+
+        with patch("app.main.settings.file_ingest_root", str(corpus)), \
+             patch.object(AIService, "ingest_files", side_effect=fake_ingest):
+            response = TestClient(app).post("/ingest/files", json={"paths": ["sub"]})
+
+        assert response.status_code == 429
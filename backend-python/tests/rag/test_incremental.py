@@ -0,0 +1,191 @@
+import sys
+from unittest.mock import MagicMock
+
+# -- MOCKING DEPENDENCIES START --
+mock_docling = MagicMock()
+sys.modules["llama_index.readers.docling"] = mock_docling
+# -- MOCKING DEPENDENCIES END --
+
+import pytest
+from unittest.mock import patch, AsyncMock
+from fastapi.testclient import TestClient
+from llama_index.core.schema import TextNode
+
+from app.main import app
+from app.rag.index import VectorIndex
+from app.rag.manifest import ChunkManifest, chunk_hash, chunk_ids, diff
+from app.rag.retrieval import RetrievalService
+from app.services import AIService
+
+
+def _node(text, embedding=None):
+    return TextNode(text=text, embedding=embedding, metadata={"chunk_hash": chunk_hash(text)})
+
+
+class TestChunkIds:
+    def test_hash_ignores_whitespace_differences(self):
+        assert chunk_hash("Hello   world\n") == chunk_hash("Hello world")
+        assert chunk_hash("Hello world") != chunk_hash("Hello world!")
+
+    def test_ids_are_content_derived_and_count_repeats(self):
+        h1, h2 = chunk_hash("a"), chunk_hash("b")
+        ids = chunk_ids("doc", [h1, h2, h1])
+
+        assert ids == [f"doc#{h1[:16]}-0", f"doc#{h2[:16]}-0", f"doc#{h1[:16]}-1"]
+        # Inserting a chunk in front doesn't rename the others
+        assert chunk_ids("doc", [chunk_hash("new"), h1, h2])[1:] == ids[:2]
+
+    def test_diff(self):
+        previous = [("d#a-0", "a"), ("d#b-0", "b")]
+        current = [("d#a-0", "a"), ("d#c-0", "c")]
+
+        assert diff(previous, current) == {"added": ["d#c-0"], "removed": ["d#b-0"], "kept": ["d#a-0"]}
+        assert diff([], current)["added"] == ["d#a-0", "d#c-0"]
+
+
+class TestChunkManifest:
+    def test_round_trip_and_replace(self, tmp_path):
+        manifest = ChunkManifest(str(tmp_path / "manifest.sqlite3"))
+        manifest.replace("doc", [("doc#a-0", "a"), ("doc#b-0", "b")])
+        manifest.replace("other", [("other#a-0", "a")])
+
+        assert manifest.get("doc") == [("doc#a-0", "a"), ("doc#b-0", "b")]
+        manifest.replace("doc", [("doc#c-0", "c")])
+        assert manifest.get("doc") == [("doc#c-0", "c")]
+        manifest.delete("doc")
+        assert manifest.get("doc") == []
+        assert manifest.get("other") == [("other#a-0", "a")]
+
+
+class TestIncrementalIngest:
+    @pytest.fixture
+    def manifest(self, tmp_path):
+        manifest = ChunkManifest(str(tmp_path / "manifest.sqlite3"))
+        with patch.object(ChunkManifest, "instance", return_value=manifest):
+            yield manifest
+
+    @pytest.mark.asyncio
+    async def test_only_changed_chunks_are_embedded_and_returned(self, manifest):
+        hashes = [chunk_hash("intro"), chunk_hash("old section")]
+        manifest.replace("cv.pdf", list(zip(chunk_ids("cv.pdf", hashes), hashes)))
+        seen_known = {}
+
+        def process(text, metadata, known_hashes, timings):
+            seen_known["hashes"] = set(known_hashes)
+            return [_node("intro"), _node("new section", [0.5, 0.5])]
+
+        with patch("app.services.IngestionService.process_text_incremental", side_effect=process), \
+             patch.object(AIService, "extract_metadata", AsyncMock(return_value={"title": "CV"})), \
+             patch("app.services.settings.vector_index_enabled", False):
+            result = await AIService.ingest_incremental("...", {"filename": "cv.pdf"}, {})
+
+        assert seen_known["hashes"] == set(hashes)
+        assert result["document_id"] == "cv.pdf"
+        assert [c["content"] for c in result["added"]] == ["new section"]
+        assert result["added"][0]["embedding"] == [0.5, 0.5]
+        assert result["added"][0]["metadata"]["title"] == "CV"
+        assert result["removed"] == [chunk_ids("cv.pdf", hashes)[1]]
+        assert result["kept"] == [chunk_ids("cv.pdf", hashes)[0]]
+        assert [h for _, h in manifest.get("cv.pdf")] == [chunk_hash("intro"), chunk_hash("new section")]
+
+    @pytest.mark.asyncio
+    async def test_store_diffs_against_and_updates_document_chunks(self, manifest):
+        doc = "3f2b8c9e-1d4a-4b6e-9c1f-2a3b4c5d6e7f"
+        hashes = [chunk_hash("intro"), chunk_hash("old section")]
+        store = MagicMock()
+        store.chunk_hashes.return_value = list(zip(chunk_ids(doc, hashes), hashes))
+        store.apply_delta.return_value = ([42], 1)
+
+        def process(text, metadata, known_hashes, timings):
+            return [_node("intro"), _node("new section", [0.5, 0.5])]
+
+        with patch("app.services.ChunkStore.instance", return_value=store), \
+             patch("app.services.IngestionService.process_text_incremental", side_effect=process), \
+             patch.object(AIService, "extract_metadata", AsyncMock(return_value={})), \
+             patch("app.services.settings.vector_index_enabled", False):
+            result = await AIService.ingest_incremental("...", {"document_id": doc, "filename": "cv.pdf"}, {}, store=True)
+
+        # The stored chunks are the baseline, not the manifest
+        store.chunk_hashes.assert_called_once_with(doc)
+        document_id, added, kept, source_file = store.apply_delta.call_args.args
+        assert (document_id, kept, source_file) == (doc, [chunk_ids(doc, hashes)[0]], "cv.pdf")
+        assert added[0]["metadata"]["chunk_id"] == added[0]["id"]
+        assert added[0]["metadata"]["chunk_hash"] == chunk_hash("new section")
+        assert (result["stored_ids"], result["deleted_rows"]) == ([42], 1)
+        assert [h for _, h in manifest.get(doc)] == [chunk_hash("intro"), chunk_hash("new section")]
+
+    @pytest.mark.asyncio
+    async def test_requires_document_identity(self, manifest):
+        with pytest.raises(ValueError):
+            await AIService.ingest_incremental("text", {})
+
+    def test_apply_delta_updates_index(self):
+        index = VectorIndex(dim=2)
+        index.add(["doc#0", "doc#a-0"], [[1.0, 0.0], [0.0, 1.0]], "doc")
+        with patch.object(RetrievalService, "get_index", return_value=index):
+            RetrievalService.apply_delta("doc", [{"id": "doc#b-0", "content": "b", "embedding": [1.0, 1.0]}], ["doc#a-0"])
+
+        assert sorted(index.chunk_ids("doc")) == ["doc#a-0", "doc#b-0"]
+        assert index.search([1.0, 1.0], top_k=1)[0]["content"] == "b"
+
+
+class TestIncrementalAfterIngest:
+    def test_chunks_kept_by_an_incremental_reingest_stay_searchable(self, tmp_path):
+        client = TestClient(app)
+        manifest = ChunkManifest(str(tmp_path / "manifest.sqlite3"))
+        index = VectorIndex()
+        chunks = [
+            {"content": "python developer", "embedding": [1.0, 0.0, 0.0], "metadata": {}},
+            {"content": "old hobby", "embedding": [0.0, 1.0, 0.0], "metadata": {}},
+        ]
+
+        def process(text, metadata, known_hashes, timings):
+            assert known_hashes == {chunk_hash(c["content"]) for c in chunks}
+            return [_node("python developer"), _node("new hobby", [0.0, 0.0, 1.0])]
+
+        with patch.object(ChunkManifest, "_instance", manifest), \
+             patch.object(RetrievalService, "_index", index), \
+             patch("app.services.settings.vector_index_enabled", True), \
+             patch("app.main.settings.vector_index_enabled", True), \
+             patch.object(AIService, "extract_metadata", AsyncMock(return_value={})), \
+             patch.object(AIService, "process_document", return_value=chunks), \
+             patch("app.services.IngestionService.process_text_incremental", side_effect=process):
+            assert client.post("/ingest", json={"text": "v1", "metadata": {"filename": "cv.pdf"}}).status_code == 200
+            delta = client.post("/ingest/incremental", json={"text": "v2", "metadata": {"filename": "cv.pdf"}}).json()
+
+            with patch.object(AIService, "embed_query", AsyncMock(return_value=[1.0, 0.0, 0.0])):
+                hits = client.post("/search", json={"query": "python", "top_k": 1}).json()["results"]
+
+        assert len(delta["kept"]) == 1 and len(delta["added"]) == 1 and len(delta["removed"]) == 1
+        assert [h["id"] for h in hits] == delta["kept"]
+        assert hits[0]["content"] == "python developer"
+        assert sorted(index.chunk_ids("cv.pdf")) == sorted(delta["kept"] + [c["id"] for c in delta["added"]])
+
+
+class TestIncrementalEndpoint:
+    def test_returns_delta(self):
+        client = TestClient(app)
+        delta = {
+            "document_id": "cv.pdf",
+            "document_metadata": {"filename": "cv.pdf"},
+            "added": [{"id": "cv.pdf#ab-0", "content": "new", "embedding": [0.1], "metadata": {}}],
+            "removed": ["cv.pdf#cd-0"],
+            "kept": ["cv.pdf#ef-0"],
+        }
+        with patch.object(AIService, "ingest_incremental", AsyncMock(return_value=delta)):
+            response = client.post("/ingest/incremental", json={"text": "x", "metadata": {"filename": "cv.pdf"}})
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["added"][0]["id"] == "cv.pdf#ab-0"
+        assert body["removed"] == ["cv.pdf#cd-0"]
+
+    def test_store_requires_uuid_document_id(self):
+        client = TestClient(app)
+        response = client.post("/ingest/incremental", json={"text": "x", "metadata": {"filename": "cv.pdf"}, "store": True})
+        assert response.status_code == 422
+
+    def test_missing_document_identity_is_422(self):
+        client = TestClient(app)
+        response = client.post("/ingest/incremental", json={"text": "x", "metadata": {}})
+        assert response.status_code == 422
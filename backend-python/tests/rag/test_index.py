@@ -0,0 +1,163 @@
+import pytest
+import numpy as np
+from unittest.mock import MagicMock, patch, AsyncMock
+import sys
+
+# MOCK DOCLING
+sys.modules["llama_index.readers.docling"] = MagicMock()
+sys.modules["llama_index.readers.docling"].DoclingReader = MagicMock()
+
+from fastapi.testclient import TestClient
+
+from app.rag.index import VectorIndex
+from app.rag.manifest import ChunkManifest, chunk_hash, chunk_ids
+from app.rag.retrieval import RetrievalService
+from app.services import AIService
+from app.config import settings
+
+
+def _unit_vectors(n, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_exact_search_returns_best_matches_first():
+    index = VectorIndex()
+    index.add(["a", "b", "c"], [[1, 0], [0.8, 0.6], [0, 1]], "doc", [{"content": "A"}, {"content": "B"}, {"content": "C"}])
+
+    hits = index.search([1, 0.1], top_k=2)
+
+    assert [h["id"] for h in hits] == ["a", "b"]
+    assert hits[0]["content"] == "A"
+    assert hits[0]["document_id"] == "doc"
+    assert hits[0]["score"] == pytest.approx(1 / np.sqrt(1.01), rel=1e-5)
+
+
+def test_remove_and_replace_documents():
+    index = VectorIndex()
+    index.add(["d1#0", "d1#1"], [[1, 0], [0, 1]], "d1")
+    index.add(["d2#0"], [[1, 0.1]], "d2")
+
+    assert index.remove_document("d1") == 2
+    assert [h["id"] for h in index.search([1, 0], top_k=5)] == ["d2#0"]
+
+    # Re-adding an id replaces the old vector
+    index.add(["d2#0"], [[0, 1]], "d2")
+    assert len(index) == 1
+    assert index.search([0, 1], top_k=1)[0]["score"] == pytest.approx(1.0)
+
+
+def test_document_filter():
+    index = VectorIndex()
+    index.add(["a"], [[1, 0]], "d1")
+    index.add(["b"], [[0.9, 0.1]], "d2")
+
+    assert [h["id"] for h in index.search([1, 0], top_k=5, document_ids=["d2"])] == ["b"]
+
+
+def test_ivf_recall_against_exact_search():
+    vectors = _unit_vectors(4000)
+    index = VectorIndex(exact_threshold=1000, nprobe=16)
+    index.add([str(i) for i in range(len(vectors))], vectors, "doc")
+    assert index.stats()["mode"] == "ivf"
+
+    queries = _unit_vectors(50, seed=1)
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :10]
+    recall = np.mean([
+        len({int(h["id"]) for h in index.search(q, top_k=10)} & set(exact[i])) / 10
+        for i, q in enumerate(queries)
+    ])
+    assert recall > 0.8
+
+
+def test_snapshot_round_trip_is_memory_mapped(tmp_path):
+    vectors = _unit_vectors(50)
+    index = VectorIndex(model_name="embed-model")
+    index.add([f"doc#{i}" for i in range(50)], vectors, "doc", [{"content": str(i)} for i in range(50)])
+    index.remove_ids(["doc#0"])
+    index.save(str(tmp_path))
+
+    loaded = VectorIndex.load(str(tmp_path))
+
+    assert len(loaded) == 49
+    assert loaded.stats()["memory_mapped"]
+    assert loaded.model_name == "embed-model"
+    assert loaded.search(vectors[7], top_k=1)[0]["id"] == "doc#7"
+    # Adding after load moves off the read-only map
+    loaded.add(["new#0"], vectors[:1], "new")
+    assert loaded.search(vectors[0], top_k=1)[0]["id"] == "new#0"
+
+
+@pytest.mark.asyncio
+async def test_ingest_document_indexes_chunks_when_enabled(tmp_path):
+    chunks = [{"content": "alpha", "embedding": [1.0, 0.0], "metadata": {}}]
+    manifest = ChunkManifest(str(tmp_path / "manifest.sqlite3"))
+    with patch.object(settings, "vector_index_enabled", True), \
+         patch.object(RetrievalService, "_index", VectorIndex()), \
+         patch.object(ChunkManifest, "_instance", manifest), \
+         patch.object(AIService, "extract_metadata", AsyncMock(return_value={})), \
+         patch.object(AIService, "process_document", return_value=chunks):
+        timings = {}
+        await AIService.ingest_document("text", {"filename": "cv.pdf"}, timings)
+        hits = RetrievalService.search([1.0, 0.0])
+
+    # Content-derived ids, the same as document_chunks metadata chunk_id
+    chunk_id = chunk_ids("cv.pdf", [chunk_hash("alpha")])[0]
+    assert [h["id"] for h in hits] == [chunk_id]
+    assert hits[0]["metadata"]["chunk_id"] == chunk_id
+    assert manifest.get("cv.pdf") == [(chunk_id, chunk_hash("alpha"))]
+    assert "index_ms" in timings
+
+
+def test_streamed_batches_continue_the_ids_of_one_shot_ingest():
+    index = VectorIndex()
+    texts = ["a", "b", "a", "a", "c"]
+    chunks = [{"content": t, "embedding": [1.0, float(i)], "metadata": {}} for i, t in enumerate(texts)]
+    with patch.object(RetrievalService, "_index", index):
+        streamed = RetrievalService.add_chunks("doc", chunks[:3]) + RetrievalService.add_chunks("doc", chunks[3:], 3)
+        again = RetrievalService.add_chunks("doc", chunks)
+
+    assert streamed == again == chunk_ids("doc", [chunk_hash(t) for t in texts])
+
+
+@pytest.mark.asyncio
+async def test_reingesting_unnamed_text_replaces_its_chunks(tmp_path):
+    chunks = [{"content": "alpha", "embedding": [1.0, 0.0], "metadata": {}}]
+    index = VectorIndex()
+    with patch.object(settings, "vector_index_enabled", True), \
+         patch.object(ChunkManifest, "_instance", ChunkManifest(str(tmp_path / "manifest.sqlite3"))), \
+         patch.object(RetrievalService, "_index", index), \
+         patch.object(AIService, "extract_metadata", AsyncMock(return_value={})), \
+         patch.object(AIService, "process_document", return_value=chunks):
+        for _ in range(2):
+            await AIService.ingest_document("same text", {})
+        await AIService.ingest_document("other text", {})
+
+    # Ids come from the content hash: the repeat replaced, the other text added
+    assert len(index) == 2
+    assert all(document_id.startswith("sha256-") for document_id in index.document_ids())
+
+
+def test_search_endpoint():
+    from app.main import app
+
+    index = VectorIndex()
+    index.add(["cv.pdf#0", "cv.pdf#1"], [[1.0, 0.0], [0.0, 1.0]], "cv.pdf", [{"content": "python"}, {"content": "java"}])
+    with patch.object(settings, "vector_index_enabled", True), \
+         patch.object(RetrievalService, "_index", index), \
+         patch.object(AIService, "embed_query", AsyncMock(return_value=[0.0, 1.0])):
+        response = TestClient(app).post("/search", json={"query": "java developer", "top_k": 1})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [(r["id"], r["content"]) for r in body["results"]] == [("cv.pdf#1", "java")]
+    assert set(body["timings"]) == {"embed_ms", "search_ms"}
+
+
+def test_search_endpoint_requires_index():
+    from app.main import app
+
+    with patch.object(settings, "vector_index_enabled", False):
+        response = TestClient(app).post("/search", json={"query": "anything"})
+
+    assert response.status_code == 503
@@ -0,0 +1,36 @@
+import pytest
+import asyncio
+import time
+from unittest.mock import MagicMock, patch
+import sys
+
+# MOCK DOCLING
+sys.modules["llama_index.readers.docling"] = MagicMock()
+sys.modules["llama_index.readers.docling"].DoclingReader = MagicMock()
+
+from app.services import AIService
+
+
+@pytest.mark.asyncio
+async def test_ingest_runs_metadata_and_embedding_concurrently():
+    async def slow_extract(text):
+        await asyncio.sleep(0.2)
+        return {"document_type": "Invoice", "filename": "extracted.pdf"}
+
+    def slow_process(text, metadata, timings, progress=None):
+        time.sleep(0.2)
+        return [{"content": "chunk", "embedding": [0.1], "metadata": dict(metadata)}]
+
+    with patch.object(AIService, "extract_metadata", side_effect=slow_extract), \
+         patch.object(AIService, "process_document", side_effect=slow_process):
+        timings = {}
+        start = time.perf_counter()
+        doc_meta, chunks = await AIService.ingest_document("text", {"filename": "upload.pdf"}, timings)
+        elapsed = time.perf_counter() - start
+
+    # Roughly max(LLM, embed) rather than their sum
+    assert elapsed < 0.35
+    # Request-provided values win over extracted ones
+    assert doc_meta == {"document_type": "Invoice", "filename": "upload.pdf"}
+    assert chunks[0]["metadata"] == doc_meta
+    assert "metadata_ms" in timings and "total_ms" in timings
@@ -6,31 +6,37 @@ import sys
 sys.modules["llama_index.readers.docling"] = MagicMock()
 sys.modules["llama_index.readers.docling"].DoclingReader = MagicMock()
 
-# MOCK for tests
-from app.rag.factory import RAGFactory
+from fastapi.testclient import TestClient
+from llama_index.core.schema import TextNode
+
+from app.main import app
 from app.rag.ingestion import IngestionService
-from llama_index.core.schema import Document
 
+@patch("app.rag.ingestion.settings.embedding_cache_enabled", False)
 @patch("app.rag.ingestion.RAGFactory")
-@patch("app.rag.ingestion.IngestionPipeline")
-@patch("app.rag.ingestion.SemanticSplitterNodeParser")
-@patch("app.rag.factory.Settings") 
-def test_process_text(MockSettings, MockSplitter, MockPipeline, MockFactory):
+@patch("app.rag.chunking.SemanticSplitterNodeParser")
+def test_process_text(MockSplitter, MockFactory):
     # Setup
-    mock_pipeline_instance = MockPipeline.return_value
-    mock_pipeline_instance.run.return_value = [MagicMock(), MagicMock()] # Return 2 nodes
-    
+    MockSplitter.return_value.get_nodes_from_documents.side_effect = lambda docs: [
+        TextNode(text="first", metadata=dict(docs[0].metadata)), TextNode(text="second", metadata=dict(docs[0].metadata))
+    ]
+    embed_model = MockFactory.acquire.return_value.__enter__.return_value
+    embed_model.get_text_embedding_batch.return_value = [[1.0, 0.0], [0.0, 1.0]]
+
     # Act
-    nodes = IngestionService.process_text("Some text", {"key": "value"})
-    
+    nodes = IngestionService.process_text("Some text", {"key": "value", "chunking_strategy": "semantic"}, embed_mode="batch")
+
     # Assert
-    MockFactory.get_vector_store.assert_called()
-    MockPipeline.assert_called()
+    MockFactory.acquire.assert_called_once_with("embedding")
     assert len(nodes) == 2
-    
-    # Verify pipeline was run with correct doc
-    args, kwargs = mock_pipeline_instance.run.call_args
-    assert "documents" in kwargs
-    assert len(kwargs["documents"]) == 1
-    assert kwargs["documents"][0].text == "Some text"
-    assert kwargs["documents"][0].metadata["key"] == "value"
+
+    # Verify the splitter saw the text and its metadata
+    docs = MockSplitter.return_value.get_nodes_from_documents.call_args.args[0]
+    assert len(docs) == 1
+    assert docs[0].text == "Some text"
+    assert nodes[0].metadata["key"] == "value"
+    assert nodes[1].embedding == pytest.approx([0.0, 1.0])
+
+def test_unknown_chunking_strategy_in_metadata_is_422():
+    response = TestClient(app).post("/ingest", json={"text": "Some text", "metadata": {"chunking_strategy": "zip"}})
+    assert response.status_code == 422
@@ -7,6 +7,7 @@ sys.modules["llama_index.readers.docling"] = MagicMock()
 sys.modules["llama_index.readers.docling"].DoclingReader = MagicMock()
 
 from app.rag.factory import RAGFactory
+from llama_index.core.schema import TextNode
 from app.rag.ingestion import IngestionService
 
 @pytest.fixture
@@ -15,12 +16,13 @@ def mock_settings():
         mock.ollama_base_url = "http://mock-ollama:11434"
         mock.ollama_model = "llama3-mock"
         mock.embedding_model_name = "mock-embed"
+        mock.embed_workers = 0
         yield mock
 
 @patch("app.rag.factory.Settings")
 def test_factory_get_llm(MockSettings, mock_settings):
     # Reset singleton
-    RAGFactory._llm = None
+    RAGFactory.unload("llm")
     with patch("app.rag.factory.Ollama") as MockOllama:
         llm = RAGFactory.get_llm()
         assert llm is not None
@@ -31,32 +33,35 @@ def test_factory_get_llm(MockSettings, mock_settings):
 @patch("app.rag.factory.Settings")
 def test_factory_get_embedding(MockSettings, mock_settings):
     # Reset singleton
-    RAGFactory._embed_model = None
-    with patch("app.rag.factory.HuggingFaceEmbedding") as MockEmbed:
+    RAGFactory.unload("embedding")
+    with patch("app.rag.backends.HuggingFaceEmbedding") as MockEmbed:
         embed = RAGFactory.get_embedding_model()
         assert embed is not None
         MockEmbed.assert_called_once()
         # Ensure Settings.embed_model was set
         assert MockSettings.embed_model == embed
 
+@patch("app.rag.ingestion.settings.embedding_cache_enabled", False)
 @patch("app.rag.ingestion.DoclingReader")
 @patch("app.rag.ingestion.RAGFactory")
-@patch("app.rag.ingestion.IngestionPipeline")
-@patch("app.rag.ingestion.SemanticSplitterNodeParser")
-def test_ingestion_process_file(MockSplitter, MockPipeline, MockFactory, MockReader):
+@patch("app.rag.chunking.SemanticSplitterNodeParser")
+def test_ingestion_process_file(MockSplitter, MockFactory, MockReader):
     # Setup Mocks
-    mock_reader_instance = MockReader.return_value
-    mock_doc = MagicMock()
-    mock_doc.metadata = {}
-    mock_reader_instance.load_data.return_value = [mock_doc]
-    
-    mock_pipeline_instance = MockPipeline.return_value
-    mock_pipeline_instance.run.return_value = [MagicMock(), MagicMock()] # Returns 2 nodes
+    IngestionService._reader = None
+    mock_doc = MagicMock(text="Parsed text", metadata={})
+    MockReader.return_value.load_data.return_value = [mock_doc]
+    MockSplitter.return_value.get_nodes_from_documents.side_effect = lambda docs: [
+        TextNode(text="first", metadata=dict(docs[0].metadata)), TextNode(text="second", metadata=dict(docs[0].metadata))
+    ]
+    embed_model = MockFactory.acquire.return_value.__enter__.return_value
+    embed_model.get_text_embedding_batch.return_value = [[1.0, 0.0], [0.0, 1.0]]
 
     # Execution
     nodes = IngestionService.process_file("dummy.pdf", {"filename": "dummy.pdf"})
 
     # Assertions
-    MockReader.assert_called()
+    MockReader.assert_called_once()
     assert len(nodes) == 2
-    assert mock_doc.metadata["filename"] == "dummy.pdf"
+    assert nodes[0].metadata["filename"] == "dummy.pdf"
+    assert nodes[1].embedding == pytest.approx([0.0, 1.0])
+    IngestionService._reader = None
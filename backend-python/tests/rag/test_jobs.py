@@ -0,0 +1,140 @@
+import pytest
+import asyncio
+import os
+import sqlite3
+import time
+from unittest.mock import MagicMock
+import sys
+
+# MOCK DOCLING
+sys.modules["llama_index.readers.docling"] = MagicMock()
+sys.modules["llama_index.readers.docling"].DoclingReader = MagicMock()
+
+from app.rag.concurrency import QueueFullError
+from app.rag.jobs import IngestJobQueue, IngestJobStore, process_tag
+
+
+async def wait_for_status(queue, job_id, status, timeout=2.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        job = await queue.get(job_id)
+        if job["status"] == status:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Job {job_id} never reached {status}: {await queue.get(job_id)}")
+
+
+@pytest.mark.asyncio
+async def test_job_runs_and_reports_result(tmp_path):
+    async def ingest(text, metadata, timings, progress):
+        progress("embedding", 1, 2)
+        timings["total_ms"] = 1.0
+        return {"type": "Report", **metadata}, [{"content": text, "embedding": [0.1], "metadata": {}}]
+
+    queue = IngestJobQueue(ingest, IngestJobStore(str(tmp_path / "jobs.sqlite3")), workers=1)
+    try:
+        job_id = await queue.submit("hello", {"filename": "a.txt"})
+        job = await wait_for_status(queue, job_id, "succeeded")
+    finally:
+        await queue.stop()
+
+    assert job["stage"] == "done"
+    assert job["chunks_done"] == job["chunks_total"] == 1
+    assert job["result"]["document_metadata"] == {"type": "Report", "filename": "a.txt"}
+    assert job["result"]["timings"] == {"total_ms": 1.0}
+
+
+@pytest.mark.asyncio
+async def test_failed_job_records_error(tmp_path):
+    async def ingest(text, metadata, timings, progress):
+        raise RuntimeError("embedder exploded")
+
+    queue = IngestJobQueue(ingest, IngestJobStore(str(tmp_path / "jobs.sqlite3")), workers=1)
+    try:
+        job = await wait_for_status(queue, await queue.submit("hello"), "failed")
+    finally:
+        await queue.stop()
+
+    assert "embedder exploded" in job["error"]
+
+
+@pytest.mark.asyncio
+async def test_priority_order_and_backpressure(tmp_path):
+    started = []
+    release = asyncio.Event()
+
+    async def ingest(text, metadata, timings, progress):
+        started.append(text)
+        await release.wait()
+        return {}, []
+
+    queue = IngestJobQueue(ingest, IngestJobStore(str(tmp_path / "jobs.sqlite3")), workers=1, max_queued=2)
+    try:
+        first = await queue.submit("blocker")
+        await asyncio.sleep(0.01)  # worker picks up the blocker
+        low = await queue.submit("low", priority=0)
+        high = await queue.submit("high", priority=5)
+        with pytest.raises(QueueFullError):
+            await queue.submit("overflow")
+
+        release.set()
+        for job_id in (first, low, high):
+            await wait_for_status(queue, job_id, "succeeded")
+    finally:
+        await queue.stop()
+
+    assert started == ["blocker", "high", "low"]
+
+
+def test_unfinished_jobs_fail_after_restart(tmp_path):
+    store = IngestJobStore(str(tmp_path / "jobs.sqlite3"))
+    # Owned by a process of an earlier boot
+    store.owner = "previous-boot:1234:5678"
+    store.create("leftover")
+
+    async def ingest(*args):
+        return {}, []
+
+    IngestJobQueue(ingest, IngestJobStore(store.path))
+
+    job = store.get("leftover")
+    assert job["status"] == "failed"
+    assert "restart" in job["error"]
+
+
+def test_starting_worker_leaves_jobs_of_live_workers_alone(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    with sqlite3.connect(path) as conn:
+        # A store from before jobs had owners
+        conn.execute("CREATE TABLE ingest_jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, stage TEXT NOT NULL, "
+                     "priority INTEGER NOT NULL DEFAULT 0, chunks_done INTEGER NOT NULL DEFAULT 0, "
+                     "chunks_total INTEGER NOT NULL DEFAULT 0, error TEXT, result TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)")
+        conn.execute("INSERT INTO ingest_jobs (id, status, stage, created_at, updated_at) VALUES ('legacy', 'queued', 'queued', 0, 0)")
+    conn.close()
+    worker = IngestJobStore(path)
+    assert worker.owner == process_tag(os.getpid())
+    worker.create("running-elsewhere")
+    worker.update_progress("running-elsewhere", "embedding")
+
+    async def ingest(*args):
+        return {}, []
+
+    # A second uvicorn worker starting on the same store
+    IngestJobQueue(ingest, IngestJobStore(path))
+
+    assert worker.get("running-elsewhere")["status"] == "running"
+    assert worker.get("legacy")["status"] == "failed"
+
+
+def test_finished_jobs_expire(tmp_path):
+    store = IngestJobStore(str(tmp_path / "jobs.sqlite3"))
+    store.create("old")
+    store.complete("old", {"chunks": []})
+    store.create("queued")
+    time.sleep(0.02)
+
+    assert store.purge_finished(older_than=0.01) == 1
+    assert store.get("old") is None
+    # Unfinished jobs are never purged
+    assert store.get("queued")["status"] == "queued"
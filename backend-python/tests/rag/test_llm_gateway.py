@@ -0,0 +1,145 @@
+import sys
+from unittest.mock import MagicMock
+
+# -- MOCKING DEPENDENCIES START --
+mock_docling = MagicMock()
+sys.modules["llama_index.readers.docling"] = mock_docling
+# -- MOCKING DEPENDENCIES END --
+
+import asyncio
+import os
+import time
+
+import pytest
+from unittest.mock import patch
+
+from app.config import settings
+from app.rag.concurrency import QueueFullError
+from app.rag.factory import RAGFactory
+from app.rag.gateway import LLMGateway
+from app.services import AIService
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "scripts"))
+from stub_ollama import StubOllama, parse_keep_alive
+
+
+@pytest.fixture
+def stub():
+    with StubOllama(delay=0.2, load_delay=0.3) as stub:
+        yield stub
+
+
+@pytest.fixture
+def gateway(stub):
+    gateway = LLMGateway()
+    with patch.object(settings, "ollama_base_url", stub.url), \
+         patch.object(settings, "ollama_keep_alive", "10m"), \
+         patch("app.rag.factory.Settings"):
+        llm = RAGFactory._build_llm("stub-model")
+        with patch.object(RAGFactory, "get_llm", return_value=llm), \
+             patch.object(LLMGateway, "_instance", gateway):
+            yield gateway
+
+
+def chat_requests(stub):
+    return [r for r in stub.requests if r["path"] == "/api/chat"]
+
+
+class TestLLMGateway:
+    @pytest.mark.asyncio
+    async def test_reuses_one_keep_alive_connection(self, stub, gateway):
+        for i in range(4):
+            assert (await gateway.complete(f"question {i}")).startswith("Echo: question")
+
+        assert len(chat_requests(stub)) == 4
+        assert stub.connections == 1
+        # keep_alive is sent with every request, so the model is loaded once and stays resident
+        assert {r["keep_alive"] for r in chat_requests(stub)} == {"10m"}
+        assert stub.loads == 1
+
+    @pytest.mark.asyncio
+    async def test_identical_prompts_in_flight_share_one_generation(self, stub, gateway):
+        answers = await asyncio.gather(*[gateway.complete("same prompt") for _ in range(5)], gateway.complete("other prompt"))
+
+        assert len(set(answers[:5])) == 1
+        assert len(chat_requests(stub)) == 2
+        assert gateway.stats()["coalesced"] == 4
+        assert gateway.stats()["in_flight"] == 0
+
+        # Coalescing only covers calls in flight at the same time
+        await gateway.complete("same prompt")
+        assert len(chat_requests(stub)) == 3
+
+    @pytest.mark.asyncio
+    async def test_waiter_timing_out_does_not_cancel_the_others(self, stub, gateway):
+        patient = asyncio.ensure_future(gateway.complete("shared"))
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(gateway.complete("shared"), timeout=0.05)
+
+        assert (await patient).startswith("Echo: shared")
+        assert len(chat_requests(stub)) == 1
+
+    @pytest.mark.asyncio
+    async def test_prompt_after_an_abandoned_generation_starts_a_new_one(self, stub, gateway):
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(gateway.complete("abandoned"), timeout=0.05)
+
+        # The cancelled task is no longer joinable, even before it has finished cancelling
+        assert gateway.stats()["in_flight"] == 0
+        assert (await gateway.complete("abandoned")).startswith("Echo: abandoned")
+
+    @pytest.mark.asyncio
+    async def test_timeout_excludes_the_wait_for_a_slot(self, stub, gateway):
+        # Loads the model first, so the generations below take one delay each
+        await gateway.complete("warm up")
+        with patch.object(settings, "llm_endpoint_concurrency", {"metadata": 1}):
+            # Each waits up to 2 * delay in the queue but generates in about one delay
+            answers = await asyncio.gather(*[gateway.complete(f"extract {i}", "metadata", timeout=stub.delay * 1.5) for i in range(3)])
+            assert all(a.startswith("Echo: extract") for a in answers)
+
+            with pytest.raises(asyncio.TimeoutError):
+                await gateway.complete("too slow", "metadata", timeout=stub.delay / 4)
+
+    @pytest.mark.asyncio
+    async def test_endpoints_have_separate_limits(self, stub, gateway):
+        with patch.object(settings, "llm_endpoint_concurrency", {"metadata": 1, "chat": 3}):
+            start = time.perf_counter()
+            await asyncio.gather(*[gateway.complete(f"extract {i}", "metadata") for i in range(3)],
+                                 *[gateway.complete(f"ask {i}", "chat") for i in range(3)])
+
+        stats = gateway.stats()["endpoints"]
+        assert stats["metadata"]["max_concurrent"] == 1 and stats["chat"]["max_concurrent"] == 3
+        assert stats["metadata"]["completed"] == 3
+        # At most 1 metadata + 3 chat generations at once
+        assert stub.max_active <= 4
+        # Metadata calls ran one after the other
+        assert time.perf_counter() - start >= 3 * stub.delay
+
+    @pytest.mark.asyncio
+    async def test_full_queue_rejects_every_coalesced_waiter(self, stub, gateway):
+        with patch.object(settings, "llm_endpoint_concurrency", {"chat": 1}), \
+             patch.object(settings, "llm_max_queued_generations", 0):
+            first = asyncio.ensure_future(gateway.complete("first"))
+            await asyncio.sleep(0.05)
+            results = await asyncio.gather(gateway.complete("second"), gateway.complete("second"), return_exceptions=True)
+
+        assert all(isinstance(r, QueueFullError) for r in results)
+        assert (await first).startswith("Echo: first")
+
+    @pytest.mark.asyncio
+    async def test_stream_yields_tokens_and_ask_llm_goes_through_the_gateway(self, stub, gateway):
+        events = [e async for e in AIService.stream_llm("What is it?", "Some context about the thing")]
+        tokens = "".join(e["delta"] for e in events if e["type"] == "token")
+        assert tokens.startswith("Echo:")
+        assert events[-1]["type"] == "done"
+
+        with patch.object(settings, "answer_cache_enabled", False):
+            result = await AIService.ask_llm("What is it?", "Some context about the thing")
+        assert result["answer"].startswith("Echo:")
+        assert gateway.stats()["endpoints"]["chat"]["completed"] == 2
+
+
+def test_parse_keep_alive():
+    assert parse_keep_alive("30m") == 1800
+    assert parse_keep_alive("-1") == -1
+    assert parse_keep_alive(45) == 45
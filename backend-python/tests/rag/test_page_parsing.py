@@ -0,0 +1,149 @@
+import sys
+from unittest.mock import MagicMock
+
+# -- MOCKING DEPENDENCIES START --
+mock_docling = MagicMock()
+sys.modules["llama_index.readers.docling"] = mock_docling
+# -- MOCKING DEPENDENCIES END --
+
+import os
+
+import pytest
+from unittest.mock import patch
+
+from app.rag.parsing import DoclingParserPool, PageCache, parse_file, parser_version
+
+PAGES = 4
+
+
+class FakeConverter:
+    def convert(self, source, page_range):
+        first, last = page_range
+        assert first == last
+        if "bad-page" in source and first == 3:
+            raise RuntimeError("corrupt page")
+        # Records every page conversion, also from forked workers
+        with open(f"{source}.log", "a") as log:
+            log.write(f"{first}\n")
+        document = MagicMock()
+        document.export_to_markdown.return_value = f"Text of page {first} of {os.path.basename(source)}"
+        return MagicMock(document=document)
+
+
+class FakeReader:
+    def __init__(self):
+        self.doc_converter = FakeConverter()
+        self.md_export_kwargs = {}
+
+    def load_data(self, file_path):
+        raise AssertionError("PDFs are parsed per page")
+
+
+def converted_pages(path):
+    if not os.path.exists(f"{path}.log"):
+        return []
+    with open(f"{path}.log") as log:
+        return sorted(int(line) for line in log)
+
+
+@pytest.fixture
+def pdfs(tmp_path):
+    paths = []
+    for name in ("report.pdf", "bad-page.pdf"):
+        (tmp_path / name).write_bytes(f"%PDF-1.7 {name}".encode())
+        paths.append(str(tmp_path / name))
+    return paths
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = PageCache(str(tmp_path / "pages.sqlite3"))
+    with patch.object(PageCache, "_instance", cache), \
+         patch("app.rag.parsing.pdf_page_count", return_value=PAGES):
+        yield cache
+
+
+@pytest.fixture
+def pool():
+    with patch.dict(sys.modules, {"llama_index.readers.docling": MagicMock(DoclingReader=FakeReader)}):
+        pool = DoclingParserPool(workers=2, start_method="fork")
+        yield pool
+        pool.close()
+
+
+class TestPageCache:
+    def test_round_trip_is_keyed_by_parser_version(self, cache):
+        cache.put("abc", "v1", 1, "one")
+        cache.put("abc", "v1", 2, "two")
+        cache.put("abc", "v2", 1, "other parser")
+
+        assert cache.get_pages("abc", "v1", 3) == {1: "one", 2: "two"}
+        assert cache.get_pages("abc", "v3", 3) == {}
+        assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 4
+
+
+class TestPageParsing:
+    def test_pool_parses_pages_in_parallel_and_labels_them(self, pdfs, cache, pool):
+        results = {r.path: r for r in pool.parse(pdfs)}
+
+        report = results[pdfs[0]]
+        assert [meta["page_label"] for _, meta in report.documents] == ["1", "2", "3", "4"]
+        assert report.documents[1][0] == "Text of page 2 of report.pdf"
+        assert converted_pages(pdfs[0]) == [1, 2, 3, 4]
+
+        # A bad page is skipped, the rest of the file survives
+        partial = results[pdfs[1]]
+        assert partial.error is None
+        assert partial.failed_pages == [3]
+        assert [meta["page_label"] for _, meta in partial.documents] == ["1", "2", "4"]
+
+    def test_reparse_reads_cached_pages(self, pdfs, cache, pool):
+        list(pool.parse(pdfs))
+        again = {r.path: r for r in pool.parse(pdfs)}
+
+        assert again[pdfs[0]].cached_pages == PAGES
+        assert converted_pages(pdfs[0]) == [1, 2, 3, 4]
+        # Only the failed page is retried
+        assert converted_pages(pdfs[1]) == [1, 2, 4]
+        assert again[pdfs[1]].failed_pages == [3]
+
+    def test_process_files_reports_failed_and_cached_pages(self, pdfs, cache, pool):
+        from contextlib import contextmanager
+        from app.rag.ingestion import IngestionService
+
+        model = MagicMock()
+        model.get_text_embedding_batch.side_effect = lambda texts: [[1.0, 0.0] for _ in texts]
+
+        @contextmanager
+        def acquire(name):
+            yield model
+
+        with patch("app.rag.ingestion.RAGFactory.acquire", side_effect=acquire), \
+             patch("app.rag.ingestion.settings.embedding_cache_enabled", False), \
+             patch("app.rag.chunking.settings.chunking_strategy", "token"):
+            list(IngestionService.process_files(pdfs, parser_pool=pool))
+            results = {r["file"]: r for r in IngestionService.process_files(pdfs, parser_pool=pool)}
+
+        assert results[pdfs[0]]["failed_pages"] == [] and results[pdfs[0]]["cached_pages"] == PAGES
+        assert results[pdfs[1]]["failed_pages"] == [3] and results[pdfs[1]]["cached_pages"] == 3
+
+    def test_changed_file_or_parser_version_misses(self, pdfs, cache):
+        reader = FakeReader()
+        parse_file(reader, pdfs[0])
+
+        with open(pdfs[0], "ab") as f:
+            f.write(b" edited")
+        assert parse_file(reader, pdfs[0]).cached_pages == 0
+
+        with patch("app.rag.parsing.settings.page_parser_version", "2"):
+            assert parser_version().endswith("-2")
+            assert parse_file(reader, pdfs[0]).cached_pages == 0
+        assert converted_pages(pdfs[0]) == [1, 1, 1, 2, 2, 2, 3, 3, 3, 4, 4, 4]
+
+    def test_unsplittable_pdf_is_parsed_whole(self, pdfs, tmp_path):
+        reader = MagicMock()
+        reader.load_data.return_value = [MagicMock(text="whole", metadata={})]
+        with patch("app.rag.parsing.pdf_page_count", side_effect=ValueError("encrypted")):
+            parsed = parse_file(reader, pdfs[0])
+
+        assert parsed.documents == [("whole", {})]
@@ -0,0 +1,121 @@
+import pytest
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+import sys
+
+# MOCK DOCLING
+sys.modules["llama_index.readers.docling"] = MagicMock()
+sys.modules["llama_index.readers.docling"].DoclingReader = MagicMock()
+
+from app.rag.registry import ModelRegistry
+
+
+def test_concurrent_cold_requests_load_once():
+    loads = []
+
+    def loader():
+        loads.append(1)
+        time.sleep(0.05)
+        return object()
+
+    registry = ModelRegistry()
+    registry.register("embedding", loader)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        models = list(pool.map(lambda _: registry.get("embedding"), range(8)))
+
+    assert len(loads) == 1
+    assert all(m is models[0] for m in models)
+
+
+def test_unload_keeps_model_alive_for_open_handles():
+    registry = ModelRegistry()
+    registry.register("reranker", lambda: MagicMock(name="reranker"))
+
+    with registry.acquire("reranker") as model:
+        registry.unload("reranker")
+        assert registry.stats()["reranker"]["loaded"] is False
+        assert registry.stats()["reranker"]["retired_in_use"] == 1
+        # Still usable by the request that holds the handle
+        assert model is not None
+
+    assert registry.stats()["reranker"]["retired_in_use"] == 0
+    # Next access loads a fresh version
+    assert registry.get("reranker") is not model
+    assert registry.stats()["reranker"]["version"] == 2
+
+
+def test_unload_wait_blocks_until_released():
+    registry = ModelRegistry()
+    registry.register("llm", object)
+    release = threading.Event()
+
+    def hold():
+        with registry.acquire("llm"):
+            release.wait()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    time.sleep(0.01)
+
+    assert registry.unload("llm", wait=True, timeout=0.05) is False
+    release.set()
+    holder.join()
+    assert registry.stats()["llm"]["retired_in_use"] == 0
+
+
+def test_swap_replaces_model_without_interrupting_handles():
+    registry = ModelRegistry()
+    registry.register("embedding", lambda: "small")
+
+    with registry.acquire("embedding") as old:
+        new = registry.swap("embedding", lambda: "large")
+        assert old == "small"
+        assert registry.get("embedding") == "large"
+
+    assert new == "large"
+    # Future reloads use the swapped loader
+    registry.unload("embedding")
+    assert registry.get("embedding") == "large"
+
+
+def test_unknown_model_raises():
+    with pytest.raises(KeyError):
+        ModelRegistry().get("missing")
+
+
+def test_retired_model_is_closed_after_last_handle():
+    registry = ModelRegistry()
+    model = MagicMock()
+    registry.register("embedding", lambda: model)
+
+    with registry.acquire("embedding"):
+        registry.unload("embedding")
+        model.close.assert_not_called()
+
+    model.close.assert_called_once()
+
+
+def test_closing_a_retired_model_does_not_block_other_models():
+    registry = ModelRegistry()
+    closing, finish = threading.Event(), threading.Event()
+    slow = MagicMock()
+    slow.close.side_effect = lambda: (closing.set(), finish.wait(5))
+    registry.register("embedding", lambda: slow)
+    registry.register("reranker", lambda: "reranker")
+    registry.get("reranker")
+    registry.get("embedding")
+
+    unloading = threading.Thread(target=registry.unload, args=("embedding",))
+    unloading.start()
+    assert closing.wait(5)
+    try:
+        # The registry lock isn't held while the old worker pool shuts down
+        with ThreadPoolExecutor(1) as pool:
+            assert pool.submit(registry.get, "reranker").result(timeout=1) == "reranker"
+            assert pool.submit(registry.stats).result(timeout=1)["embedding"]["loaded"] is False
+    finally:
+        finish.set()
+        unloading.join()
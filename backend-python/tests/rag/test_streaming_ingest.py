@@ -0,0 +1,165 @@
+import sys
+from unittest.mock import MagicMock
+
+# -- MOCKING DEPENDENCIES START --
+mock_docling = MagicMock()
+sys.modules["llama_index.readers.docling"] = mock_docling
+# -- MOCKING DEPENDENCIES END --
+
+import hashlib
+import json
+from contextlib import contextmanager
+from typing import List
+
+import numpy as np
+import pytest
+from unittest.mock import patch, AsyncMock
+from fastapi.testclient import TestClient
+from llama_index.core.base.embeddings.base import BaseEmbedding
+
+from app.main import app
+from app.rag.ingestion import IngestionService
+from app.rag.streaming import StreamingChunker
+from app.services import AIService
+
+TOPICS = ["invoice payment due", "kubernetes cluster upgrade", "employment contract terms", "quarterly revenue report"]
+
+
+class HashEmbedding(BaseEmbedding):
+    """
+    Deterministic embedding: sentences about the same topic point the same way.
+    """
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "HashEmbedding"
+
+    def _vector(self, text: str) -> List[float]:
+        topic = next((t for t in TOPICS if t in text), text)
+        rng = np.random.default_rng(int(hashlib.sha256(topic.encode()).hexdigest()[:8], 16))
+        return rng.normal(size=16).tolist()
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._vector(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._vector(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._vector(text)
+
+
+def document(sentences: int) -> str:
+    # Topic changes every 10 sentences
+    return " ".join(f"Sentence {i} is about {TOPICS[(i // 10) % len(TOPICS)]}." for i in range(sentences))
+
+
+def parts(text: str, size: int):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.fixture(autouse=True)
+def no_cache():
+    with patch("app.rag.streaming.settings.embedding_cache_enabled", False), \
+         patch("app.rag.ingestion.settings.embedding_cache_enabled", False):
+        yield
+
+
+class TestStreamingChunker:
+    def test_chunks_cover_the_document_in_order(self):
+        text = document(400)
+        chunker = StreamingChunker(HashEmbedding(), {"filename": "big.txt"}, window_chars=2000, embed_window=4)
+
+        nodes = []
+        for part in parts(text, 300):
+            nodes.extend(chunker.feed(part))
+        nodes.extend(chunker.finish())
+
+        assert len(nodes) > 5
+        assert [n.metadata["chunk_index"] for n in nodes] == list(range(len(nodes)))
+        assert " ".join(" ".join(n.get_content().split()) for n in nodes) == text
+        assert all(n.embedding is not None for n in nodes)
+        assert all(n.metadata["filename"] == "big.txt" for n in nodes)
+        assert chunker.characters == len(text)
+
+    def test_buffer_stays_bounded(self):
+        chunker = StreamingChunker(HashEmbedding(), window_chars=1000, embed_window=4)
+        largest = 0
+        for part in parts(document(2000), 250):
+            chunker.feed(part)
+            largest = max(largest, len(chunker._buffer))
+            assert len(chunker._pending) < chunker.embed_window
+        chunker.finish()
+
+        assert largest < 2 * chunker.window_chars + 250
+
+    def test_embeds_in_fixed_size_windows(self):
+        sizes = []
+        original = IngestionService._embed_nodes
+
+        def record(nodes, *args, **kwargs):
+            sizes.append(len(nodes))
+            return original(nodes, *args, **kwargs)
+
+        chunker = StreamingChunker(HashEmbedding(), window_chars=1500, embed_window=3)
+        with patch.object(IngestionService, "_embed_nodes", side_effect=record):
+            total = sum(len(chunker.feed(part)) for part in parts(document(300), 400))
+            total += len(chunker.finish())
+
+        assert sum(sizes) == total
+        assert all(size == 3 for size in sizes[:-1])
+        assert 0 < sizes[-1] <= 3
+
+
+class TestIngestStreamEndpoint:
+    @contextmanager
+    def service(self):
+        @contextmanager
+        def acquire(name):
+            yield HashEmbedding()
+
+        with patch("app.services.RAGFactory.acquire", side_effect=acquire), \
+             patch.object(AIService, "extract_metadata", AsyncMock(return_value={"document_type": "Report"})), \
+             patch("app.services.settings.vector_index_enabled", False), \
+             patch("app.rag.streaming.settings.stream_window_chars", 1500), \
+             patch("app.rag.streaming.settings.stream_embed_window", 4):
+            yield
+
+    def read_events(self, response):
+        return [json.loads(line) for line in response.text.splitlines() if line]
+
+    def test_raw_text_body(self):
+        client = TestClient(app)
+        text = document(200)
+        with self.service():
+            response = client.post(
+                "/ingest/stream",
+                content=(chunk.encode("utf-8") for chunk in parts(text, 500)),
+                headers={"Content-Type": "text/plain", "X-Document-Metadata": json.dumps({"filename": "big.txt"})},
+            )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        events = self.read_events(response)
+        chunks = [e for e in events if e["type"] == "chunk"]
+        assert events[-1]["type"] == "done"
+        assert events[-1]["chunks"] == len(chunks) > 1
+        assert events[-1]["characters"] == len(text)
+        assert [e["document_metadata"] for e in events if e["type"] == "metadata"] == [{"document_type": "Report", "filename": "big.txt"}]
+        assert [c["index"] for c in chunks] == list(range(len(chunks)))
+
+    def test_ndjson_parts(self):
+        client = TestClient(app)
+        text = document(100)
+        body = "".join(json.dumps({"text": part}) + "\n" for part in parts(text, 700))
+        with self.service():
+            response = client.post("/ingest/stream", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+        events = self.read_events(response)
+        assert events[-1]["type"] == "done"
+        assert events[-1]["characters"] == len(text)
+
+    def test_invalid_metadata_header(self):
+        client = TestClient(app)
+        response = client.post("/ingest/stream", content="text", headers={"X-Document-Metadata": "not json"})
+        assert response.status_code == 422
@@ -0,0 +1,72 @@
+import pytest
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+
+# MOCK DOCLING
+sys.modules["llama_index.readers.docling"] = MagicMock()
+sys.modules["llama_index.readers.docling"].DoclingReader = MagicMock()
+
+from app.rag.warmup import ModelWarmup
+from app.services import AIService
+
+
+@pytest.mark.asyncio
+async def test_models_load_in_parallel_and_report_state():
+    warmup = ModelWarmup()
+
+    async def slow():
+        await asyncio.sleep(0.1)
+
+    async def broken():
+        raise RuntimeError("ollama unreachable")
+
+    start = time.perf_counter()
+    await warmup.run({"embedder": slow, "reranker": slow, "llm": broken}, required=["embedder", "reranker"])
+
+    assert time.perf_counter() - start < 0.19
+    report = warmup.report()
+    assert report["ready"] is True
+    assert report["models"]["embedder"]["state"] == "ready"
+    assert report["models"]["embedder"]["load_ms"] >= 100
+    assert report["models"]["llm"]["state"] == "failed"
+    assert "unreachable" in report["models"]["llm"]["error"]
+
+
+@pytest.mark.asyncio
+async def test_not_ready_when_required_model_fails():
+    warmup = ModelWarmup()
+    assert warmup.ready is False
+
+    async def broken():
+        raise RuntimeError("no weights")
+
+    await warmup.run({"embedder": broken}, required=["embedder"])
+    assert warmup.ready is False
+
+
+@pytest.mark.asyncio
+@patch("app.services.settings")
+@patch("app.services.FlashRankRerank")
+@patch("app.services.RAGFactory")
+async def test_warm_up_runs_dummy_inference(MockFactory, MockFlashRank, mock_settings):
+    mock_settings.warmup_flashrank = True
+    mock_settings.ollama_model = "llama-test"
+    mock_settings.ollama_keep_alive = "10m"
+    MockFactory.get_llm.return_value.async_client.generate = AsyncMock()
+    reranker = MagicMock()
+
+    with patch.object(AIService, "_get_reranker", return_value=reranker), \
+         patch.object(AIService, "_warmup", ModelWarmup()):
+        await AIService.warm_up()
+        report = AIService.readiness()
+
+    assert set(report["models"]) == {"embedder", "reranker", "llm", "flashrank"}
+    assert report["ready"] is True
+    MockFactory.get_embedding_model.return_value.get_text_embedding_batch.assert_called_once()
+    reranker.predict.assert_called_once()
+    MockFlashRank.get_shared_ranker.return_value.rerank.assert_called_once()
+    MockFactory.get_llm.return_value.async_client.generate.assert_awaited_once_with(
+        model="llama-test", prompt="", keep_alive="10m"
+    )
@@ -0,0 +1,114 @@
+import os
+import time
+import pytest
+import numpy as np
+from unittest.mock import MagicMock, patch
+import sys
+
+# MOCK DOCLING
+sys.modules["llama_index.readers.docling"] = MagicMock()
+sys.modules["llama_index.readers.docling"].DoclingReader = MagicMock()
+
+from app.rag.workers import EmbeddingWorkerPool, PooledEmbedding, _core_sets
+
+
+class LengthModel:
+    """Stand-in embedder: [len(text), pid] per text."""
+
+    def get_text_embedding_batch(self, texts):
+        if any(t == "boom" for t in texts):
+            raise ValueError("bad input")
+        if any(t == "crash" for t in texts):
+            os._exit(1)
+        if any(t == "slow" for t in texts):
+            time.sleep(2)
+        return [[float(len(t)), float(os.getpid())] for t in texts]
+
+
+def make_model():
+    return LengthModel()
+
+
+def broken_model():
+    raise RuntimeError("no weights")
+
+
+# Spawned workers re-import `app`, which needs the real docling reader;
+# forked workers inherit the mocked modules above.
+START_METHOD = "fork"
+
+
+@pytest.fixture
+def pool():
+    pool = EmbeddingWorkerPool(make_model, workers=2, pin_cores=False, start_method=START_METHOD)
+    pool.wait_ready(timeout=60)
+    yield pool
+    pool.close()
+
+
+def test_pool_embeds_in_input_order_across_workers(pool):
+    texts = ["x" * i for i in range(1, 41)]
+
+    matrix = pool.embed(texts)
+
+    assert matrix.dtype == np.float32
+    assert matrix.shape == (40, 2)
+    assert matrix[:, 0].tolist() == [float(i) for i in range(1, 41)]
+    # Work ran in the worker processes, not here
+    assert os.getpid() not in set(matrix[:, 1].tolist())
+    assert pool.stats()["jobs"] == 2
+
+
+def test_worker_error_propagates(pool):
+    with pytest.raises(RuntimeError, match="bad input"):
+        pool.embed(["boom"])
+    # The pool keeps serving after a failed batch
+    assert pool.embed(["ok"]).shape == (1, 2)
+
+
+def test_dead_worker_fails_its_jobs_and_is_respawned(pool):
+    with pytest.raises(RuntimeError, match="exited unexpectedly"):
+        pool.embed(["crash"])
+
+    # The other jobs keep working, and the dead worker comes back
+    assert pool.embed(["x" * i for i in range(1, 41)]).shape == (40, 2)
+    pool.wait_ready(timeout=60)
+    assert pool.stats()["restarts"] == 1
+    assert pool.stats()["alive"] == 2
+    assert pool.stats()["error"] is None
+
+
+def test_embed_times_out():
+    pool = EmbeddingWorkerPool(make_model, workers=1, pin_cores=False, start_method=START_METHOD, job_timeout=0.3)
+    try:
+        pool.wait_ready(timeout=60)
+        with pytest.raises(TimeoutError):
+            pool.embed(["slow"])
+        # Once the worker is free, the late result is discarded and the next call gets its own
+        time.sleep(2)
+        assert pool.embed(["ok"])[0, 0] == 2.0
+        assert pool.stats()["in_flight"] == 0
+    finally:
+        pool.close()
+
+
+def test_pooled_embedding_is_a_drop_in_llama_index_model(pool):
+    embed_model = PooledEmbedding(model_name="test", pool=pool)
+
+    assert embed_model.get_text_embedding("abc")[0] == 3.0
+    assert [v[0] for v in embed_model.get_text_embedding_batch(["a", "bb"])] == [1.0, 2.0]
+
+
+def test_worker_load_failure_is_reported():
+    pool = EmbeddingWorkerPool(broken_model, workers=1, pin_cores=False, start_method=START_METHOD)
+    try:
+        with pytest.raises(RuntimeError, match="no weights"):
+            pool.wait_ready(timeout=60)
+    finally:
+        pool.close()
+
+
+@patch("os.sched_getaffinity", return_value=set(range(8)), create=True)
+def test_core_sets_partition_available_cores(_):
+    assert _core_sets(2) == [[0, 1, 2, 3], [4, 5, 6, 7]]
+    assert _core_sets(3) == [[0, 1], [2, 3], [4, 5]]
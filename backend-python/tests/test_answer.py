@@ -0,0 +1,161 @@
+import sys
+from unittest.mock import MagicMock
+
+# -- MOCKING DEPENDENCIES START --
+mock_docling = MagicMock()
+sys.modules["llama_index.readers.docling"] = mock_docling
+# -- MOCKING DEPENDENCIES END --
+
+import threading
+import pytest
+from unittest.mock import patch, AsyncMock
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.rag.fusion import reciprocal_rank_fusion
+from app.rag.store import ChunkStore, vector_literal
+from app.services import AIService
+
+
+VECTOR_HITS = [
+    {"id": 1, "content": "Python at TechCorp", "source_file": "cv.pdf", "score": 0.9},
+    {"id": 2, "content": "React frontend", "source_file": "cv.pdf", "score": 0.8},
+]
+KEYWORD_HITS = [
+    {"id": 3, "content": "Python scripting", "source_file": "notes.pdf", "score": 0.5},
+    {"id": 1, "content": "Python at TechCorp", "source_file": "cv.pdf", "score": 0.4},
+]
+
+
+class TestFusion:
+    def test_items_in_both_lists_rank_first(self):
+        fused = reciprocal_rank_fusion({"vector": VECTOR_HITS, "keyword": KEYWORD_HITS}, k=60)
+
+        assert [hit["id"] for hit in fused] == [1, 3, 2]
+        assert fused[0]["ranks"] == {"vector": 1, "keyword": 2}
+        assert fused[0]["rrf_score"] == pytest.approx(1 / 61 + 1 / 62)
+
+    def test_empty_lists(self):
+        assert reciprocal_rank_fusion({"vector": [], "keyword": []}) == []
+
+
+class TestChunkStore:
+    def _store(self):
+        store = ChunkStore.__new__(ChunkStore)
+        store._pool = MagicMock()
+        store._slots = threading.BoundedSemaphore(2)
+        store.max_connections = 2
+        store._in_use = 0
+        store._queries = 0
+        store._total_query_ms = 0.0
+        return store
+
+    def test_connection_commits_and_returns_to_pool(self):
+        store = self._store()
+        conn = store._pool.getconn.return_value
+
+        with store.connection():
+            assert store.stats()["in_use"] == 1
+
+        conn.commit.assert_called_once()
+        store._pool.putconn.assert_called_once_with(conn)
+        assert store.stats()["in_use"] == 0
+
+    def test_connection_rolls_back_on_error(self):
+        store = self._store()
+        conn = store._pool.getconn.return_value
+
+        with pytest.raises(ValueError):
+            with store.connection():
+                raise ValueError("boom")
+
+        conn.rollback.assert_called_once()
+        store._pool.putconn.assert_called_once_with(conn)
+
+    def test_vector_search_uses_cosine_order_and_filters(self):
+        store = self._store()
+        cursor = store._pool.getconn.return_value.cursor.return_value.__enter__.return_value
+        cursor.description = [("id",), ("content",)]
+        cursor.fetchall.return_value = [(1, "text")]
+
+        rows = store.vector_search([0.5, 1.0], 15, {"type": "cv"})
+
+        sql, params = cursor.execute.call_args.args
+        assert "ORDER BY embedding <=> %s::vector" in sql
+        assert "metadata @> %s::jsonb" in sql
+        assert params == (vector_literal([0.5, 1.0]), '{"type": "cv"}', vector_literal([0.5, 1.0]), 15)
+        assert rows == [{"id": 1, "content": "text"}]
+
+    def test_keyword_search_applies_filters(self):
+        store = self._store()
+        cursor = store._pool.getconn.return_value.cursor.return_value.__enter__.return_value
+        cursor.description = [("id",)]
+        cursor.fetchall.return_value = []
+
+        store.keyword_search("python", 15, {"type": "cv"})
+
+        sql, params = cursor.execute.call_args.args
+        assert "WHERE search_vector @@ q AND metadata @> %s::jsonb" in sql
+        assert params == ("python", '{"type": "cv"}', 15)
+
+
+class TestAnswerEndpoint:
+    def test_answer_fuses_reranks_and_reports_stage_timings(self):
+        store = MagicMock()
+        store.vector_search.return_value = VECTOR_HITS
+        store.keyword_search.return_value = KEYWORD_HITS
+        reranked = [{"content": "Python scripting", "score": 0.9}, {"content": "Python at TechCorp", "score": 0.7}]
+
+        with patch.object(settings, "answer_retrieval", "postgres"), \
+             patch.object(ChunkStore, "instance", return_value=store), \
+             patch.object(AIService, "embed_query", AsyncMock(return_value=[0.1, 0.2])), \
+             patch.object(AIService, "rerank", return_value=reranked) as mock_rerank, \
+             patch.object(AIService, "ask_llm", AsyncMock(return_value={"answer": "Python.", "sources": ["Provided Context"]})) as mock_ask:
+            response = TestClient(app).post("/answer", json={"question": "Which languages?", "top_k": 2})
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["answer"] == "Python."
+        assert body["sources"] == ["📄 notes.pdf", "📄 cv.pdf"]
+        assert [c["id"] for c in body["chunks"]] == ["3", "1"]
+        assert set(body["timings"]) == {"embed_ms", "search_ms", "fuse_ms", "rerank_ms", "generate_ms", "total_ms"}
+
+        # Duplicates across retrievers are reranked once
+        assert sorted(mock_rerank.call_args.args[1]) == ["Python at TechCorp", "Python scripting", "React frontend"]
+        assert mock_ask.call_args.args[1] == "Python scripting\n---\nPython at TechCorp"
+
+    def test_failed_retriever_degrades_to_the_other(self):
+        store = MagicMock()
+        store.vector_search.return_value = VECTOR_HITS
+        store.keyword_search.side_effect = RuntimeError("db down")
+
+        with patch.object(settings, "answer_retrieval", "postgres"), \
+             patch.object(ChunkStore, "instance", return_value=store), \
+             patch.object(AIService, "embed_query", AsyncMock(return_value=[0.1, 0.2])), \
+             patch.object(AIService, "rerank", side_effect=lambda q, docs, k: [{"content": d, "score": 1.0} for d in docs[:k]]), \
+             patch.object(AIService, "ask_llm", AsyncMock(return_value={"answer": "ok", "sources": []})):
+            response = TestClient(app).post("/answer", json={"question": "Which languages?"})
+
+        assert response.status_code == 200
+        assert [c["ranks"] for c in response.json()["chunks"]] == [{"vector": 1}, {"vector": 2}]
+
+
+    def test_sources_cite_pages_when_chunks_have_page_labels(self):
+        store = MagicMock()
+        store.vector_search.return_value = [
+            {"id": 4, "content": "Python at TechCorp", "source_file": "cv.pdf", "metadata": {"page_label": "2"}, "score": 0.9},
+            {"id": 5, "content": "Python scripting", "source_file": "notes.md", "metadata": {}, "score": 0.8},
+        ]
+        store.keyword_search.return_value = []
+
+        with patch.object(settings, "answer_retrieval", "postgres"), \
+             patch.object(ChunkStore, "instance", return_value=store), \
+             patch.object(AIService, "embed_query", AsyncMock(return_value=[0.1, 0.2])), \
+             patch.object(AIService, "rerank", side_effect=lambda q, docs, k: [{"content": d, "score": 1.0} for d in docs[:k]]), \
+             patch.object(AIService, "ask_llm", AsyncMock(return_value={"answer": "ok", "sources": []})):
+            response = TestClient(app).post("/answer", json={"question": "Which languages?"})
+
+        body = response.json()
+        assert body["sources"] == ["📄 cv.pdf (p.2)", "📄 notes.md"]
+        assert body["chunks"][0]["page_label"] == "2"
@@ -0,0 +1,94 @@
+import sys
+from unittest.mock import MagicMock
+
+# -- MOCKING DEPENDENCIES START --
+mock_docling = MagicMock()
+sys.modules["llama_index.readers.docling"] = mock_docling
+# -- MOCKING DEPENDENCIES END --
+
+import json
+import numpy as np
+import pytest
+from unittest.mock import patch, AsyncMock
+from fastapi.testclient import TestClient
+
+from app import encoding
+from app.main import app
+from app.services import AIService
+
+
+class TestNegotiation:
+    """
+    Tests for Accept-header based embedding format selection.
+    """
+
+    def test_defaults_to_json(self):
+        assert encoding.negotiate("").kind == "json"
+        assert encoding.negotiate("application/json").kind == "json"
+
+    def test_picks_base64_with_dtype(self):
+        fmt = encoding.negotiate("application/vnd.securedoc.embedding+json; dtype=float16, application/json")
+        assert fmt == encoding.EmbeddingFormat("base64", "float16")
+
+    def test_binary_can_be_disallowed(self):
+        assert encoding.negotiate("application/octet-stream").kind == "binary"
+        assert encoding.negotiate("application/octet-stream", allow_binary=False).kind == "json"
+
+    def test_base64_round_trip(self):
+        vector = np.random.default_rng(0).standard_normal(384).astype(np.float32)
+        rows = encoding.b64_rows(encoding.to_matrix([vector], "float32"))
+        np.testing.assert_array_equal(encoding.decode_b64(rows[0], "float32"), vector)
+
+        half = encoding.decode_b64(encoding.b64_rows(encoding.to_matrix([vector], "float16"))[0], "float16")
+        np.testing.assert_allclose(half, vector, atol=1e-2)
+
+
+class TestEmbeddingEndpoints:
+    """
+    Tests that endpoints honour the negotiated format.
+    """
+
+    @patch.object(AIService, "get_embeddings_array")
+    def test_batch_binary_response(self, mock_array):
+        matrix = np.arange(6, dtype=np.float32).reshape(2, 3)
+        mock_array.return_value = matrix
+
+        client = TestClient(app)
+        response = client.post("/embed/batch", json={"texts": ["a", "b"]}, headers={"Accept": "application/octet-stream"})
+
+        assert response.status_code == 200
+        assert response.headers["x-embedding-count"] == "2"
+        assert response.headers["x-embedding-dim"] == "3"
+        decoded = np.frombuffer(response.content, dtype="<f4").reshape(2, 3)
+        np.testing.assert_array_equal(decoded, matrix)
+
+    @patch.object(AIService, "embed_query", new_callable=AsyncMock)
+    def test_embed_base64_is_much_smaller_than_json(self, mock_embed):
+        vector = np.random.default_rng(1).standard_normal(384).tolist()
+        mock_embed.return_value = vector
+
+        client = TestClient(app)
+        as_json = client.post("/embed", json={"text": "question"})
+        as_b64 = client.post("/embed", json={"text": "question"},
+                             headers={"Accept": "application/vnd.securedoc.embedding+json; dtype=float16"})
+
+        body = as_b64.json()
+        assert body["encoding"] == {"dtype": "float16", "byteorder": "little", "dim": 384}
+        np.testing.assert_allclose(encoding.decode_b64(body["embedding"], "float16"), vector, atol=1e-2)
+        assert len(as_b64.content) * 5 < len(as_json.content)
+
+    @patch.object(AIService, "ingest_document", new_callable=AsyncMock)
+    def test_ingest_base64_chunks(self, mock_ingest):
+        mock_ingest.return_value = ({"type": "Report"}, [
+            {"content": "one", "embedding": [0.5, 1.0], "metadata": {"type": "Report"}},
+        ])
+
+        client = TestClient(app)
+        response = client.post("/ingest", json={"text": "doc"},
+                               headers={"Accept": "application/vnd.securedoc.embedding+json"})
+
+        body = response.json()
+        assert body["document_metadata"] == {"type": "Report"}
+        chunk = body["chunks"][0]
+        assert chunk["content"] == "one"
+        np.testing.assert_array_equal(encoding.decode_b64(chunk["embedding"]), [0.5, 1.0])
@@ -0,0 +1,147 @@
+import sys
+from unittest.mock import MagicMock
+
+# -- MOCKING DEPENDENCIES START --
+mock_docling = MagicMock()
+sys.modules["llama_index.readers.docling"] = mock_docling
+# -- MOCKING DEPENDENCIES END --
+
+import struct
+import threading
+import uuid
+import numpy as np
+from unittest.mock import patch, AsyncMock
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.rag.manifest import ChunkManifest
+from app.rag.store import COPY_SIGNATURE, ChunkStore, encode_copy_rows, vector_binary
+from app.services import AIService
+
+
+def _store():
+    store = ChunkStore.__new__(ChunkStore)
+    store._pool = MagicMock()
+    store._slots = threading.BoundedSemaphore(2)
+    store.max_connections = 2
+    store._in_use = 0
+    store._queries = 0
+    store._total_query_ms = 0.0
+    return store
+
+
+class TestBinaryCopy:
+    def test_encodes_rows_in_pgcopy_binary_format(self):
+        doc = uuid.uuid4()
+        payload = encode_copy_rows([(7, "héllo", "cv.pdf", [1.0, -2.5], doc, {"a": 1})])
+
+        assert payload.startswith(COPY_SIGNATURE + struct.pack(">ii", 0, 0))
+        assert payload.endswith(struct.pack(">h", -1))
+        body = payload[len(COPY_SIGNATURE) + 8:-2]
+        assert struct.unpack(">h", body[:2])[0] == 6
+
+        fields, offset = [], 2
+        for _ in range(6):
+            (length,) = struct.unpack(">i", body[offset:offset + 4])
+            offset += 4
+            fields.append(body[offset:offset + length])
+            offset += length
+        assert struct.unpack(">q", fields[0])[0] == 7
+        assert fields[1].decode("utf-8") == "héllo"
+        assert fields[3] == vector_binary([1.0, -2.5])
+        assert np.frombuffer(fields[3][4:], dtype=">f4").tolist() == [1.0, -2.5]
+        assert fields[4] == doc.bytes
+        assert fields[5] == b'\x01{"a": 1}'
+
+    def test_null_document_and_source(self):
+        payload = encode_copy_rows([(1, "x", None, [0.0], None, {})])
+
+        assert payload.count(struct.pack(">i", -1)) == 2
+
+    def test_copy_chunks_reserves_ids_replaces_document_and_copies(self):
+        store = _store()
+        cursor = store._pool.getconn.return_value.cursor.return_value.__enter__.return_value
+        cursor.fetchall.return_value = [(101,), (102,)]
+        doc = "3f2b8c9e-1d4a-4b6e-9c1f-2a3b4c5d6e7f"
+        chunks = [{"content": "a", "embedding": [0.1], "metadata": {}}, {"content": "b", "embedding": [0.2], "metadata": {}}]
+
+        ids = store.copy_chunks(chunks, document_id=doc, source_file="cv.pdf")
+
+        assert ids == [101, 102]
+        statements = [c.args[0] for c in cursor.execute.call_args_list]
+        assert statements[0].startswith("DELETE FROM document_chunks WHERE document_id")
+        assert "nextval" in statements[1]
+        sql, stream = cursor.copy_expert.call_args.args
+        assert sql.startswith("COPY document_chunks (id, content, source_file, embedding, document_id, metadata) FROM STDIN WITH (FORMAT binary)")
+        assert stream.getvalue().count(b"cv.pdf") == 2
+        store._pool.getconn.return_value.commit.assert_called_once()
+
+    def test_apply_delta_deletes_unkept_chunks_and_copies_added_in_one_transaction(self):
+        store = _store()
+        cursor = store._pool.getconn.return_value.cursor.return_value.__enter__.return_value
+        cursor.fetchall.return_value = [(201,)]
+        cursor.rowcount = 3
+        doc = "3f2b8c9e-1d4a-4b6e-9c1f-2a3b4c5d6e7f"
+        added = [{"content": "new", "embedding": [0.1], "metadata": {"chunk_id": f"{doc}#ab-0", "chunk_hash": "ab"}}]
+
+        ids, deleted = store.apply_delta(doc, added, [f"{doc}#cd-0"], "cv.pdf")
+
+        assert (ids, deleted) == ([201], 3)
+        sql, params = cursor.execute.call_args_list[0].args
+        # Rows stored without a chunk_id are deleted too
+        assert "COALESCE(metadata->>'chunk_id', '') = ANY(%s)" in sql
+        assert params == (doc, [f"{doc}#cd-0"])
+        assert b'"chunk_id"' in cursor.copy_expert.call_args.args[1].getvalue()
+        store._pool.getconn.return_value.commit.assert_called_once()
+
+    def test_copy_file_chunks_replaces_the_file_without_a_document_id(self):
+        store = _store()
+        cursor = store._pool.getconn.return_value.cursor.return_value.__enter__.return_value
+        cursor.fetchall.return_value = [(301,)]
+
+        ids = store.copy_file_chunks([{"content": "a", "embedding": [0.1], "metadata": {}}], "/data/uploads/cv.pdf", "cv.pdf")
+
+        assert ids == [301]
+        sql, params = cursor.execute.call_args_list[0].args
+        assert sql.startswith("DELETE FROM document_chunks WHERE document_id IS NULL AND metadata->>'file_path'")
+        assert params == ("/data/uploads/cv.pdf",)
+        assert b"/data/uploads/cv.pdf" in cursor.copy_expert.call_args.args[1].getvalue()
+
+    def test_chunk_hashes_skip_rows_without_ids(self):
+        store = _store()
+        cursor = store._pool.getconn.return_value.cursor.return_value.__enter__.return_value
+        cursor.description = [("chunk_id",), ("chunk_hash",)]
+        cursor.fetchall.return_value = [("d#ab-0", "ab"), (None, None)]
+
+        assert store.chunk_hashes("3f2b8c9e-1d4a-4b6e-9c1f-2a3b4c5d6e7f") == [("d#ab-0", "ab")]
+
+
+class TestIngestStoreEndpoint:
+    def test_returns_ids_and_counts_only(self, tmp_path):
+        manifest = ChunkManifest(str(tmp_path / "manifest.sqlite3"))
+        store = MagicMock()
+        store.copy_chunks.return_value = [11, 12]
+        chunks = [{"content": "a", "embedding": [0.1], "metadata": {}}, {"content": "b", "embedding": [0.2], "metadata": {}}]
+        doc = "3f2b8c9e-1d4a-4b6e-9c1f-2a3b4c5d6e7f"
+
+        with patch.object(ChunkStore, "instance", return_value=store), \
+             patch.object(ChunkManifest, "instance", return_value=manifest), \
+             patch.object(AIService, "ingest_document", AsyncMock(return_value=({"type": "cv"}, chunks))):
+            response = TestClient(app).post("/ingest/store", json={"text": "t", "metadata": {"document_id": doc, "filename": "cv.pdf"}})
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["chunk_ids"] == [11, 12]
+        assert body["chunk_count"] == 2
+        assert body["document_id"] == doc
+        assert "chunks" not in body
+        assert "store_ms" in body["timings"]
+        store.copy_chunks.assert_called_once_with(chunks, doc, "cv.pdf")
+        # Stored chunks carry their chunk ids, and the manifest matches them
+        stored = [c["metadata"]["chunk_id"] for c in store.copy_chunks.call_args.args[0]]
+        assert [chunk_id for chunk_id, _ in manifest.get(doc)] == stored
+
+    def test_rejects_non_uuid_document_id(self):
+        response = TestClient(app).post("/ingest/store", json={"text": "t", "metadata": {"document_id": "abc"}})
+
+        assert response.status_code == 422
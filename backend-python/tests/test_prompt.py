@@ -8,7 +8,7 @@ sys.modules["llama_index.readers.docling"] = mock_docling
 # -- MOCKING DEPENDENCIES END --
 
 import pytest
-from unittest.mock import patch
+from unittest.mock import patch, AsyncMock
 # Now we can import app.services because the failing import inside it is mocked
 from app.services import AIService
 from app.prompts.manager import PromptManager
@@ -59,7 +59,7 @@ class TestAIServicePrompting:
         """
         # Setup Mocks
         mock_llm_instance = MagicMock()
-        mock_llm_instance.complete.return_value.text = "Mock Answer"
+        mock_llm_instance.acomplete = AsyncMock(return_value=MagicMock(text="Mock Answer"))
         mock_get_llm.return_value = mock_llm_instance
         
         mock_get_prompt.return_value = "Rendered Prompt"
@@ -79,5 +79,6 @@ class TestAIServicePrompting:
         assert chunks_arg == ["Chunk1", "Chunk2"]
         assert args[1] == question
         
-        mock_llm_instance.complete.assert_called_with("Rendered Prompt")
+        mock_llm_instance.acomplete.assert_awaited_with("Rendered Prompt")
+        mock_llm_instance.complete.assert_not_called()
         assert result["answer"] == "Mock Answer"
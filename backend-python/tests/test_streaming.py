@@ -0,0 +1,135 @@
+import sys
+from unittest.mock import MagicMock
+
+# -- MOCKING DEPENDENCIES START --
+mock_docling = MagicMock()
+sys.modules["llama_index.readers.docling"] = mock_docling
+# -- MOCKING DEPENDENCIES END --
+
+import json
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import AIService
+
+
+class FakeStream:
+    """
+    Minimal stand-in for the async generator returned by Ollama.astream_complete.
+    """
+    def __init__(self, deltas):
+        self._deltas = iter(deltas)
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return MagicMock(delta=next(self._deltas))
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def aclose(self):
+        self.closed = True
+
+
+def parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        data_line = [line for line in block.split("\n") if line.startswith("data: ")][0]
+        events.append(json.loads(data_line[len("data: "):]))
+    return events
+
+
+class TestAskStream:
+    """
+    Tests for AIService.stream_llm and the /ask/stream endpoint.
+    """
+
+    @pytest.mark.asyncio
+    @patch("app.services.PromptManager.get_chat_prompt", return_value="Prompt")
+    @patch("app.services.RAGFactory.get_llm")
+    async def test_stream_yields_tokens_then_done(self, mock_get_llm, mock_get_prompt):
+        stream = FakeStream(["Hel", "lo", ""])
+
+        async def astream_complete(prompt):
+            return stream
+
+        mock_get_llm.return_value.astream_complete.side_effect = astream_complete
+
+        events = [e async for e in AIService.stream_llm("Q?", "Chunk one\n---\nChunk two")]
+
+        assert [e["delta"] for e in events if e["type"] == "token"] == ["Hel", "lo"]
+        assert events[-1]["type"] == "done"
+        assert events[-1]["sources"] == ["Provided Context"]
+        assert events[-1]["timing"]["ttft_ms"] is not None
+        assert stream.closed
+
+    @pytest.mark.asyncio
+    @patch("app.services.PromptManager.get_chat_prompt", return_value="Prompt")
+    @patch("app.services.RAGFactory.get_llm")
+    async def test_closing_stream_closes_ollama_stream(self, mock_get_llm, mock_get_prompt):
+        stream = FakeStream(["a", "b", "c"])
+
+        async def astream_complete(prompt):
+            return stream
+
+        mock_get_llm.return_value.astream_complete.side_effect = astream_complete
+
+        events = AIService.stream_llm("Q?", "Some long enough context")
+        first = await events.__anext__()
+        await events.aclose()
+
+        assert first == {"type": "token", "delta": "a"}
+        assert stream.closed
+
+    @patch("app.services.PromptManager.get_chat_prompt", return_value="Prompt")
+    @patch("app.services.RAGFactory.get_llm")
+    def test_endpoint_emits_server_sent_events(self, mock_get_llm, mock_get_prompt):
+        async def astream_complete(prompt):
+            return FakeStream(["Answer"])
+
+        mock_get_llm.return_value.astream_complete.side_effect = astream_complete
+
+        client = TestClient(app)
+        response = client.post("/ask/stream", json={"question": "Q?", "context": "Some long enough context"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_sse(response.text)
+        assert events[0] == {"type": "token", "delta": "Answer"}
+        assert events[-1]["type"] == "done"
+
+
+@pytest.mark.asyncio
+async def test_client_dropping_before_the_first_token_cancels_the_generation():
+    import asyncio
+    from unittest.mock import AsyncMock
+    from app.main import ask_llm_stream
+    from app.models import RAGRequest
+
+    cancelled = asyncio.Event()
+
+    async def stream_llm(question, context, compression):
+        try:
+            # Still waiting for a generation slot
+            await asyncio.sleep(30)
+            yield {"type": "token", "delta": "too late"}
+        finally:
+            cancelled.set()
+
+    raw_request = MagicMock()
+    raw_request.is_disconnected = AsyncMock(side_effect=lambda: raw_request.is_disconnected.await_count > 1)
+    with patch.object(AIService, "stream_llm", side_effect=stream_llm):
+        response = await ask_llm_stream(RAGRequest(question="Q?", context="Some context about the thing"), raw_request)
+
+        async def read():
+            return [chunk async for chunk in response.body_iterator]
+
+        body = await asyncio.wait_for(read(), timeout=2)
+
+    assert body == []
+    assert cancelled.is_set()